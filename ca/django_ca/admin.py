@@ -25,14 +25,18 @@ from cryptography.hazmat.primitives.serialization import Encoding
 
 from django.conf.urls import url
 from django.contrib import admin
+from django.contrib.admin.views.main import ChangeList
 from django.contrib.messages import constants as messages
 from django.core.exceptions import PermissionDenied
+from django.db import transaction
 from django.http import Http404
 from django.http import HttpResponse
 from django.http import HttpResponseBadRequest
 from django.http import HttpResponseRedirect
+from django.http import JsonResponse
 from django.template.loader import render_to_string
 from django.template.response import TemplateResponse
+from django.urls import reverse
 from django.utils import timezone
 from django.utils.encoding import force_bytes
 from django.utils.html import escape
@@ -52,7 +56,10 @@ from .forms import RevokeCertificateForm
 from .forms import X509CertMixinAdminForm
 from .models import Certificate
 from .models import CertificateAuthority
+from .models import CertificateName
+from .models import IssuanceJob
 from .models import Watcher
+from .outbox import record as record_event
 from .signals import post_issue_cert
 from .utils import OID_NAME_MAPPINGS
 from .utils import format_general_name
@@ -101,7 +108,7 @@ class CertificateMixin(object):
         elif filetype == 'DER':
             if bundle is True:
                 return HttpResponseBadRequest(_('DER/ASN.1 certificates cannot be downloaded as a bundle.'))
-            data = obj.x509.public_bytes(encoding=Encoding.DER)
+            data = obj.dump_certificate(Encoding.DER)
         else:
             return HttpResponseBadRequest()
 
@@ -420,6 +427,12 @@ class StatusListFilter(admin.SimpleListFilter):
             return queryset.revoked()
 
 
+class CertificateChangeList(ChangeList):
+    def get_queryset(self, request):
+        # The changelist only displays database fields, so don't load certificates and CSRs
+        return super(CertificateChangeList, self).get_queryset(request).light()
+
+
 @admin.register(Certificate)
 class CertificateAdmin(DjangoObjectActions, CertificateMixin, admin.ModelAdmin):
     actions = ['revoke', ]
@@ -480,6 +493,24 @@ class CertificateAdmin(DjangoObjectActions, CertificateMixin, admin.ModelAdmin):
                 return True
         return False
 
+    def get_changelist(self, request, **kwargs):
+        return CertificateChangeList
+
+    def get_search_results(self, request, queryset, search_term):
+        results, use_distinct = super(CertificateAdmin, self).get_search_results(
+            request, queryset, search_term)
+
+        # Names are looked up with an exact match of the normalized name, so that the index can be used. A
+        # plain name (e.g. "example.com") matches the CommonName and DNS names.
+        name = CertificateName.normalize(search_term)
+        if name:
+            names = [name]
+            if ':' not in name and '=' not in name:
+                names += ['cn=%s' % name, 'dns:%s' % name]
+            results |= queryset.filter(names__value__in=names)
+            use_distinct = True
+        return results, use_distinct
+
     def get_form(self, request, obj=None, **kwargs):
         if hasattr(request, '_resign_obj'):
             return ResignCertificateForm
@@ -585,8 +616,7 @@ class CertificateAdmin(DjangoObjectActions, CertificateMixin, admin.ModelAdmin):
     revoke_change.short_description = _('Revoke this certificate')
 
     def revoke(self, request, queryset):
-        for cert in queryset:
-            cert.revoke()
+        queryset.bulk_revoke()
     revoke.short_description = _('Revoke selected certificates')
 
     def get_change_actions(self, request, object_id, form_url):
@@ -662,14 +692,42 @@ class CertificateAdmin(DjangoObjectActions, CertificateMixin, admin.ModelAdmin):
                 'password': data['password'],
             }
 
+            # Jobs are stored in the database, so certificates for CAs with a password are always issued here
+            if ca_settings.CA_ASYNC_ISSUANCE and not data['password']:
+                del kwargs['password']
+                request._issuance_job = IssuanceJob.objects.init(**kwargs)
+                return
+
             obj.x509, req = self.model.objects.sign_cert(**kwargs)
-            obj.save()
+            with transaction.atomic():
+                obj.save()
+                record_event('post_issue_cert', [obj])
 
             # call signals
             post_issue_cert.send(sender=self.model, cert=obj)
         else:
             obj.save()
 
+    def save_related(self, request, form, formsets, change):
+        job = getattr(request, '_issuance_job', None)
+        if job is not None:
+            job.watchers.set(form.cleaned_data['watchers'])
+        else:
+            super(CertificateAdmin, self).save_related(request, form, formsets, change)
+
+    def log_addition(self, request, object, message):
+        # If the certificate is issued asynchronously, there is no certificate to log yet
+        object = getattr(request, '_issuance_job', object)
+        return super(CertificateAdmin, self).log_addition(request, object, message)
+
+    def response_add(self, request, obj, post_url_continue=None):
+        job = getattr(request, '_issuance_job', None)
+        if job is None:
+            return super(CertificateAdmin, self).response_add(request, obj, post_url_continue)
+
+        self.message_user(request, _('The certificate will be issued shortly.'), messages.SUCCESS)
+        return HttpResponseRedirect(reverse('admin:django_ca_issuancejob_change', args=(job.pk, )))
+
     class Media:
         css = {
             'all': (
@@ -680,3 +738,56 @@ class CertificateAdmin(DjangoObjectActions, CertificateMixin, admin.ModelAdmin):
         js = (
             'django_ca/admin/js/sign.js',
         )
+
+
+@admin.register(IssuanceJob)
+class IssuanceJobAdmin(admin.ModelAdmin):
+    list_display = ('pk', 'ca', 'status', 'created', 'duration', 'cert_display')
+    list_filter = ('status', 'ca')
+    fields = ['ca', 'status', 'cert_display', 'error', 'created', 'started', 'finished', 'duration', 'csr']
+    readonly_fields = fields
+
+    def has_add_permission(self, request):
+        return False
+
+    def cert_display(self, obj):
+        if obj.cert_id is None:
+            return ''
+        url = reverse('admin:django_ca_certificate_change', args=(obj.cert_id, ))
+        return mark_safe('<a href="%s">%s</a>' % (url, escape(obj.cert)))
+    cert_display.short_description = _('Certificate')
+
+    def has_status_permission(self, request):
+        # Users that may view jobs may also poll their status
+        if hasattr(self, 'has_view_or_change_permission'):  # pragma: only django>=2.1
+            return self.has_view_or_change_permission(request)
+        return self.has_change_permission(request)  # pragma: only django<2.1
+
+    def status_view(self, request, pk):
+        """Returns the current state of a job as JSON."""
+
+        if not self.has_status_permission(request):
+            raise PermissionDenied
+
+        try:
+            job = self.model.objects.select_related('ca', 'cert').get(pk=pk)
+        except self.model.DoesNotExist:
+            raise Http404
+
+        data = job.as_dict()
+        data['cert_url'] = None
+        if job.cert_id is not None:
+            data['cert_url'] = reverse('admin:django_ca_certificate_change', args=(job.cert_id, ))
+        return JsonResponse(data)
+
+    def get_urls(self):
+        urls = super(IssuanceJobAdmin, self).get_urls()
+        meta = self.model._meta
+        urls.insert(0, url(r'^(?P<pk>[0-9]+)/status/$', self.admin_site.admin_view(self.status_view),
+                           name='%s_%s_status' % (meta.app_label, meta.model_name)))
+        return urls
+
+    class Media:
+        js = (
+            'django_ca/admin/js/issuancejob.js',
+        )
@@ -20,3 +20,6 @@ from django.utils.translation import ugettext_lazy as _
 class DjangoCAConfig(AppConfig):
     name = 'django_ca'
     verbose_name = _('Certificate Authority')
+
+    def ready(self):
+        from . import receivers  # NOQA - connects signal receivers
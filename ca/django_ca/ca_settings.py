@@ -143,6 +143,16 @@ for name, profile in _CA_PROFILE_OVERRIDES.items():
 CA_DEFAULT_EXPIRES = getattr(settings, 'CA_DEFAULT_EXPIRES', 730)
 CA_DEFAULT_PROFILE = getattr(settings, 'CA_DEFAULT_PROFILE', 'webserver')
 CA_NOTIFICATION_DAYS = getattr(settings, 'CA_NOTIFICATION_DAYS', [14, 7, 3, 1, ])
+CA_CERTIFICATE_CACHE_SIZE = getattr(settings, 'CA_CERTIFICATE_CACHE_SIZE', 1000)
+CA_KEY_POOL = getattr(settings, 'CA_KEY_POOL', {})
+CA_KEY_POOL_PASSWORD = getattr(settings, 'CA_KEY_POOL_PASSWORD', None)
+CA_SIGNING_SOCKET = getattr(settings, 'CA_SIGNING_SOCKET', None)
+CA_SIGNING_BACKEND = getattr(settings, 'CA_SIGNING_BACKEND',
+                             'django_ca.signing.SocketBackend' if CA_SIGNING_SOCKET else None)
+CA_SIGNING_BACKEND_KWARGS = getattr(settings, 'CA_SIGNING_BACKEND_KWARGS', {})
+CA_ASYNC_ISSUANCE = getattr(settings, 'CA_ASYNC_ISSUANCE', False)
+CA_OUTBOX_HANDLERS = getattr(settings, 'CA_OUTBOX_HANDLERS', [])
+CA_OUTBOX_WEBHOOKS = getattr(settings, 'CA_OUTBOX_WEBHOOKS', [])
 
 # Undocumented options, e.g. to share values between different parts of code
 CA_MIN_KEY_SIZE = getattr(settings, 'CA_MIN_KEY_SIZE', 2048)
@@ -13,19 +13,174 @@
 # You should have received a copy of the GNU General Public License along with django-ca.  If not,
 # see <http://www.gnu.org/licenses/>.
 
+import time
 from datetime import datetime
 from datetime import timedelta
 
 from cryptography import x509
 from cryptography.hazmat.backends import default_backend
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.serialization import Encoding
 
+from django.core.cache import cache
+from django.db import transaction
 from django.utils import timezone
 
 from .models import Certificate
 from .models import CertificateAuthority
+from .models import CertificateRevocationList
+from .signing import sign_builder
+from .utils import get_revoked_certificate
+from .utils import hex_to_int
 
 
-def get_crl(ca, encoding, expires, algorithm, password, ca_crl=False):
+def get_crl_cache_key(serial, encoding, algorithm, ca_crl=False, delta=False):
+    """Get the cache key used for caching a CRL of the CA with the given serial.
+
+    The key is used by :py:class:`~django_ca.views.CertificateRevocationListView` and by ``manage.py
+    publish_crls`` to warm the cache.
+    """
+
+    cache_key = 'crl_%s_%s_%s' % (serial, encoding, algorithm.name)
+    if ca_crl is True:
+        cache_key += '_ca'
+    if delta is True:
+        cache_key += '_delta'
+    return cache_key
+
+
+def get_crl_cache_keys(serial, ca_crl=False):
+    """Get all cache keys that CRLs of the CA with the given serial might be cached with.
+
+    This includes keys for PEM and DER encoded full and delta CRLs signed with any SHA1 or SHA2 hash
+    algorithm.
+    """
+
+    algorithms = [hashes.SHA1(), hashes.SHA224(), hashes.SHA256(), hashes.SHA384(), hashes.SHA512()]
+    return [get_crl_cache_key(serial, encoding, algorithm, ca_crl=ca_crl, delta=delta)
+            for encoding in [Encoding.PEM, Encoding.DER]
+            for algorithm in algorithms
+            for delta in [False, True]]
+
+
+def get_cached_crl(cache_key):
+    """Get a CRL stored with :py:func:`cache_crl`.
+
+    Returns ``None`` if no CRL is cached, otherwise a tuple of the CRL and a boolean indicating if the CRL
+    should be regenerated. Values cached by previous versions (that cached only the CRL) are treated as if
+    no CRL was cached.
+    """
+
+    cached = cache.get(cache_key)
+    if not isinstance(cached, tuple) or len(cached) != 2:
+        return None
+
+    crl, refresh_at = cached
+    return crl, time.time() >= refresh_at
+
+
+def cache_crl(cache_key, crl, expires, lock_timeout=60):
+    """Cache a CRL until it expires.
+
+    The CRL should be regenerated ``lock_timeout`` seconds before it expires (but not before half of
+    ``expires`` has passed), so the previous CRL can still be served while a new one is generated.
+    """
+
+    refresh = max(expires - lock_timeout, expires / 2.)
+    cache.set(cache_key, (crl, time.time() + refresh), expires)
+
+
+def get_crl_timeout(crl, encoding):
+    """Get the number of seconds until the given CRL (as returned by :py:func:`get_crl`) expires.
+
+    Use this value to cache a CRL, as a CRL returned by :py:func:`get_crl` may have been generated earlier.
+    """
+
+    if encoding == Encoding.PEM:
+        crl = x509.load_pem_x509_crl(crl, default_backend())
+    else:
+        crl = x509.load_der_x509_crl(crl, default_backend())
+    return int((crl.next_update - datetime.utcnow()).total_seconds())
+
+
+def _get_stored_crl(state, revoked, expires, delta):
+    # Get the last CRL of the given type if it can be reused, that is if it has the same validity, less than
+    # half of its validity has passed and it still contains the same revoked certificates.
+    stored = state.delta_crl if delta is True else state.full_crl
+    if stored is None:
+        return None
+
+    crl = x509.load_der_x509_crl(bytes(stored), default_backend())
+    validity = timedelta(seconds=expires)
+    if crl.next_update - crl.last_update != validity or datetime.utcnow() >= crl.last_update + validity / 2:
+        return None
+
+    stored_revoked = set()
+    for revoked_cert in crl:
+        try:
+            reason = revoked_cert.extensions.get_extension_for_class(x509.CRLReason).value.reason.name
+        except x509.ExtensionNotFound:
+            reason = ''
+        stored_revoked.add((revoked_cert.serial_number, reason))
+    if stored_revoked != {(hex_to_int(serial), reason or '') for serial, date, reason in revoked}:
+        return None
+    return crl
+
+
+def _copy_crl(crl):
+    # Get a builder for a CRL with the same content as the given CRL (including the CRLNumber)
+    builder = x509.CertificateRevocationListBuilder()
+    builder = builder.issuer_name(crl.issuer)
+    builder = builder.last_update(crl.last_update)
+    builder = builder.next_update(crl.next_update)
+    for revoked in crl:
+        builder = builder.add_revoked_certificate(revoked)
+    for ext in crl.extensions:
+        builder = builder.add_extension(ext.value, critical=ext.critical)
+    return builder
+
+
+def _get_revoked(state, qs, delta):
+    # Get revoked certificates from database columns, so certificates don't have to be loaded
+    if delta is True:
+        qs = qs.filter(revoked_date__gte=state.full_last_update)
+    return list(qs.values_list('serial', 'revoked_date', 'revoked_reason'))
+
+
+def _generate_crl(ca, state, revoked, revoked_before, expires, algorithm, password, delta):
+    # Generate a new CRL with the next CRLNumber and store it in the (locked) state
+    now = datetime.utcnow()
+    builder = x509.CertificateRevocationListBuilder()
+    builder = builder.issuer_name(ca.x509.subject)
+    builder = builder.last_update(now)
+    builder = builder.next_update(now + timedelta(seconds=expires))
+
+    for serial, revoked_date, revoked_reason in revoked:
+        builder = builder.add_revoked_certificate(
+            get_revoked_certificate(serial, revoked_date, revoked_reason))
+
+    state.number += 1
+    builder = builder.add_extension(x509.CRLNumber(state.number), critical=False)
+    if delta is True:
+        builder = builder.add_extension(x509.DeltaCRLIndicator(state.full_number), critical=True)
+
+    # TODO: Add IssuingDistributionPoint extension
+    #   https://cryptography.io/en/latest/x509/reference/#cryptography.x509.IssuingDistributionPoint
+
+    crl = sign_builder(builder, ca.signing_key(password), algorithm)
+
+    if delta is True:
+        state.delta_crl = crl.public_bytes(Encoding.DER)
+    else:
+        state.full_number = state.number
+        state.full_last_update = revoked_before
+        state.full_crl = crl.public_bytes(Encoding.DER)
+        state.delta_crl = None  # the last delta CRL refers to the previous full CRL
+    state.save()
+    return crl
+
+
+def get_crl(ca, encoding, expires, algorithm, password, ca_crl=False, delta=False):
     """Function to generate a Certificate Revocation List (CRL).
 
     All keyword arguments are passed as-is to :py:func:`OpenSSL.crypto.CRL.export`. Please see the
@@ -46,6 +201,16 @@ def get_crl(ca, encoding, expires, algorithm, password, ca_crl=False):
         assumed to be unencrypted.
     ca_crl : boolean, optional
         If ``True``, add revoked child CAs instead of revoked certificates.
+    delta : boolean, optional
+        If ``True``, generate a delta CRL that only contains certificates revoked since the last full CRL. If
+        no full CRL was generated yet, a full CRL is generated first.
+
+    The last full and delta CRL are stored in a :py:class:`~django_ca.models.CertificateRevocationList`.
+    As long as less than half of its validity has passed and the revoked certificates did not change, the
+    stored CRL is returned again (signed with ``algorithm``, if it was signed with a different algorithm),
+    so that all encodings of a CRL have the same ``CRLNumber``. Otherwise a new CRL with the next
+    ``CRLNumber`` is generated. Use :py:func:`get_crl_timeout` to get the number of seconds until the
+    returned CRL expires.
 
     Returns
     -------
@@ -53,25 +218,29 @@ def get_crl(ca, encoding, expires, algorithm, password, ca_crl=False):
     bytes
         The CRL in the requested format.
     """
-    now = datetime.utcnow()
-    builder = x509.CertificateRevocationListBuilder()
-    builder = builder.issuer_name(ca.x509.subject)
-    builder = builder.last_update(now)
-    builder = builder.next_update(now + timedelta(seconds=expires))
 
     if ca_crl is True:
         qs = CertificateAuthority.objects.filter(parent=ca, expires__gt=timezone.now())
     else:
-        qs = CertificateAuthority.objects.filter(parent=ca, expires__gt=timezone.now())
         qs = Certificate.objects.filter(ca=ca, expires__gt=timezone.now())
+    qs = qs.revoked()
+    revoked_before = timezone.now()
 
-    for cert in qs.revoked():
-        builder = builder.add_revoked_certificate(cert.get_revocation())
+    with transaction.atomic():
+        # Lock the state, so that concurrent calls never issue the same CRLNumber twice
+        state = CertificateRevocationList.objects.select_for_update().get_or_create(
+            ca=ca, ca_crl=ca_crl)[0]
 
-    # TODO: Add CRLNumber extension
-    #   https://cryptography.io/en/latest/x509/reference/#cryptography.x509.CRLNumber
-    # TODO: Add IssuingDistributionPoint extension
-    #   https://cryptography.io/en/latest/x509/reference/#cryptography.x509.IssuingDistributionPoint
+        if delta is True and state.full_number is None:
+            # Delta CRLs refer to a full CRL, so we need one first
+            _generate_crl(ca, state, _get_revoked(state, qs, delta=False), revoked_before, expires,
+                          algorithm, password, delta=False)
+
+        revoked = _get_revoked(state, qs, delta)
+        crl = _get_stored_crl(state, revoked, expires, delta)
+        if crl is None:
+            crl = _generate_crl(ca, state, revoked, revoked_before, expires, algorithm, password, delta)
+        elif crl.signature_hash_algorithm.name != algorithm.name:
+            crl = sign_builder(_copy_crl(crl), ca.signing_key(password), algorithm)
 
-    crl = builder.sign(private_key=ca.key(password), algorithm=algorithm, backend=default_backend())
     return crl.public_bytes(encoding)
@@ -150,7 +150,7 @@ class CreateCertificateBaseForm(forms.ModelForm):
 
         # test the password
         try:
-            ca.key(password)
+            ca.test_signing_key(password)
         except Exception as e:
             self.add_error('password', str(e))
 
@@ -0,0 +1,184 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of django-ca (https://github.com/mathiasertl/django-ca).
+#
+# django-ca is free software: you can redistribute it and/or modify it under the terms of the GNU
+# General Public License as published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# django-ca is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without
+# even the implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with django-ca.  If not,
+# see <http://www.gnu.org/licenses/>.
+
+"""Pool of pre-generated private keys.
+
+Generating private keys (especially large RSA keys) may take several seconds. Keys configured with the
+:ref:`CA_KEY_POOL <settings-ca-key-pool>` setting can be generated ahead of time with ``manage.py
+refill_key_pool`` and are stored in the database until they are used, encrypted with
+:ref:`CA_KEY_POOL_PASSWORD <settings-ca-key-pool-password>`. The pool is only used if a password is set.
+"""
+
+import multiprocessing
+
+from cryptography.hazmat.backends import default_backend
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import dsa
+from cryptography.hazmat.primitives.asymmetric import ec
+from cryptography.hazmat.primitives.asymmetric import rsa
+from cryptography.hazmat.primitives.serialization import Encoding
+from cryptography.hazmat.primitives.serialization import PrivateFormat
+
+from django.utils.encoding import force_bytes
+
+from . import ca_settings
+from .models import PooledPrivateKey
+from .utils import parse_key_curve
+
+
+def get_key_spec(key_type='RSA', key_size=None, ecc_curve=None):
+    """Get the normalized key specification used for storing keys in the pool.
+
+    >>> get_key_spec('RSA', 4096)
+    ('RSA', 4096, '')
+    >>> get_key_spec('ECC', ecc_curve='SECP384R1')
+    ('ECC', None, 'SECP384R1')
+    """
+    if key_type == 'ECC':
+        return key_type, None, type(parse_key_curve(ecc_curve)).__name__
+    if key_type not in ['RSA', 'DSA']:
+        raise ValueError('%s: Unknown key type.' % key_type)
+
+    if key_size is None:
+        key_size = ca_settings.CA_DEFAULT_KEY_SIZE
+    return key_type, key_size, ''
+
+
+def parse_key_spec(value):
+    """Parse a key specification as used in the :ref:`CA_KEY_POOL <settings-ca-key-pool>` setting.
+
+    >>> parse_key_spec('RSA:4096')
+    ('RSA', 4096, '')
+    >>> parse_key_spec('ECC:SECP256R1')
+    ('ECC', None, 'SECP256R1')
+    """
+    key_type, _sep, param = value.partition(':')
+    key_type = key_type.strip().upper()
+    if key_type == 'ECC':
+        return get_key_spec(key_type, ecc_curve=param.strip() or None)
+
+    try:
+        key_size = int(param) if param.strip() else None
+    except ValueError:
+        raise ValueError('%s: Key size must be an integer.' % value)
+    return get_key_spec(key_type, key_size)
+
+
+def is_enabled():
+    """Return ``True`` if the key pool is used, that is if a password to encrypt keys is configured."""
+
+    return bool(ca_settings.CA_KEY_POOL_PASSWORD)
+
+
+def get_password():
+    if not is_enabled():
+        raise ValueError('Please set the CA_KEY_POOL_PASSWORD setting to use the key pool.')
+    return force_bytes(ca_settings.CA_KEY_POOL_PASSWORD)
+
+
+def generate_private_key(key_type='RSA', key_size=None, ecc_curve=None):
+    """Generate a new private key.
+
+    Parameters
+    ----------
+
+    key_type : str, optional
+        The type of private key, one of ``"RSA"`` (the default), ``"DSA"`` or ``"ECC"``.
+    key_size : int, optional
+        The key size for RSA and DSA keys.
+    ecc_curve : str or EllipticCurve, optional
+        The elliptic curve for ECC keys, passed to :py:func:`~django_ca.utils.parse_key_curve`.
+    """
+    key_type, key_size, ecc_curve = get_key_spec(key_type, key_size, ecc_curve)
+
+    if key_type == 'DSA':
+        return dsa.generate_private_key(key_size=key_size, backend=default_backend())
+    elif key_type == 'ECC':
+        return ec.generate_private_key(parse_key_curve(ecc_curve), default_backend())
+    else:
+        return rsa.generate_private_key(public_exponent=65537, key_size=key_size, backend=default_backend())
+
+
+def _generate_pooled_key(args):
+    key_type, key_size, ecc_curve, password = args
+    private_key = generate_private_key(key_type, key_size, ecc_curve)
+    return private_key.private_bytes(Encoding.DER, PrivateFormat.PKCS8,
+                                     serialization.BestAvailableEncryption(password))
+
+
+def get_private_key(key_type='RSA', key_size=None, ecc_curve=None):
+    """Get a private key from the pool or generate a new one if there is no key left.
+
+    Parameters are the same as for :py:func:`generate_private_key`. If the pool is not enabled (see
+    :py:func:`is_enabled`), a new key is always generated.
+    """
+    key_type, key_size, ecc_curve = get_key_spec(key_type, key_size, ecc_curve)
+    if not is_enabled():
+        return generate_private_key(key_type, key_size, ecc_curve)
+
+    qs = PooledPrivateKey.objects.filter(key_type=key_type, key_size=key_size, ecc_curve=ecc_curve)
+
+    for pk, data in qs.order_by('pk').values_list('pk', 'key')[:5]:
+        # Only the process that actually deletes the key may use it, so a key is never used twice.
+        deleted, _rows = PooledPrivateKey.objects.filter(pk=pk).delete()
+        if deleted:
+            return serialization.load_der_private_key(bytes(data), get_password(), default_backend())
+
+    return generate_private_key(key_type, key_size, ecc_curve)
+
+
+def refill(processes=1):
+    """Generate missing keys for the pool as configured by :ref:`CA_KEY_POOL <settings-ca-key-pool>`.
+
+    Parameters
+    ----------
+
+    processes : int, optional
+        Number of worker processes used for generating keys. If ``1`` (the default), keys are generated in
+        the current process.
+
+    Returns
+    -------
+
+    dict
+        A dictionary mapping the configured key specifications to the number of generated keys.
+    """
+    password = get_password()
+    generated = {}
+    tasks = []
+    for value, count in ca_settings.CA_KEY_POOL.items():
+        key_type, key_size, ecc_curve = parse_key_spec(value)
+        existing = PooledPrivateKey.objects.filter(
+            key_type=key_type, key_size=key_size, ecc_curve=ecc_curve).count()
+
+        missing = max(count - existing, 0)
+        generated[value] = missing
+        tasks += [(key_type, key_size, ecc_curve, password)] * missing
+
+    if processes == 1:
+        keys = [_generate_pooled_key(t) for t in tasks]
+    else:
+        pool = multiprocessing.Pool(processes)
+        try:
+            keys = pool.map(_generate_pooled_key, tasks)
+        finally:
+            pool.terminate()
+            pool.join()
+
+    PooledPrivateKey.objects.bulk_create([
+        PooledPrivateKey(key_type=key_type, key_size=key_size, ecc_curve=ecc_curve, key=key)
+        for (key_type, key_size, ecc_curve, _password), key in zip(tasks, keys)
+    ])
+    return generated
@@ -125,6 +125,10 @@ class CertificateAction(argparse.Action):
         self.allow_revoked = allow_revoked
 
     def __call__(self, parser, namespace, value, option_string=None):
+        if value is None:  # optional positional argument (nargs='?') that was not given
+            setattr(namespace, self.dest, value)
+            return
+
         queryset = Certificate.objects.all()
         if self.allow_revoked is False:
             queryset = queryset.filter(revoked=False)
@@ -341,7 +345,7 @@ class BaseCommand(_BaseCommand):
 
     def test_private_key(self, ca, password):
         try:
-            ca.key(password)
+            ca.test_signing_key(password)
         except Exception as e:
             raise CommandError(str(e))
 
@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of django-ca (https://github.com/mathiasertl/django-ca).
+#
+# django-ca is free software: you can redistribute it and/or modify it under the terms of the GNU
+# General Public License as published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# django-ca is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without
+# even the implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with django-ca.  If not,
+# see <http://www.gnu.org/licenses/>.
+
+import os
+import time
+from multiprocessing.pool import ThreadPool
+
+from django.core.management.base import CommandError
+
+from ...signing import get_signing_backend
+from ...signing import sign_data
+from ...utils import ca_storage
+from ..base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = """Compare the signing throughput of the configured CA_SIGNING_BACKEND with the private key stored
+in CA_FILE_STORAGE."""
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '-n', '--count', type=int, default=1000, metavar='N',
+            help='Create N signatures with every key (default: %(default)s).')
+        parser.add_argument(
+            '-j', '--jobs', type=int, default=1, metavar='N',
+            help='Sign in N threads at the same time (default: %(default)s).')
+        self.add_algorithm(parser)
+        self.add_ca(parser)
+        self.add_password(parser)
+
+    def benchmark(self, name, key, algorithm, count, jobs):
+        # Roughly the size of the data signed for a typical certificate
+        data = os.urandom(1024)
+
+        pool = ThreadPool(jobs)
+        start = time.time()
+        try:
+            pool.map(lambda i: sign_data(key, data, algorithm), range(count))
+        except Exception as e:
+            raise CommandError('%s: %s' % (name, e))
+        finally:
+            pool.close()
+            pool.join()
+
+        elapsed = time.time() - start
+        self.stdout.write('%s: Created %s signatures in %.2f seconds (%.1f signatures per second).' % (
+            name, count, elapsed, count / elapsed))
+
+    def handle(self, ca, password, algorithm, count, jobs, **options):
+        if count < 1:
+            raise CommandError('--count must be at least 1.')
+        if jobs < 1:
+            raise CommandError('--jobs must be at least 1.')
+
+        path = ca.private_key_path
+        if os.path.isabs(path):
+            exists = os.path.exists(path)
+        else:
+            exists = ca_storage.exists(path)
+
+        if exists:
+            try:
+                key = ca.key(password)
+            except Exception as e:
+                raise CommandError(str(e))
+            self.benchmark('file', key, algorithm, count, jobs)
+        else:
+            self.stdout.write('file: Private key not found.')
+
+        backend = get_signing_backend()
+        if backend is None:
+            self.stdout.write('No signing backend configured.')
+        else:
+            self.benchmark(type(backend).__name__, ca.signing_key(password), algorithm, count, jobs)
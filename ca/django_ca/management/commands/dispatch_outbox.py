@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of django-ca (https://github.com/mathiasertl/django-ca).
+#
+# django-ca is free software: you can redistribute it and/or modify it under the terms of the GNU
+# General Public License as published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# django-ca is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without
+# even the implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with django-ca.  If not,
+# see <http://www.gnu.org/licenses/>.
+
+import time
+
+from django.core.management.base import CommandError
+
+from ...outbox import dispatch
+from ...outbox import is_enabled
+from ..base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = """Deliver events stored in the outbox to the handlers and webhooks configured with the
+CA_OUTBOX_HANDLERS and CA_OUTBOX_WEBHOOKS settings.
+
+Events that could not be delivered are delivered again later with an exponential backoff."""
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=100, metavar='N',
+            help='Deliver up to N events at once (default: %(default)s).')
+        parser.add_argument(
+            '--timeout', type=int, default=10, metavar='SECONDS',
+            help='Timeout for requests to webhooks (default: %(default)s).')
+        parser.add_argument(
+            '--interval', type=float, metavar='SECONDS',
+            help='Keep running and check for new events every SECONDS seconds.')
+
+    def dispatch(self, batch_size, timeout):
+        start = time.time()
+        delivered = failed = 0
+
+        while True:
+            batch_delivered, batch_failed = dispatch(batch_size=batch_size, timeout=timeout)
+            delivered += batch_delivered
+            failed += batch_failed
+
+            # Stop if there are no more events or the receivers are failing
+            if batch_delivered == 0:
+                break
+
+        if delivered or failed:
+            self.stdout.write('Delivered %s events in %.2f seconds, %s failed.' % (
+                delivered, time.time() - start, failed))
+
+    def handle(self, batch_size, timeout, interval, **options):
+        if not is_enabled():
+            raise CommandError('Please set the CA_OUTBOX_HANDLERS or CA_OUTBOX_WEBHOOKS setting.')
+        if batch_size < 1:
+            raise CommandError('--batch-size must be at least 1.')
+        if interval is not None and interval <= 0:
+            raise CommandError('%s: Interval must be greater than 0.' % interval)
+
+        while True:
+            self.dispatch(batch_size, timeout)
+            if interval is None:
+                break
+
+            try:
+                time.sleep(interval)
+            except KeyboardInterrupt:
+                break
@@ -31,6 +31,10 @@ class Command(BaseCommand):
                             help='Path for the output file. Use "-" for stdout.')
         parser.add_argument('--ca-crl', action='store_true', default=False,
                             help="Generate the CRL for revoked child CAs.")
+        parser.add_argument(
+            '--delta', action='store_true', default=False,
+            help="Generate a delta CRL with certificates revoked since the last full CRL (a full CRL is "
+                 "generated first if there is none).")
         self.add_algorithm(parser)
         self.add_format(parser)
         self.add_ca(parser, allow_disabled=True)
@@ -44,6 +48,7 @@ class Command(BaseCommand):
             'algorithm': options['algorithm'],
             'password': options['password'],
             'ca_crl': options['ca_crl'],
+            'delta': options['delta'],
         }
 
         # See if we can work with the private key
@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of django-ca (https://github.com/mathiasertl/django-ca).
+#
+# django-ca is free software: you can redistribute it and/or modify it under the terms of the GNU
+# General Public License as published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# django-ca is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without
+# even the implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with django-ca.  If not,
+# see <http://www.gnu.org/licenses/>.
+
+import binascii
+import multiprocessing
+import os
+import time
+
+from asn1crypto.x509 import Certificate as Asn1Certificate
+from cryptography.hazmat.primitives.serialization import Encoding
+
+from django.conf import settings
+from django.core.management.base import CommandError
+from django.utils import timezone
+
+from ... import ca_settings
+from ...models import Certificate
+from ...models import CertificateAuthority
+from ...ocsp import sign_responses
+from ...utils import write_file_atomic
+from ...views import OCSPView
+from ..base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = """Pre-generate signed OCSP responses for all certificates that have not yet expired.
+
+Responses are generated for every OCSP responder configured in the CA_OCSP_URLS setting and written to
+PATH/<responder>/<issuer name hash>/<issuer key hash>/<serial>.der, where responder is the key in
+CA_OCSP_URLS, the hashes are the hex-encoded SHA1 hashes used in OCSP requests and the serial is the
+hex-encoded serial without colons."""
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Directory where responses are written to.')
+        parser.add_argument(
+            '--responder', metavar='NAME', action='append', default=[], dest='responders',
+            help='Only generate responses for the given key in CA_OCSP_URLS (may be given multiple times).')
+        parser.add_argument(
+            '-j', '--jobs', type=int, default=multiprocessing.cpu_count(), metavar='N',
+            help='Number of processes used for signing responses (default: %(default)s).')
+
+    def get_views(self, responders):
+        ocsp_urls = getattr(settings, 'CA_OCSP_URLS', {})
+        for name in responders:
+            if name not in ocsp_urls:
+                raise CommandError('%s: Not configured in CA_OCSP_URLS.' % name)
+
+        for name, kwargs in sorted(ocsp_urls.items()):
+            if responders and name not in responders:
+                continue
+
+            kwargs = dict(kwargs)
+            kwargs.setdefault('ca', name)
+            yield name, OCSPView(**kwargs)
+
+    def handle(self, path, responders, jobs, **options):
+        if ca_settings.CRYPTOGRAPHY_OCSP is False:  # pragma: only cryptography<2.4
+            raise CommandError('This command requires cryptography>=2.4.')
+        if jobs < 1:
+            raise CommandError('%s: Number of jobs must be at least 1.' % jobs)
+
+        for name, view in self.get_views(responders):
+            try:
+                ca = view.get_ca()
+            except CertificateAuthority.DoesNotExist:
+                raise CommandError('%s: Certificate Authority could not be found.' % view.ca)
+
+            try:
+                responder_key = view.get_responder_key()
+                responder_cert = view.get_responder_cert()
+            except Exception as e:
+                raise CommandError('%s: Could not read responder key/cert: %s' % (name, e))
+
+            # The hashes identifying the issuer in OCSP requests. Responses are written to a separate
+            # directory for every responder, as several responders may answer requests for the same CA.
+            issuer = Asn1Certificate.load(ca.dump_certificate(Encoding.DER))
+            name_hash = binascii.hexlify(issuer.subject.sha1).decode('utf-8')
+            key_hash = binascii.hexlify(issuer.public_key.sha1).decode('utf-8')
+            directory = os.path.join(path, name, name_hash, key_hash)
+            if not os.path.exists(directory):
+                os.makedirs(directory)
+
+            if view.ca_ocsp is True:
+                qs = CertificateAuthority.objects.filter(parent=ca)
+            else:
+                qs = Certificate.objects.filter(ca=ca)
+            qs = qs.filter(expires__gt=timezone.now())
+
+            start = time.time()
+            count = 0
+            responses = sign_responses(qs.iterator(), ca.x509, responder_key, responder_cert, view.expires,
+                                       processes=jobs)
+            for serial, response in responses:
+                write_file_atomic(os.path.join(directory, '%s.der' % serial.replace(':', '')), response)
+                count += 1
+
+            self.stdout.write('%s: Wrote %s responses to %s in %.2f seconds.' % (
+                name, count, directory, time.time() - start))
@@ -35,7 +35,7 @@ class Command(BaseCommand):
         now = datetime.utcnow()
         expires = now + timedelta(days=options['days'] + 1)  # add a day to avoid one-of errors
 
-        qs = Certificate.objects.valid().filter(expires__lt=expires)
+        qs = Certificate.objects.light().valid().filter(expires__lt=expires)
         for cert in qs:
             days = (cert.expires - now).days
 
@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of django-ca (https://github.com/mathiasertl/django-ca).
+#
+# django-ca is free software: you can redistribute it and/or modify it under the terms of the GNU
+# General Public License as published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# django-ca is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without
+# even the implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with django-ca.  If not,
+# see <http://www.gnu.org/licenses/>.
+
+import os
+import time
+
+from cryptography import x509
+from cryptography.hazmat.backends import default_backend
+from cryptography.hazmat.primitives.serialization import Encoding
+
+from django.core.management.base import CommandError
+
+from ...crl import cache_crl
+from ...crl import get_crl
+from ...crl import get_crl_cache_key
+from ...crl import get_crl_timeout
+from ...models import CertificateAuthority
+from ...utils import write_file_atomic
+from ..base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = """Generate CRLs for all enabled certificate authorities and publish them.
+
+CRLs are written to PATH/<serial>.der and PATH/<serial>.pem, CRLs for revoked child CAs to
+PATH/<serial>.ca.der and PATH/<serial>.ca.pem, where serial is the hex-encoded serial without colons. Files
+are replaced atomically, so clients never read a partially written CRL. The CRLs are also stored in the
+cache used by CertificateRevocationListView."""
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Directory where CRLs are written to.')
+        parser.add_argument(
+            '-e', '--expires', type=int, default=86400, metavar='SECONDS',
+            help="Seconds until a new CRL will be available (default: %(default)s).")
+        parser.add_argument(
+            '--interval', type=int, metavar='SECONDS',
+            help='Keep running and publish new CRLs every SECONDS seconds. Must be smaller than --expires.')
+        self.add_algorithm(parser)
+
+    def publish(self, ca, path, expires, algorithm, ca_crl=False):
+        der = get_crl(ca, encoding=Encoding.DER, expires=expires, algorithm=algorithm, password=None,
+                      ca_crl=ca_crl)
+        pem = x509.load_der_x509_crl(der, default_backend()).public_bytes(Encoding.PEM)
+        timeout = get_crl_timeout(der, Encoding.DER)  # the CRL may have been generated earlier
+
+        basename = ca.serial.replace(':', '')
+        if ca_crl is True:
+            basename += '.ca'
+
+        for encoding, ext, data in [(Encoding.DER, 'der', der), (Encoding.PEM, 'pem', pem)]:
+            write_file_atomic(os.path.join(path, '%s.%s' % (basename, ext)), data)
+            cache_crl(get_crl_cache_key(ca.serial, encoding, algorithm, ca_crl=ca_crl), data, timeout)
+
+    def publish_all(self, path, expires, algorithm):
+        for ca in CertificateAuthority.objects.enabled():
+            if not ca.key_exists:
+                self.stderr.write('%s: Private key does not exist.' % ca.serial)
+                continue
+
+            start = time.time()
+            try:
+                self.publish(ca, path, expires, algorithm)
+                self.publish(ca, path, expires, algorithm, ca_crl=True)
+            except Exception as e:
+                self.stderr.write('%s: Could not generate CRL: %s' % (ca.serial, e))
+                continue
+
+            self.stdout.write('%s: Published CRLs in %.2f seconds.' % (ca.serial, time.time() - start))
+
+    def handle(self, path, expires, interval, algorithm, **options):
+        if interval is not None and not 0 < interval < expires:
+            raise CommandError('%s: Interval must be greater than 0 and smaller than --expires.' % interval)
+
+        if not os.path.exists(path):
+            os.makedirs(path)
+
+        while True:
+            self.publish_all(path, expires, algorithm)
+            if interval is None:
+                break
+
+            try:
+                time.sleep(interval)
+            except KeyboardInterrupt:
+                break
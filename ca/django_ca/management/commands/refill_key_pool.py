@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of django-ca (https://github.com/mathiasertl/django-ca).
+#
+# django-ca is free software: you can redistribute it and/or modify it under the terms of the GNU
+# General Public License as published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# django-ca is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without
+# even the implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with django-ca.  If not,
+# see <http://www.gnu.org/licenses/>.
+
+import multiprocessing
+import time
+
+from django.core.management.base import CommandError
+
+from ... import ca_settings
+from ...keypool import is_enabled
+from ...keypool import refill
+from ..base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = """Generate private keys for the key pool configured with the CA_KEY_POOL setting.
+
+Keys are encrypted with the CA_KEY_POOL_PASSWORD setting, which must be set.
+
+Keys from the pool are used when creating new certificate authorities, so that they don't have to be generated
+when the CA is created."""
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '-j', '--jobs', type=int, default=multiprocessing.cpu_count(), metavar='N',
+            help='Generate keys in N processes (default: %(default)s).')
+        parser.add_argument(
+            '--interval', type=int, metavar='SECONDS',
+            help='Keep running and refill the pool every SECONDS seconds.')
+
+    def refill(self, jobs):
+        start = time.time()
+        try:
+            generated = refill(processes=jobs)
+        except ValueError as e:
+            raise CommandError(e)
+
+        for spec, count in sorted(generated.items()):
+            self.stdout.write('%s: Generated %s keys.' % (spec, count))
+        self.stdout.write('Refilled key pool in %.2f seconds.' % (time.time() - start))
+
+    def handle(self, jobs, interval, **options):
+        if not ca_settings.CA_KEY_POOL:
+            raise CommandError('The CA_KEY_POOL setting is empty.')
+        if not is_enabled():
+            raise CommandError('Please set the CA_KEY_POOL_PASSWORD setting to use the key pool.')
+        if jobs < 1:
+            raise CommandError('--jobs must be at least 1.')
+        if interval is not None and interval <= 0:
+            raise CommandError('%s: Interval must be greater than 0.' % interval)
+
+        while True:
+            self.refill(jobs)
+            if interval is None:
+                break
+
+            try:
+                time.sleep(interval)
+            except KeyboardInterrupt:
+                break
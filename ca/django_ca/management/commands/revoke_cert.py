@@ -13,15 +13,93 @@
 # You should have received a copy of the GNU General Public License along with django-ca.  If not,
 # see <http://www.gnu.org/licenses/>.
 
-from django_ca.management.base import CertCommand
+import sys
 
+from django.core.management.base import CommandError
+from django.db import transaction
 
-class Command(CertCommand):
-    help = "Revoke a certificate."
+from ...models import Certificate
+from ...models import CertificateAuthority
+from ...utils import pad_serial
+from ..base import BaseCommand
+from ..base import CertificateAction
+
+
+class Command(BaseCommand):
+    help = """Revoke a certificate.
+
+Use --filter, --ca and/or --from-file instead of naming a certificate to revoke many certificates at once."""
+
+    serials_chunk_size = 900
 
     def add_arguments(self, parser):
         parser.add_argument('--reason', help="An optional reason for revokation.")
+        parser.add_argument(
+            'cert', nargs='?', action=CertificateAction,
+            help='''Certificate by CommonName or serial. If you give a CommonName (which is not by
+                definition unique) there must be only one valid certificate with the given
+                CommonName.''')
+
+        group = parser.add_argument_group(
+            'Bulk revocation', 'Revoke all certificates matching the given options at once.')
+        group.add_argument(
+            '--filter', metavar='NAME',
+            help='Revoke certificates containing the given name, e.g. "dns:example.com" or "cn=example.com".')
+        group.add_argument('--ca', metavar='SERIAL',
+                           help='Revoke certificates issued by the given certificate authority.')
+        group.add_argument(
+            '--from-file', metavar='PATH',
+            help='Revoke certificates with the serials listed in PATH (one per line, "-" for stdin).')
         super(Command, self).add_arguments(parser)
 
-    def handle(self, cert, **options):
-        cert.revoke(reason=options.get('reason'))
+    def read_serials(self, path):
+        if path == '-':
+            lines = sys.stdin.readlines()
+        else:
+            with open(path) as stream:
+                lines = stream.readlines()
+
+        serials = []
+        for line in lines:
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+
+            try:
+                serials.append(pad_serial(line))
+            except ValueError:
+                raise CommandError('%s: Not a valid serial.' % line)
+        return serials
+
+    def handle(self, cert, reason, filter, ca, from_file, **options):
+        bulk = filter is not None or ca is not None or from_file is not None
+        if cert is not None:
+            if bulk:
+                raise CommandError('Cannot name a certificate when using --filter, --ca or --from-file.')
+            cert.revoke(reason=reason)
+            return
+        elif not bulk:
+            raise CommandError('Please name a certificate or use --filter, --ca or --from-file.')
+
+        qs = Certificate.objects.all()
+        if filter is not None:
+            qs = qs.with_name(filter)
+        if ca is not None:
+            try:
+                qs = qs.filter(ca=CertificateAuthority.objects.get_by_serial_or_cn(ca))
+            except CertificateAuthority.DoesNotExist:
+                raise CommandError('%s: Certificate authority not found.' % ca)
+            except CertificateAuthority.MultipleObjectsReturned:
+                raise CommandError('%s: Multiple Certificate authorities match.' % ca)
+        if from_file is None:
+            count = qs.bulk_revoke(reason=reason)
+        else:
+            # Look up serials in chunks, as databases limit the number of query parameters
+            serials = self.read_serials(from_file)
+            count = 0
+            with transaction.atomic():
+                for i in range(0, len(serials), self.serials_chunk_size):
+                    chunk = serials[i:i + self.serials_chunk_size]
+                    count += qs.filter(serial_hex__in=chunk).bulk_revoke(reason=reason)
+
+        self.stdout.write('Revoked %s certificates.' % count)
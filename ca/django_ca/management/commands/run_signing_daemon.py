@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of django-ca (https://github.com/mathiasertl/django-ca).
+#
+# django-ca is free software: you can redistribute it and/or modify it under the terms of the GNU
+# General Public License as published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# django-ca is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without
+# even the implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with django-ca.  If not,
+# see <http://www.gnu.org/licenses/>.
+
+import multiprocessing
+
+from django.core.management.base import CommandError
+
+from ... import ca_settings
+from ...signing import SigningServer
+from ..base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = """Run a daemon that signs certificates, CRLs and OCSP responses.
+
+Private keys are loaded only once by the daemon and not by every process that signs data. Processes use the
+daemon if the CA_SIGNING_SOCKET setting is set. Only private keys of certificate authorities and OCSP
+views in the URL configuration are used."""
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--socket', default=ca_settings.CA_SIGNING_SOCKET, metavar='PATH',
+            help='Path of the unix socket to listen on (default: %(default)s).')
+        parser.add_argument(
+            '-w', '--workers', type=int, default=multiprocessing.cpu_count(), metavar='N',
+            help='Handle at most N requests at the same time (default: %(default)s).')
+        parser.add_argument(
+            '--queue-size', type=int, metavar='N',
+            help='Reject requests if N requests are waiting to be handled (default: four per worker).')
+
+    def handle(self, socket, workers, queue_size, **options):
+        if not socket:
+            raise CommandError('Please set the CA_SIGNING_SOCKET setting or pass --socket.')
+        if workers < 1:
+            raise CommandError('--workers must be at least 1.')
+        if queue_size is not None and queue_size < 0:
+            raise CommandError('--queue-size must not be negative.')
+
+        server = SigningServer(socket, workers=workers, queue_size=queue_size)
+        self.stdout.write('Listening on %s with %s workers.' % (socket, workers))
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of django-ca (https://github.com/mathiasertl/django-ca).
+#
+# django-ca is free software: you can redistribute it and/or modify it under the terms of the GNU
+# General Public License as published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# django-ca is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without
+# even the implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with django-ca.  If not,
+# see <http://www.gnu.org/licenses/>.
+
+import time
+
+from django.core.management.base import CommandError
+
+from ...models import IssuanceJob
+from ..base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = """Issue certificates for pending issuance jobs.
+
+Jobs are created by the admin interface if the CA_ASYNC_ISSUANCE setting is True. You can run several workers
+at the same time, a job is only ever claimed by one worker."""
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '-j', '--jobs', type=int, default=1, metavar='N',
+            help='Sign certificates in N threads (default: %(default)s).')
+        parser.add_argument(
+            '--batch-size', type=int, default=100, metavar='N',
+            help='Claim up to N jobs at once (default: %(default)s).')
+        parser.add_argument(
+            '--interval', type=float, default=1, metavar='SECONDS',
+            help='Check for new jobs every SECONDS seconds if there are no pending jobs (default: '
+                 '%(default)s).')
+        parser.add_argument(
+            '--lease', type=int, default=300, metavar='SECONDS',
+            help='Lease claimed jobs for SECONDS seconds. The lease is renewed while certificates are '
+                 'signed, jobs of workers that where killed are claimed again once their lease expired '
+                 '(default: %(default)s).')
+        parser.add_argument(
+            '--once', default=False, action='store_true',
+            help='Exit once there are no more pending jobs.')
+
+    def process(self, batch_size, jobs, lease):
+        start = time.time()
+        claimed = IssuanceJob.objects.claim(batch_size, lease=lease)
+        if not claimed:
+            return 0
+
+        failed = IssuanceJob.objects.run(claimed, processes=jobs, lease=lease)
+        self.stdout.write('Processed %s jobs in %.2f seconds, %s failed.' % (
+            len(claimed), time.time() - start, failed))
+        return len(claimed)
+
+    def handle(self, jobs, batch_size, interval, lease, once, **options):
+        if jobs < 1:
+            raise CommandError('--jobs must be at least 1.')
+        if batch_size < 1:
+            raise CommandError('--batch-size must be at least 1.')
+        if interval <= 0:
+            raise CommandError('%s: Interval must be greater than 0.' % interval)
+        if lease < 1:
+            raise CommandError('--lease must be at least 1.')
+
+        while True:
+            if self.process(batch_size, jobs, lease):
+                continue  # there might be more pending jobs
+            if once:
+                break
+
+            try:
+                time.sleep(interval)
+            except KeyboardInterrupt:
+                break
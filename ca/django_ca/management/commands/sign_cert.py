@@ -13,6 +13,15 @@
 # You should have received a copy of the GNU General Public License along with django-ca.  If not,
 # see <http://www.gnu.org/licenses/>.
 
+import os
+import time
+from itertools import islice
+
+from cryptography import x509
+from cryptography.hazmat.backends import default_backend
+from cryptography.hazmat.primitives.serialization import Encoding
+from cryptography.x509.oid import NameOID
+
 from django.core.management.base import CommandError
 from django.utils import six
 
@@ -31,11 +40,14 @@ default profile, currently %s.""" % ca_settings.CA_DEFAULT_PROFILE
     add_extensions_help = '''Values for more complex x509 extensions. This is for advanced usage only, the
 profiles already set the correct values for the most common use cases. See
 https://django-ca.readthedocs.io/en/latest/extensions.html for more information.'''
+
     subject_help = '''The certificate subject of the CSR is not used. The default subject is configured
             with the CA_DEFAULT_SUBJECT setting and may be overwritten by a profile named with
             --profile. The --subject option allows you to name a CommonName (which is not usually
             in the defaults) and override any default values.'''
 
+    csrs_chunk_size = 100  # per job
+
     def add_cn_in_san(self, parser):
         default = ca_settings.CA_PROFILES[ca_settings.CA_DEFAULT_PROFILE]['cn_in_san']
 
@@ -64,6 +76,18 @@ https://django-ca.readthedocs.io/en/latest/extensions.html for more information.
         self.add_format(parser, opts=['--csr-format'],
                         help_text='Format of the CSR ("ASN1" is an alias for "DER", default: %(default)s)')
 
+        group = parser.add_argument_group(
+            'Batch mode', '''Sign many CSRs at once. The CommonName of each certificate is taken from its CSR
+            unless you give one with --subject.''')
+        group.add_argument('--csr-dir', metavar='DIR', help='Sign all CSRs in DIR.')
+        group.add_argument('--csr-list', metavar='FILE',
+                           help='Sign all CSRs listed in FILE, with one path per line.')
+        group.add_argument('--out-dir', metavar='DIR',
+                           help='''Save signed certificates to DIR, named like the CSR with a ".pem" suffix.
+                           CSRs with the same name are signed only once.''')
+        group.add_argument('-j', '--jobs', type=int, default=1, metavar='N',
+                           help='Sign certificates in N threads (default: %(default)s).')
+
         group = parser.add_argument_group(
             'profiles', """Sign certificate based on the given profile. A profile only sets the
 the default values, options like --key-usage still override the profile.""")
@@ -98,6 +122,9 @@ the default values, options like --key-usage still override the profile.""")
             # TODO: Update value
             kwargs['subject'] = options['subject']  # update from command line
 
+        if options['csr_dir'] or options['csr_list']:
+            return self.handle_batch(watchers, kwargs, **options)
+
         if 'CN' not in kwargs['subject'] and not options['alt']:
             raise CommandError("Must give at least a CN in --subject or one or more --alt arguments.")
 
@@ -126,3 +153,100 @@ the default values, options like --key-usage still override the profile.""")
                 f.write(cert.pub)
         else:
             self.stdout.write(cert.pub)
+
+    def get_csr_paths(self, csr_dir, csr_list):
+        if csr_dir:
+            for name in sorted(os.listdir(csr_dir)):
+                path = os.path.join(csr_dir, name)
+                if os.path.isfile(path):
+                    yield path
+        else:
+            with open(csr_list) as stream:
+                for line in stream:
+                    if line.strip():
+                        yield line.strip()
+
+    def get_subject(self, csr, subject, csr_format):
+        subject = subject.copy()
+        if 'CN' not in subject:
+            if csr_format == Encoding.DER:
+                req = x509.load_der_x509_csr(csr, default_backend())
+            else:
+                req = x509.load_pem_x509_csr(csr, default_backend())
+
+            cn = req.subject.get_attributes_for_oid(NameOID.COMMON_NAME)
+            if cn:
+                subject['CN'] = cn[0].value
+        return subject
+
+    def handle_batch(self, watchers, kwargs, **options):
+        ca = options['ca']
+
+        if options['csr_dir'] and options['csr_list']:
+            raise CommandError('--csr-dir and --csr-list cannot be used together.')
+        if options['csr'] or options['out']:
+            raise CommandError('--csr and --out cannot be used with --csr-dir or --csr-list.')
+        if not options['out_dir']:
+            raise CommandError('--out-dir is required with --csr-dir or --csr-list.')
+        if options['jobs'] < 1:
+            raise CommandError('--jobs must be at least 1.')
+
+        jobs = options['jobs']
+        paths = self.get_csr_paths(options['csr_dir'], options['csr_list'])
+        signed = failed = 0
+        names = set()  # names of output files, to detect CSRs in different directories with the same name
+        start = time.time()
+
+        # Load the private key only once, not for every chunk (test_options() already made sure it loads)
+        private_key = ca.signing_key(kwargs['password'])
+
+        # CSRs are signed in chunks, so that certificates can be matched to the file they where read from
+        chunk = list(islice(paths, self.csrs_chunk_size * jobs))
+        while chunk:
+            items = []
+            for path in chunk:
+                name = '%s.pem' % os.path.splitext(os.path.basename(path))[0]
+                if name in names:
+                    self.stderr.write(self.style.ERROR(
+                        '%s: Another CSR is also saved as %s, not signing it.' % (path, name)))
+                    failed += 1
+                    continue
+                names.add(name)
+
+                try:
+                    with open(path, 'rb') as stream:
+                        csr = stream.read()
+                    subject = self.get_subject(csr, kwargs['subject'], kwargs['csr_format'])
+                    items.append((path, name, (csr, {'subject': subject})))
+                except Exception as e:
+                    self.stderr.write(self.style.ERROR('%s: %s' % (path, e)))
+                    failed += 1
+
+            errors = {}
+
+            def on_error(item, e):
+                errors[id(item)] = e
+
+            certs = iter(Certificate.objects.bulk_init(
+                ca, [item for _, _, item in items], jobs=jobs, on_error=on_error, private_key=private_key,
+                algorithm=options['algorithm'], expires=options['expires'],
+                subject_alternative_name=options['alt'], **kwargs))
+
+            for path, name, item in items:
+                if id(item) in errors:
+                    self.stderr.write(self.style.ERROR('%s: %s' % (path, errors[id(item)])))
+                    failed += 1
+                    continue
+
+                cert = next(certs)
+                cert.watchers.add(*watchers)
+                with open(os.path.join(options['out_dir'], name), 'w') as stream:
+                    stream.write(cert.pub)
+                signed += 1
+
+            chunk = list(islice(paths, self.csrs_chunk_size * jobs))
+
+        duration = time.time() - start
+        self.stdout.write(
+            'Signed %s certificates in %.2f seconds (%.1f certificates per second), %s failed.' % (
+                signed, duration, signed / duration if duration else 0, failed))
@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of django-ca (https://github.com/mathiasertl/django-ca).
+#
+# django-ca is free software: you can redistribute it and/or modify it under the terms of the GNU
+# General Public License as published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# django-ca is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without
+# even the implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with django-ca.  If not,
+# see <http://www.gnu.org/licenses/>.
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from ...models import Certificate
+from ...models import CertificateName
+
+
+class Command(BaseCommand):
+    help = "Update the names used for searching certificates."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, metavar='N',
+                            help='Update N certificates per transaction (default: %(default)s).')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        qs = Certificate.objects.order_by('pk').only('pk', 'serial', 'pub', 'der')
+
+        last_pk = 0
+        updated = 0
+        while True:
+            certs = list(qs.filter(pk__gt=last_pk)[:batch_size])
+            if not certs:
+                break
+
+            names = []
+            for cert in certs:
+                names += cert.get_names()
+
+            with transaction.atomic():
+                CertificateName.objects.filter(cert__in=certs).delete()
+                CertificateName.objects.bulk_create(names, batch_size=batch_size)
+
+            last_pk = certs[-1].pk
+            updated += len(certs)
+
+        self.stdout.write('Updated names of %s certificates.' % updated)
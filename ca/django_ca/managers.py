@@ -13,21 +13,29 @@
 # You should have received a copy of the GNU General Public License along with django-ca. If not,
 # see <http://www.gnu.org/licenses/>.
 
+import json
+import threading
+import uuid
+from datetime import timedelta
+from itertools import groupby
+from itertools import islice
+from multiprocessing.pool import ThreadPool
+
 import idna
 
 from cryptography import x509
 from cryptography.hazmat.backends import default_backend
 from cryptography.hazmat.primitives import serialization
-from cryptography.hazmat.primitives.asymmetric import dsa
-from cryptography.hazmat.primitives.asymmetric import ec
-from cryptography.hazmat.primitives.asymmetric import rsa
 from cryptography.hazmat.primitives.serialization import Encoding
 from cryptography.hazmat.primitives.serialization import PrivateFormat
 from cryptography.x509.oid import AuthorityInformationAccessOID
 
 from django.core.files.base import ContentFile
+from django.db import connection
 from django.db import models
+from django.db import transaction
 from django.utils import six
+from django.utils import timezone
 from django.utils.encoding import force_bytes
 from django.utils.encoding import force_text
 
@@ -44,13 +52,16 @@ from .signals import post_create_ca
 from .signals import post_issue_cert
 from .signals import pre_create_ca
 from .signals import pre_issue_cert
+from .signing import sign_builder
 from .subject import Subject
 from .utils import ca_storage
 from .utils import get_cert_builder
 from .utils import is_power2
 from .utils import parse_general_name
 from .utils import parse_hash_algorithm
-from .utils import parse_key_curve
+
+# Extensions added to every certificate signed by a CA, see CertificateManager.get_ca_extensions()
+ca_extensions_cache = {}
 
 
 class CertificateManagerMixin(object):
@@ -190,14 +201,8 @@ class CertificateAuthorityManager(CertificateManagerMixin, models.Manager):
             ca_crl_url=ca_crl_url, ca_ocsp_url=ca_ocsp_url, name_constraints=name_constraints,
             password=password, parent_password=parent_password, extra_extensions=extra_extensions)
 
-        if key_type == 'DSA':
-            private_key = dsa.generate_private_key(key_size=key_size, backend=default_backend())
-        elif key_type == 'ECC':
-            ecc_curve = parse_key_curve(ecc_curve)
-            private_key = ec.generate_private_key(ecc_curve, default_backend())
-        else:
-            private_key = rsa.generate_private_key(public_exponent=65537, key_size=key_size,
-                                                   backend=default_backend())
+        from .keypool import get_private_key  # imported here to avoid circular imports
+        private_key = get_private_key(key_type, key_size, ecc_curve)
         public_key = private_key.public_key()
 
         builder = get_cert_builder(expires)
@@ -220,7 +225,7 @@ class CertificateAuthorityManager(CertificateManagerMixin, models.Manager):
             aki = x509.AuthorityKeyIdentifier.from_issuer_public_key(public_key)
         else:
             builder = builder.issuer_name(parent.x509.subject)
-            private_sign_key = parent.key(parent_password)
+            private_sign_key = parent.signing_key(parent_password)
             aki = parent.get_authority_key_identifier()
         builder = builder.add_extension(aki, critical=False)
 
@@ -236,8 +241,7 @@ class CertificateAuthorityManager(CertificateManagerMixin, models.Manager):
         if extra_extensions:
             builder = self._extra_extensions(builder, extra_extensions)
 
-        certificate = builder.sign(private_key=private_sign_key, algorithm=algorithm,
-                                   backend=default_backend())
+        certificate = sign_builder(builder, private_sign_key, algorithm)
 
         # Normalize extensions for create()
         if crl_url is not None:
@@ -248,7 +252,6 @@ class CertificateAuthorityManager(CertificateManagerMixin, models.Manager):
                         ocsp_url=ocsp_url, crl_url=crl_url, parent=parent)
         ca.x509 = certificate
         ca.private_key_path = ca_storage.generate_filename('%s.key' % ca.serial.replace(':', ''))
-        ca.save()
 
         if password is None:
             encryption = serialization.NoEncryption()
@@ -259,18 +262,55 @@ class CertificateAuthorityManager(CertificateManagerMixin, models.Manager):
                                         format=PrivateFormat.PKCS8,
                                         encryption_algorithm=encryption)
 
-        # write private key to file
-        ca_storage.save(ca.private_key_path, ContentFile(pem))
+        from .outbox import record as record_event  # imported here to avoid circular imports
+
+        with transaction.atomic():
+            ca.save()
+            record_event('post_create_ca', [ca])
+
+            # write private key to file
+            ca_storage.save(ca.private_key_path, ContentFile(pem))
 
         post_create_ca.send(sender=self.model, ca=ca)
         return ca
 
 
 class CertificateManager(CertificateManagerMixin, models.Manager):
+    def get_ca_extensions(self, ca):
+        """Get the extensions added to every certificate signed by the given certificate authority.
+
+        The extensions are cached in the current process. The cache entry for a CA is removed when the CA is
+        saved and is never used if the CA has different values than when the entry was created.
+
+        Returns
+        -------
+
+        tuple of tuple
+            ``(critical, extension)`` tuples that can be passed to
+            :py:meth:`~cg:cryptography.x509.CertificateBuilder.add_extension`.
+        """
+
+        key = (ca.serial, ca.issuer_url, ca.crl_url, ca.ocsp_url, ca.issuer_alt_name)
+        cached = ca_extensions_cache.get(ca.pk)
+        if cached is not None and cached[0] == key:
+            return cached[1]
+
+        # Get authorityKeyIdentifier from subjectKeyIdentifier from signing CA
+        extensions = [(False, ca.get_authority_key_identifier())]
+        extensions += self.get_common_extensions(ca.issuer_url, ca.crl_url, ca.ocsp_url)
+
+        if ca.issuer_alt_name:
+            issuer_alt_name = IssuerAlternativeName(ca.issuer_alt_name).for_builder()
+            extensions.append((issuer_alt_name['critical'], issuer_alt_name['extension']))
+
+        extensions = tuple(extensions)
+        ca_extensions_cache[ca.pk] = (key, extensions)
+        return extensions
+
     def sign_cert(self, ca, csr, expires=None, algorithm=None, subject=None, cn_in_san=True,
                   csr_format=Encoding.PEM, subject_alternative_name=None, key_usage=None,
                   extended_key_usage=None, tls_feature=None, ocsp_no_check=False, extra_extensions=None,
-                  password=None):
+                  password=None, private_key=None, ca_extensions=None):
         """Create a signed certificate from a CSR.
 
         **PLEASE NOTE:** This function creates the raw certificate and is usually not invoked directly. It is
@@ -325,6 +365,12 @@ class CertificateManager(CertificateManagerMixin, models.Manager):
         password : bytes, optional
             Password used to load the private key of the certificate authority. If not passed, the private key
             is assumed to be unencrypted.
+        private_key : optional
+            The already loaded private key of the certificate authority. If passed, ``password`` is not used
+            to load the key. This is useful when signing many certificates at once.
+        ca_extensions : list of tuple, optional
+            The extensions added for the certificate authority, as returned by
+            :py:meth:`~django_ca.managers.CertificateManager.get_ca_extensions`.
 
         Returns
         -------
@@ -404,10 +450,9 @@ class CertificateManager(CertificateManagerMixin, models.Manager):
         builder = builder.add_extension(
             x509.SubjectKeyIdentifier.from_public_key(public_key), critical=False)
 
-        # Get authorityKeyIdentifier from subjectKeyIdentifier from signing CA
-        builder = builder.add_extension(ca.get_authority_key_identifier(), critical=False)
-
-        for critical, ext in self.get_common_extensions(ca.issuer_url, ca.crl_url, ca.ocsp_url):
+        if ca_extensions is None:
+            ca_extensions = self.get_ca_extensions(ca)
+        for critical, ext in ca_extensions:
             builder = builder.add_extension(ext, critical=critical)
 
         if subject_alternative_name:
@@ -422,10 +467,6 @@ class CertificateManager(CertificateManagerMixin, models.Manager):
         if tls_feature:
             builder = builder.add_extension(**tls_feature.for_builder())
 
-        if ca.issuer_alt_name:
-            issuer_alt_name = IssuerAlternativeName(ca.issuer_alt_name)
-            builder = builder.add_extension(**issuer_alt_name.for_builder())
-
         if ocsp_no_check:
             builder = builder.add_extension(**OCSPNoCheck().for_builder())
 
@@ -435,7 +476,9 @@ class CertificateManager(CertificateManagerMixin, models.Manager):
         ###################
         # Sign public key #
         ###################
-        cert = builder.sign(private_key=ca.key(password), algorithm=algorithm, backend=default_backend())
+        if private_key is None:
+            private_key = ca.signing_key(password)
+        cert = sign_builder(builder, private_key, algorithm)
 
         return cert, req
 
@@ -449,7 +492,343 @@ class CertificateManager(CertificateManagerMixin, models.Manager):
         c = self.model(ca=ca)
         c.x509, csr = self.sign_cert(ca, csr, **kwargs)
         c.csr = csr.public_bytes(Encoding.PEM).decode('utf-8')
-        c.save()
+
+        from .outbox import record as record_event  # imported here to avoid circular imports
+
+        with transaction.atomic():
+            c.save()
+            record_event('post_issue_cert', [c])
 
         post_issue_cert.send(sender=self.model, cert=c)
         return c
+
+    def bulk_init(self, ca, csrs, password=None, jobs=1, batch_size=100, on_error=None, on_batch=None,
+                  private_key=None, **kwargs):
+        """Create signed certificates for many CSRs at once and store them to the database.
+
+        The private key of the certificate authority is loaded only once and certificates are stored with
+        :py:meth:`~django:django.db.models.query.QuerySet.bulk_create` in batches of ``batch_size``
+        certificates. The :py:data:`~django_ca.signals.post_issue_cert` signal is sent for all certificates
+        of a batch once the batch is stored.
+
+        Each element of ``csrs`` is either a CSR or a tuple of a CSR and a dictionary of parameters for just
+        this certificate (e.g. ``subject``). If neither ``subject`` nor ``subject_alternative_name`` are
+        given, the subject of the CSR is used. All other parameters are passed on to
+        :py:func:`Certificate.objects.sign_cert() <django_ca.managers.CertificateManager.sign_cert>`.
+
+        If a certificate cannot be signed and ``on_error`` is not given, the exception is raised and no
+        certificates of the current batch are stored.
+
+        Parameters
+        ----------
+
+        ca : :py:class:`~django_ca.models.CertificateAuthority`
+            The certificate authority to sign the certificates with.
+        csrs : iterable
+            The CSRs to sign.
+        password : bytes, optional
+            Password used to load the private key of the certificate authority.
+        jobs : int, optional
+            Number of threads used for signing certificates, the default is ``1``. Database connections
+            opened in these threads (e.g. by receivers of :py:data:`~django_ca.signals.pre_issue_cert`) are
+            closed after every certificate.
+        batch_size : int, optional
+            Number of certificates stored to the database at once.
+        on_error : callable, optional
+            Called with the element of ``csrs`` and the exception if a certificate cannot be signed. The
+            element is skipped and signing continues with the next element.
+        on_batch : callable, optional
+            Called with the elements of ``csrs`` of a batch and a list of the certificates created for them
+            (``None`` for skipped elements). The callable is called in the same transaction that stores the
+            certificates, so any changes it makes are committed only together with the certificates.
+        private_key : optional
+            The already loaded private key of the certificate authority. If passed, ``password`` is not used
+            to load the key. This is useful when calling this function many times for the same CA.
+
+        Returns
+        -------
+
+        list of :py:class:`~django_ca.models.Certificate`
+            The certificates that where created, in the same order as ``csrs``.
+        """
+
+        from .outbox import record as record_event  # imported here to avoid circular imports
+
+        if private_key is None:
+            private_key = ca.signing_key(password)
+        ca_extensions = self.get_ca_extensions(ca)
+        csr_format = kwargs.get('csr_format', Encoding.PEM)
+
+        def sign(item):
+            if isinstance(item, tuple):
+                csr, cert_kwargs = item
+                cert_kwargs = dict(kwargs, **cert_kwargs)
+            else:
+                csr, cert_kwargs = item, dict(kwargs)
+
+            if not cert_kwargs.get('subject') and not cert_kwargs.get('subject_alternative_name'):
+                if csr_format == Encoding.DER:
+                    req = x509.load_der_x509_csr(force_bytes(csr), default_backend())
+                else:
+                    req = x509.load_pem_x509_csr(force_bytes(csr), default_backend())
+                cert_kwargs['subject'] = Subject([(s.oid, s.value) for s in req.subject])
+            elif isinstance(cert_kwargs.get('subject'), Subject):
+                # sign_cert() may modify the subject, so don't share it between certificates
+                cert_kwargs['subject'] = cert_kwargs['subject'].copy()
+
+            # ... the same goes for the subjectAlternativeName, which sign_cert() adds the CommonName to
+            san = cert_kwargs.get('subject_alternative_name')
+            if isinstance(san, SubjectAlternativeName):
+                cert_kwargs['subject_alternative_name'] = SubjectAlternativeName(san.as_extension())
+
+            cert = self.model(ca=ca)
+            cert.x509, req = self.sign_cert(ca, csr, password=password, private_key=private_key,
+                                            ca_extensions=ca_extensions, **cert_kwargs)
+            cert.csr = req.public_bytes(Encoding.PEM).decode('utf-8')
+            return cert
+
+        def sign_or_skip(item):
+            try:
+                return sign(item)
+            except Exception as e:
+                on_error(item, e)
+
+        def sign_in_thread(item):
+            # Receivers of pre_issue_cert may use the database, which opens a connection for the worker thread
+            try:
+                return func(item)
+            finally:
+                connection.close()
+
+        func = sign if on_error is None else sign_or_skip
+        pool = ThreadPool(jobs) if jobs > 1 else None
+        name_model = self.model._meta.get_field('names').related_model
+        created = []
+        csrs = iter(csrs)
+
+        try:
+            batch = list(islice(csrs, batch_size))
+            while batch:
+                if pool is None:
+                    results = [func(csr) for csr in batch]
+                else:
+                    results = pool.map(sign_in_thread, batch)
+                certs = [c for c in results if c is not None]  # skipped by sign_or_skip()
+
+                with transaction.atomic():
+                    self.bulk_create(certs)
+
+                    # Not all databases return primary keys from bulk_create(), but we need them for the names
+                    pks = dict(self.filter(ca=ca, serial__in=[c.serial for c in certs]).values_list(
+                        'serial', 'pk'))
+                    names = []
+                    for cert in certs:
+                        cert.pk = pks[cert.serial]
+                        names += cert.get_names()
+                        cert._update_names = False
+                    name_model.objects.bulk_create(names)
+                    record_event('post_issue_cert', certs)
+
+                    if on_batch is not None:
+                        on_batch(batch, results)
+
+                for cert in certs:
+                    post_issue_cert.send(sender=self.model, cert=cert)
+
+                created += certs
+                batch = list(islice(csrs, batch_size))
+        finally:
+            if pool is not None:
+                pool.close()
+                pool.join()
+
+        return created
+
+
+class LeaseExpired(Exception):
+    """Raised if jobs were claimed by another worker while certificates were signed for them."""
+    pass
+
+
+class IssuanceJobManager(models.Manager):
+    def init(self, ca, csr, expires=None, algorithm=None, subject=None, cn_in_san=True,
+             subject_alternative_name=None, key_usage=None, extended_key_usage=None, tls_feature=None,
+             ocsp_no_check=False, watchers=None):
+        """Create a new job for issuing a certificate.
+
+        The certificate is signed later by ``manage.py run_signing_worker``. Parameters are the same as for
+        :py:func:`~django_ca.managers.CertificateManager.sign_cert`, except that ``watchers`` are added to
+        the certificate once it is issued. Since jobs are stored in the database, you cannot pass a password
+        for the private key of the certificate authority.
+        """
+
+        if algorithm is not None and not isinstance(algorithm, six.string_types):
+            algorithm = type(algorithm).__name__
+        if subject is not None and not isinstance(subject, six.string_types):
+            if not isinstance(subject, Subject):
+                subject = Subject(subject)
+            subject = str(subject)
+
+        options = {
+            'algorithm': algorithm,
+            'subject': subject,
+            'cn_in_san': cn_in_san,
+            'ocsp_no_check': ocsp_no_check,
+        }
+        extensions = [
+            ('subject_alternative_name', SubjectAlternativeName, subject_alternative_name),
+            ('key_usage', KeyUsage, key_usage),
+            ('extended_key_usage', ExtendedKeyUsage, extended_key_usage),
+            ('tls_feature', TLSFeature, tls_feature),
+        ]
+        for key, ext_class, value in extensions:
+            if value and not isinstance(value, ext_class):
+                value = ext_class(value)
+            if value:
+                options[key] = value.serialize()
+
+        job = self.create(ca=ca, csr=force_text(csr), expires=expires, options=json.dumps(options))
+        if watchers:
+            job.watchers.set(watchers)
+        return job
+
+    def claim(self, count, lease=300):
+        """Mark up to ``count`` pending jobs as running and return them.
+
+        Jobs are locked while they are claimed, so that concurrent workers never claim the same job. If the
+        database supports it, jobs locked by other workers are skipped instead of waiting for them. Claimed
+        jobs are leased for ``lease`` seconds and :py:func:`run` renews the lease while it is still signing
+        certificates. Jobs whose lease expired (e.g. because the worker was killed) are claimed again.
+        """
+
+        skip_locked = connection.features.has_select_for_update_skip_locked
+        now = timezone.now()
+        token = uuid.uuid4().hex
+        leased_until = now + timedelta(seconds=lease)
+
+        with transaction.atomic():
+            expired = models.Q(status=self.model.STATUS_RUNNING, leased_until__lt=now)
+            qs = self.filter(models.Q(status=self.model.STATUS_PENDING) | expired).order_by('created', 'pk')
+            jobs = list(qs.select_for_update(skip_locked=skip_locked)[:count])
+
+            self.filter(pk__in=[j.pk for j in jobs]).update(
+                status=self.model.STATUS_RUNNING, started=now, claim_token=token, leased_until=leased_until)
+            for job in jobs:
+                job.status = self.model.STATUS_RUNNING
+                job.started = now
+                job.claim_token = token
+                job.leased_until = leased_until
+        return jobs
+
+    def owned(self, jobs):
+        """Get a queryset of the given (claimed) jobs that are still running and not claimed by another
+        worker in the meantime."""
+
+        return self.filter(pk__in=[j.pk for j in jobs], status=self.model.STATUS_RUNNING,
+                           claim_token__in={j.claim_token for j in jobs})
+
+    def renew(self, jobs, lease=300):
+        """Extend the lease of the given (claimed) jobs to ``lease`` seconds from now.
+
+        Only jobs that are still owned by the caller are renewed. Returns the number of renewed jobs.
+        """
+
+        return self.owned(jobs).update(leased_until=timezone.now() + timedelta(seconds=lease))
+
+    def run(self, jobs, processes=1, lease=300):
+        """Issue the certificates for the given (claimed) jobs.
+
+        Certificates are signed with :py:func:`~django_ca.managers.CertificateManager.bulk_init`, so the
+        private key of every certificate authority is loaded only once. The lease of the jobs is renewed in
+        a background thread. Certificates are only stored if the jobs were not claimed by another worker in
+        the meantime, otherwise the remaining jobs are released, so that they are claimed again.
+
+        Parameters
+        ----------
+
+        jobs : list of :py:class:`~django_ca.models.IssuanceJob`
+            The jobs to run, usually returned by :py:func:`claim`.
+        processes : int, optional
+            Number of threads used for signing certificates, the default is ``1``.
+        lease : int, optional
+            The lease passed to :py:func:`claim`, the lease is renewed every third of this time.
+
+        Returns
+        -------
+
+        int
+            The number of failed jobs.
+        """
+
+        cert_model = self.model._meta.get_field('cert').related_model
+        ca_model = self.model._meta.get_field('ca').related_model
+        cas = ca_model.objects.in_bulk({job.ca_id for job in jobs})
+
+        def finish(job, cert=None, error=None):
+            values = {'finished': timezone.now()}
+            if cert is None:
+                values.update(status=self.model.STATUS_FAILED, cert=None, error=str(error))
+            else:
+                values.update(status=self.model.STATUS_DONE, cert=cert)
+
+            # Never finish jobs that where claimed by another worker
+            if self.owned([job]).update(**values):
+                for key, value in values.items():
+                    setattr(job, key, value)
+                if cert is not None:
+                    cert.watchers.set(job.watchers.all())
+
+        stopped = threading.Event()
+
+        def renew_leases():
+            try:
+                while not stopped.wait(lease / 3.0):
+                    self.renew(jobs, lease=lease)
+            finally:
+                connection.close()
+
+        renewer = threading.Thread(target=renew_leases)
+        renewer.daemon = True
+        renewer.start()
+
+        try:
+            for ca_id, ca_jobs in groupby(sorted(jobs, key=lambda j: j.ca_id), key=lambda j: j.ca_id):
+                ca_jobs = list(ca_jobs)
+                items = [(job.csr, job.get_kwargs()) for job in ca_jobs]
+                pending = {id(item): job for job, item in zip(ca_jobs, items)}
+                errors = {}
+
+                def on_error(item, e):
+                    errors[id(item)] = e
+
+                def on_batch(batch, certs):
+                    # Jobs are finished in the transaction that stores the certificates of the batch. They
+                    # are locked first, so that no other worker can claim them before the transaction ends.
+                    batch_jobs = [pending[id(item)] for item in batch]
+                    owned = self.owned(batch_jobs).select_for_update().values_list('pk', flat=True)
+                    if len(owned) != len(batch_jobs):
+                        raise LeaseExpired('Jobs were claimed by another worker.')
+
+                    for item, cert in zip(batch, certs):
+                        finish(pending[id(item)], cert=cert, error=errors.get(id(item)))
+                    for item in batch:
+                        del pending[id(item)]
+
+                try:
+                    cert_model.objects.bulk_init(cas[ca_id], items, jobs=processes, on_error=on_error,
+                                                 on_batch=on_batch)
+                except LeaseExpired:
+                    # The certificates of the batch where not stored, release all jobs we still own
+                    for job in pending.values():
+                        if self.owned([job]).update(status=self.model.STATUS_PENDING, started=None,
+                                                    claim_token='', leased_until=None):
+                            job.status = self.model.STATUS_PENDING
+                except Exception as e:  # e.g. the private key could not be loaded
+                    # Jobs of batches that were already stored are finished, all others failed
+                    for job in pending.values():
+                        finish(job, error=e)
+        finally:
+            stopped.set()
+            renewer.join()
+
+        return len([job for job in jobs if job.status == self.model.STATUS_FAILED])
@@ -0,0 +1,31 @@
+# Generated by Django 2.2.28 on 2026-10-18 21:43
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('django_ca', '0011_auto_20181208_1708'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CertificateRevocationList',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ca_crl', models.BooleanField(default=False, help_text='If the CRLs contain revoked child CAs.')),
+                ('number', models.PositiveIntegerField(default=0, help_text='CRLNumber of the last issued CRL.')),
+                ('full_number', models.PositiveIntegerField(blank=True, help_text='CRLNumber of the last full CRL.', null=True)),
+                ('full_last_update', models.DateTimeField(blank=True, help_text='Certificates revoked since then are not in the last full CRL.', null=True)),
+                ('full_crl', models.BinaryField(blank=True, help_text='The last full CRL in DER format.', null=True)),
+                ('ca', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='crls', to='django_ca.CertificateAuthority', verbose_name='Certificate Authority')),
+            ],
+            options={
+                'verbose_name': 'Certificate Revocation List',
+                'verbose_name_plural': 'Certificate Revocation Lists',
+                'unique_together': {('ca', 'ca_crl')},
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 2.2.28 on 2026-10-18 21:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('django_ca', '0012_certificaterevocationlist'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='certificate',
+            name='der',
+            field=models.BinaryField(null=True, verbose_name='Public key (DER)'),
+        ),
+        migrations.AddField(
+            model_name='certificateauthority',
+            name='der',
+            field=models.BinaryField(null=True, verbose_name='Public key (DER)'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+from cryptography import x509
+from cryptography.hazmat.backends import default_backend
+from cryptography.hazmat.primitives.serialization import Encoding
+
+from django.db import migrations
+from django.utils.encoding import force_bytes
+
+
+def add_der(apps, schema_editor):
+    backend = default_backend()
+
+    for model in ['Certificate', 'CertificateAuthority']:
+        Model = apps.get_model('django_ca', model)
+        for pk, pub in Model.objects.filter(der__isnull=True).values_list('pk', 'pub').iterator():
+            cert = x509.load_pem_x509_certificate(force_bytes(pub), backend)
+            Model.objects.filter(pk=pk).update(der=cert.public_bytes(Encoding.DER))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('django_ca', '0013_der'),
+    ]
+
+    operations = [
+        migrations.RunPython(add_der, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 2.2.28 on 2026-10-18 21:52
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('django_ca', '0014_add_der'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CertificateName',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('field', models.CharField(choices=[('subject', 'Subject'), ('san', 'subjectAltName'), ('key_usage', 'keyUsage'), ('ext_key_usage', 'extendedKeyUsage')], max_length=16)),
+                ('value', models.CharField(db_index=True, max_length=255)),
+                ('cert', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='names', to='django_ca.Certificate')),
+            ],
+            options={
+                'index_together': {('field', 'value')},
+            },
+        ),
+    ]
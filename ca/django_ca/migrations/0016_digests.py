@@ -0,0 +1,63 @@
+# Generated by Django 2.2.28 on 2026-10-18 21:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('django_ca', '0015_certificatename'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='certificate',
+            name='aki',
+            field=models.CharField(db_index=True, max_length=191, null=True, verbose_name='Authority Key Identifier'),
+        ),
+        migrations.AddField(
+            model_name='certificate',
+            name='sha1_fingerprint',
+            field=models.CharField(db_index=True, max_length=59, null=True, verbose_name='SHA-1 fingerprint'),
+        ),
+        migrations.AddField(
+            model_name='certificate',
+            name='sha256_fingerprint',
+            field=models.CharField(db_index=True, max_length=95, null=True, verbose_name='SHA-256 fingerprint'),
+        ),
+        migrations.AddField(
+            model_name='certificate',
+            name='ski',
+            field=models.CharField(db_index=True, max_length=191, null=True, verbose_name='Subject Key Identifier'),
+        ),
+        migrations.AddField(
+            model_name='certificate',
+            name='spki_sha256',
+            field=models.CharField(db_index=True, max_length=95, null=True, verbose_name='SHA-256 hash of the public key'),
+        ),
+        migrations.AddField(
+            model_name='certificateauthority',
+            name='aki',
+            field=models.CharField(db_index=True, max_length=191, null=True, verbose_name='Authority Key Identifier'),
+        ),
+        migrations.AddField(
+            model_name='certificateauthority',
+            name='sha1_fingerprint',
+            field=models.CharField(db_index=True, max_length=59, null=True, verbose_name='SHA-1 fingerprint'),
+        ),
+        migrations.AddField(
+            model_name='certificateauthority',
+            name='sha256_fingerprint',
+            field=models.CharField(db_index=True, max_length=95, null=True, verbose_name='SHA-256 fingerprint'),
+        ),
+        migrations.AddField(
+            model_name='certificateauthority',
+            name='ski',
+            field=models.CharField(db_index=True, max_length=191, null=True, verbose_name='Subject Key Identifier'),
+        ),
+        migrations.AddField(
+            model_name='certificateauthority',
+            name='spki_sha256',
+            field=models.CharField(db_index=True, max_length=95, null=True, verbose_name='SHA-256 hash of the public key'),
+        ),
+    ]
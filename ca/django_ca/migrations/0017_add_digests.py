@@ -0,0 +1,53 @@
+import hashlib
+
+from cryptography import x509
+from cryptography.hazmat.backends import default_backend
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.serialization import Encoding
+from cryptography.hazmat.primitives.serialization import PublicFormat
+from cryptography.x509.oid import ExtensionOID
+
+from django.db import migrations
+
+from django_ca.utils import bytes_to_hex
+
+
+def get_digests(cert):
+    public_key = cert.public_key().public_bytes(
+        encoding=Encoding.DER, format=PublicFormat.SubjectPublicKeyInfo)
+    values = {
+        'sha256_fingerprint': bytes_to_hex(cert.fingerprint(hashes.SHA256())),
+        'sha1_fingerprint': bytes_to_hex(cert.fingerprint(hashes.SHA1())),
+        'spki_sha256': bytes_to_hex(hashlib.sha256(public_key).digest()),
+        'ski': None,
+        'aki': None,
+    }
+
+    for ext in cert.extensions:
+        if ext.oid == ExtensionOID.SUBJECT_KEY_IDENTIFIER:
+            values['ski'] = bytes_to_hex(ext.value.digest)
+        elif ext.oid == ExtensionOID.AUTHORITY_KEY_IDENTIFIER and ext.value.key_identifier is not None:
+            values['aki'] = bytes_to_hex(ext.value.key_identifier)
+    return values
+
+
+def add_digests(apps, schema_editor):
+    backend = default_backend()
+
+    for model in ['Certificate', 'CertificateAuthority']:
+        Model = apps.get_model('django_ca', model)
+        qs = Model.objects.filter(sha256_fingerprint__isnull=True).values_list('pk', 'der')
+        for pk, der in qs.iterator():
+            cert = x509.load_der_x509_certificate(bytes(der), backend)
+            Model.objects.filter(pk=pk).update(**get_digests(cert))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('django_ca', '0016_digests'),
+    ]
+
+    operations = [
+        migrations.RunPython(add_digests, migrations.RunPython.noop),
+    ]
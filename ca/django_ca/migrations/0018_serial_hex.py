@@ -0,0 +1,27 @@
+# Generated by Django 2.2.28 on 2026-10-18 21:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('django_ca', '0017_add_digests'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='certificate',
+            name='serial_hex',
+            field=models.CharField(max_length=64, null=True, verbose_name='Serial (fixed width)'),
+        ),
+        migrations.AddField(
+            model_name='certificateauthority',
+            name='serial_hex',
+            field=models.CharField(max_length=64, null=True, verbose_name='Serial (fixed width)'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='certificate',
+            unique_together={('ca', 'serial_hex')},
+        ),
+    ]
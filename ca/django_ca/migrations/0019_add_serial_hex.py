@@ -0,0 +1,22 @@
+from django.db import migrations
+
+from django_ca.utils import pad_serial
+
+
+def add_serial_hex(apps, schema_editor):
+    for model in ['Certificate', 'CertificateAuthority']:
+        Model = apps.get_model('django_ca', model)
+        qs = Model.objects.filter(serial_hex__isnull=True).values_list('pk', 'serial')
+        for pk, serial in qs.iterator():
+            Model.objects.filter(pk=pk).update(serial_hex=pad_serial(serial))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('django_ca', '0018_serial_hex'),
+    ]
+
+    operations = [
+        migrations.RunPython(add_serial_hex, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 2.2.28 on 2026-10-18 21:57
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('django_ca', '0019_add_serial_hex'),
+    ]
+
+    operations = [
+        migrations.AlterIndexTogether(
+            name='certificate',
+            index_together={('ca', 'revoked', 'expires'), ('revoked', 'expires')},
+        ),
+    ]
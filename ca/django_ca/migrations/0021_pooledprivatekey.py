@@ -0,0 +1,27 @@
+# Generated by Django 2.2.28 on 2026-10-18 22:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('django_ca', '0020_certificate_status_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PooledPrivateKey',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', models.DateTimeField(auto_now_add=True)),
+                ('key_type', models.CharField(max_length=3)),
+                ('key_size', models.PositiveIntegerField(null=True)),
+                ('ecc_curve', models.CharField(blank=True, max_length=32)),
+                ('key', models.BinaryField()),
+            ],
+            options={
+                'index_together': {('key_type', 'key_size', 'ecc_curve')},
+            },
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 2.2.28 on 2026-10-18 22:18
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('django_ca', '0021_pooledprivatekey'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IssuanceJob',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('csr', models.TextField(verbose_name='CSR')),
+                ('expires', models.DateTimeField(blank=True, null=True)),
+                ('options', models.TextField(default='{}')),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed')], default='pending', max_length=8)),
+                ('error', models.TextField(blank=True)),
+                ('created', models.DateTimeField(auto_now_add=True)),
+                ('started', models.DateTimeField(blank=True, null=True)),
+                ('finished', models.DateTimeField(blank=True, null=True)),
+                ('ca', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='django_ca.CertificateAuthority', verbose_name='Certificate Authority')),
+                ('cert', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='issuance_jobs', to='django_ca.Certificate', verbose_name='Certificate')),
+                ('watchers', models.ManyToManyField(blank=True, related_name='issuance_jobs', to='django_ca.Watcher')),
+            ],
+            options={
+                'verbose_name': 'Issuance job',
+                'verbose_name_plural': 'Issuance jobs',
+                'index_together': {('status', 'created')},
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 2.2.28 on 2026-10-18 22:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('django_ca', '0023_outboxevent'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='certificate',
+            name='serial_hex',
+            field=models.CharField(db_index=True, max_length=40, null=True, verbose_name='Serial (fixed width)'),
+        ),
+        migrations.AlterField(
+            model_name='certificateauthority',
+            name='serial_hex',
+            field=models.CharField(db_index=True, max_length=40, null=True, verbose_name='Serial (fixed width)'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 2.2.28 on 2026-10-18 23:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('django_ca', '0024_serial_hex_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='issuancejob',
+            name='claim_token',
+            field=models.CharField(blank=True, max_length=32),
+        ),
+        migrations.AddField(
+            model_name='issuancejob',
+            name='leased_until',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 2.2.28 on 2026-10-18 23:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('django_ca', '0025_issuancejob_claim_token'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='certificaterevocationlist',
+            name='delta_crl',
+            field=models.BinaryField(blank=True, help_text='The last delta CRL in DER format.', null=True),
+        ),
+    ]
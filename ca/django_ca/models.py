@@ -16,6 +16,7 @@
 import base64
 import binascii
 import hashlib
+import json
 import logging
 import os
 import re
@@ -32,6 +33,7 @@ from cryptography.x509.oid import ExtensionOID
 
 from django.conf import settings
 from django.db import models
+from django.db import transaction
 from django.urls import reverse
 from django.utils import timezone
 from django.utils.encoding import force_bytes
@@ -55,18 +57,28 @@ from .extensions import TLSFeature
 from .extensions import UnrecognizedExtension
 from .managers import CertificateAuthorityManager
 from .managers import CertificateManager
+from .managers import IssuanceJobManager
 from .querysets import CertificateAuthorityQuerySet
 from .querysets import CertificateQuerySet
 from .signals import post_revoke_cert
 from .signals import pre_revoke_cert
+from .signing import SigningKey
+from .signing import get_signing_backend
 from .subject import Subject
+from .utils import OID_NAME_MAPPINGS
+from .utils import LRUCache
 from .utils import add_colons
+from .utils import bytes_to_hex
 from .utils import ca_storage
+from .utils import format_general_name
 from .utils import format_general_names
 from .utils import format_name
 from .utils import get_extension_name
+from .utils import get_revoked_certificate
+from .utils import hex_to_bytes
 from .utils import int_to_hex
 from .utils import multiline_url_validator
+from .utils import pad_serial
 from .utils import read_file
 
 log = logging.getLogger(__name__)
@@ -74,6 +86,10 @@ log = logging.getLogger(__name__)
 if ca_settings.CRYPTOGRAPHY_HAS_PRECERT_POISON:  # pragma: no branch, pragma: only cryptography>=2.4
     from .extensions import PrecertPoison
 
+certificate_cache = LRUCache(ca_settings.CA_CERTIFICATE_CACHE_SIZE)
+"""Loaded certificates shared by all instances in this process, see :ref:`CA_CERTIFICATE_CACHE_SIZE
+<settings-ca-certificate-cache-size>`."""
+
 
 class Watcher(models.Model):
     name = models.CharField(max_length=64, null=True, blank=True, verbose_name=_('CommonName'))
@@ -126,9 +142,26 @@ class X509CertMixin(models.Model):
     expires = models.DateTimeField(null=False, blank=False)
 
     pub = models.TextField(verbose_name=_('Public key'))
+    der = models.BinaryField(null=True, verbose_name=_('Public key (DER)'))
     cn = models.CharField(max_length=128, verbose_name=_('CommonName'))
     serial = models.CharField(max_length=64, unique=True)
 
+    # Fixed-width serial used for exact lookups, see utils.pad_serial()
+    serial_hex = models.CharField(max_length=40, null=True, db_index=True,
+                                  verbose_name=_('Serial (fixed width)'))
+
+    # Hashes and key identifiers, stored so that certificates can be looked up without loading them.
+    # All values are stored as upper-case, colon-separated hex strings (see utils.bytes_to_hex()).
+    sha256_fingerprint = models.CharField(max_length=95, null=True, db_index=True,
+                                          verbose_name=_('SHA-256 fingerprint'))
+    sha1_fingerprint = models.CharField(max_length=59, null=True, db_index=True,
+                                        verbose_name=_('SHA-1 fingerprint'))
+    spki_sha256 = models.CharField(max_length=95, null=True, db_index=True,
+                                   verbose_name=_('SHA-256 hash of the public key'))
+    ski = models.CharField(max_length=191, null=True, db_index=True, verbose_name=_('Subject Key Identifier'))
+    aki = models.CharField(max_length=191, null=True, db_index=True,
+                           verbose_name=_('Authority Key Identifier'))
+
     # revocation information
     revoked = models.BooleanField(default=False)
     revoked_date = models.DateTimeField(null=True, blank=True, verbose_name=_('Revoked on'))
@@ -137,6 +170,12 @@ class X509CertMixin(models.Model):
         choices=REVOCATION_REASONS)
 
     _x509 = None
+    _extensions = None
+    _wrapped_extensions = None
+    _sorted_extensions_cache = None
+
+    # set when the certificate changes, see Certificate.save()
+    _update_names = False
 
     class Meta:
         abstract = True
@@ -168,18 +207,37 @@ class X509CertMixin(models.Model):
 
         return self.revoked_date
 
+    def _certificate_cache_key(self, data):
+        # The hash makes sure that a modified certificate is never served from the cache
+        return self.serial, hashlib.sha256(data).digest()
+
     @property
     def x509(self):
         """The underlying :py:class:`cg:cryptography.x509.Certificate`."""
         if self._x509 is None:
-            backend = default_backend()
-            self._x509 = x509.load_pem_x509_certificate(force_bytes(self.pub), backend)
+            # Prefer the DER encoded certificate, as it does not have to be base64-decoded first
+            if self.der:
+                data = bytes(self.der)
+                load = x509.load_der_x509_certificate
+            else:
+                data = force_bytes(self.pub)
+                load = x509.load_pem_x509_certificate
+
+            cache_key = self._certificate_cache_key(data)
+            self._x509 = certificate_cache.get(cache_key)
+
+            if self._x509 is None:
+                self._x509 = load(data, default_backend())
+                certificate_cache.set(cache_key, self._x509)
         return self._x509
 
     @x509.setter
     def x509(self, value):
         self._x509 = value
-        self.pub = force_str(self.dump_certificate(Encoding.PEM))
+        self._extensions = self._wrapped_extensions = self._sorted_extensions_cache = None
+        self._update_names = True
+        self.der = value.public_bytes(Encoding.DER)
+        self.pub = force_str(value.public_bytes(Encoding.PEM))
         self.cn = self.subject.get('CN', '')
         self.expires = self.not_after
         self.valid_from = self.not_before
@@ -188,6 +246,28 @@ class X509CertMixin(models.Model):
             self.valid_from = timezone.make_aware(self.valid_from, timezone=pytz.utc)
 
         self.serial = int_to_hex(value.serial_number)
+        self.serial_hex = pad_serial(value.serial_number)
+        self.update_digests()
+        certificate_cache.set(self._certificate_cache_key(self.der), value)
+
+    def update_digests(self):
+        """Update fingerprints, public key hash and key identifiers from the current certificate."""
+
+        self.sha256_fingerprint = bytes_to_hex(self.x509.fingerprint(hashes.SHA256()))
+        self.sha1_fingerprint = bytes_to_hex(self.x509.fingerprint(hashes.SHA1()))
+
+        public_key = self.x509.public_key().public_bytes(
+            encoding=Encoding.DER, format=PublicFormat.SubjectPublicKeyInfo)
+        self.spki_sha256 = bytes_to_hex(hashlib.sha256(public_key).digest())
+
+        ski = self._get_extension(ExtensionOID.SUBJECT_KEY_IDENTIFIER)
+        self.ski = bytes_to_hex(ski.value.digest) if ski is not None else None
+
+        aki = self._get_extension(ExtensionOID.AUTHORITY_KEY_IDENTIFIER)
+        if aki is not None and aki.value.key_identifier is not None:
+            self.aki = bytes_to_hex(aki.value.key_identifier)
+        else:
+            self.aki = None
 
     @property
     def admin_change_url(self):
@@ -203,9 +283,15 @@ class X509CertMixin(models.Model):
         return self.x509.signature_hash_algorithm
 
     def dump_certificate(self, encoding=Encoding.PEM):
+        if encoding == Encoding.DER and self.der:
+            return bytes(self.der)
         return self.x509.public_bytes(encoding=encoding)
 
     def get_digest(self, algo):
+        stored = {'SHA256': self.sha256_fingerprint, 'SHA1': self.sha1_fingerprint}.get(algo.upper())
+        if stored:
+            return stored
+
         algo = getattr(hashes, algo.upper())()
         return add_colons(binascii.hexlify(self.x509.fingerprint(algo)).upper().decode('utf-8'))
 
@@ -221,19 +307,15 @@ class X509CertMixin(models.Model):
         if self.revoked is False:
             raise ValueError('Certificate is not revoked.')
 
-        revoked_cert = x509.RevokedCertificateBuilder().serial_number(
-            self.x509.serial_number).revocation_date(self.revoked_date)
-
-        if self.revoked_reason:
-            reason_flag = getattr(x509.ReasonFlags, self.revoked_reason)
-            revoked_cert = revoked_cert.add_extension(x509.CRLReason(reason_flag), critical=False)
-
-        return revoked_cert.build(default_backend())
+        return get_revoked_certificate(self.serial, self.revoked_date, self.revoked_reason)
 
     @property
     def hpkp_pin(self):
         # taken from https://github.com/luisgf/hpkp-python/blob/master/hpkp.py
 
+        if self.spki_sha256:
+            return base64.b64encode(hex_to_bytes(self.spki_sha256)).decode('utf-8')
+
         public_key_raw = self.x509.public_key().public_bytes(
             encoding=Encoding.DER, format=PublicFormat.SubjectPublicKeyInfo)
         public_key_hash = hashlib.sha256(public_key_raw).digest()
@@ -265,10 +347,15 @@ class X509CertMixin(models.Model):
     def revoke(self, reason=None):
         pre_revoke_cert.send(sender=self.__class__, cert=self, reason=reason)
 
+        from .outbox import record as record_event  # imported here to avoid circular imports
+
         self.revoked = True
         self.revoked_date = timezone.now()
         self.revoked_reason = reason
-        self.save()
+
+        with transaction.atomic():
+            self.save()
+            record_event('post_revoke_cert', [self])
 
         post_revoke_cert.send(sender=self.__class__, cert=self)
 
@@ -302,9 +389,39 @@ class X509CertMixin(models.Model):
     if ca_settings.CRYPTOGRAPHY_HAS_PRECERT_POISON:  # pragma: no branch, pragma: only cryptography>=2.4
         OID_MAPPING[ExtensionOID.PRECERT_POISON] = 'precert_poison'
 
+    @property
+    def _extension_map(self):
+        """All :py:class:`~cg:cryptography.x509.Extension` instances of the certificate by OID.
+
+        cryptography parses extensions again on every access, so they are only parsed once per instance.
+        """
+        if self._extensions is None:
+            self._extensions = {ext.oid: ext for ext in self.x509.extensions}
+        return self._extensions
+
+    def _get_extension(self, oid):
+        """Get the :py:class:`~cg:cryptography.x509.Extension` with the given OID or ``None``."""
+        return self._extension_map.get(oid)
+
+    def _get_wrapped_extension(self, oid, cls):
+        """Get the extension with the given OID wrapped in ``cls`` or ``None`` if it doesn't exist.
+
+        The wrapped extension is only created once per instance.
+        """
+        if self._wrapped_extensions is None:
+            self._wrapped_extensions = {}
+
+        if oid not in self._wrapped_extensions:
+            ext = self._get_extension(oid)
+            self._wrapped_extensions[oid] = None if ext is None else cls(ext)
+        return self._wrapped_extensions[oid]
+
     @property
     def _sorted_extensions(self):
-        return sorted(self.x509.extensions, key=lambda e: (get_extension_name(e), e.oid.dotted_string))
+        if self._sorted_extensions_cache is None:
+            self._sorted_extensions_cache = sorted(
+                self._extension_map.values(), key=lambda e: (get_extension_name(e), e.oid.dotted_string))
+        return self._sorted_extensions_cache
 
     def get_extension_fields(self):
         for ext in self._sorted_extensions:
@@ -341,93 +458,52 @@ class X509CertMixin(models.Model):
 
     @property
     def authority_information_access(self):
-        try:
-            ext = self.x509.extensions.get_extension_for_oid(ExtensionOID.AUTHORITY_INFORMATION_ACCESS)
-        except x509.ExtensionNotFound:
-            return None
-        return AuthorityInformationAccess(ext)
+        return self._get_wrapped_extension(ExtensionOID.AUTHORITY_INFORMATION_ACCESS,
+                                           AuthorityInformationAccess)
 
     @property
     def authority_key_identifier(self):
         """The :py:class:`~django_ca.extensions.AuthorityKeyIdentifier` extension, or ``None`` if it doesn't
         exist."""
-        try:
-            ext = self.x509.extensions.get_extension_for_oid(ExtensionOID.AUTHORITY_KEY_IDENTIFIER)
-        except x509.ExtensionNotFound:
-            return None
-        return AuthorityKeyIdentifier(ext)
+        return self._get_wrapped_extension(ExtensionOID.AUTHORITY_KEY_IDENTIFIER, AuthorityKeyIdentifier)
 
     @property
     def basic_constraints(self):
-        try:
-            ext = self.x509.extensions.get_extension_for_oid(ExtensionOID.BASIC_CONSTRAINTS)
-        except x509.ExtensionNotFound:
-            return None
-        return BasicConstraints(ext)
+        return self._get_wrapped_extension(ExtensionOID.BASIC_CONSTRAINTS, BasicConstraints)
 
     @property
     def issuer_alternative_name(self):
-        try:
-            ext = self.x509.extensions.get_extension_for_oid(ExtensionOID.ISSUER_ALTERNATIVE_NAME)
-        except x509.ExtensionNotFound:
-            return None
-
-        return IssuerAlternativeName(ext)
+        return self._get_wrapped_extension(ExtensionOID.ISSUER_ALTERNATIVE_NAME, IssuerAlternativeName)
 
     @property
     def key_usage(self):
         """The :py:class:`~django_ca.extensions.KeyUsage` extension, or ``None`` if it doesn't exist."""
-        try:
-            ext = self.x509.extensions.get_extension_for_oid(ExtensionOID.KEY_USAGE)
-        except x509.ExtensionNotFound:
-            return None
-        return KeyUsage(ext)
+        return self._get_wrapped_extension(ExtensionOID.KEY_USAGE, KeyUsage)
 
     @property
     def extended_key_usage(self):
         """The :py:class:`~django_ca.extensions.ExtendedKeyUsage` extension, or ``None`` if it doesn't
         exist."""
-        try:
-            ext = self.x509.extensions.get_extension_for_oid(ExtensionOID.EXTENDED_KEY_USAGE)
-        except x509.ExtensionNotFound:
-            return None
-        return ExtendedKeyUsage(ext)
+        return self._get_wrapped_extension(ExtensionOID.EXTENDED_KEY_USAGE, ExtendedKeyUsage)
 
     @property
     def name_constraints(self):
-        try:
-            ext = self.x509.extensions.get_extension_for_oid(ExtensionOID.NAME_CONSTRAINTS)
-        except x509.ExtensionNotFound:
-            return None
-
-        return NameConstraints(ext)
+        return self._get_wrapped_extension(ExtensionOID.NAME_CONSTRAINTS, NameConstraints)
 
     @property
     def ocsp_no_check(self):
-        try:
-            ext = self.x509.extensions.get_extension_for_oid(ExtensionOID.OCSP_NO_CHECK)
-        except x509.ExtensionNotFound:
-            return None
-
-        return OCSPNoCheck(ext)
+        return self._get_wrapped_extension(ExtensionOID.OCSP_NO_CHECK, OCSPNoCheck)
 
     @property
     def precert_poison(self):  # pragma: only cryptography>=2.4
-        try:
-            ext = self.x509.extensions.get_extension_for_oid(ExtensionOID.PRECERT_POISON)
-        except x509.ExtensionNotFound:
-            return None
-
-        return PrecertPoison(ext)
+        return self._get_wrapped_extension(ExtensionOID.PRECERT_POISON, PrecertPoison)
 
     @property
     def precertificate_signed_certificate_timestamps(self):
-        try:
-            ext = self.x509.extensions.get_extension_for_oid(
-                ExtensionOID.PRECERT_SIGNED_CERTIFICATE_TIMESTAMPS)
-        except x509.ExtensionNotFound:
-            return None
+        return self._get_wrapped_extension(ExtensionOID.PRECERT_SIGNED_CERTIFICATE_TIMESTAMPS,
+                                           self._wrap_precertificate_signed_certificate_timestamps)
 
+    def _wrap_precertificate_signed_certificate_timestamps(self, ext):
         if isinstance(ext.value, x509.UnrecognizedExtension):
             # Older versions of OpenSSL (and LibreSSL) cannot parse this extension
             # see https://github.com/pyca/cryptography/blob/master/tests/x509/test_x509_ext.py#L4455-L4459
@@ -440,40 +516,26 @@ class X509CertMixin(models.Model):
 
     @property
     def subject_alternative_name(self):
-        try:
-            ext = self.x509.extensions.get_extension_for_oid(ExtensionOID.SUBJECT_ALTERNATIVE_NAME)
-        except x509.ExtensionNotFound:
-            return None
-
-        return SubjectAlternativeName(ext)
+        return self._get_wrapped_extension(ExtensionOID.SUBJECT_ALTERNATIVE_NAME, SubjectAlternativeName)
 
     @property
     def subject_key_identifier(self):
         """The :py:class:`~django_ca.extensions.SubjectKeyIdentifier` extension, or ``None`` if it doesn't
         exist."""
-        try:
-            ext = self.x509.extensions.get_extension_for_oid(ExtensionOID.SUBJECT_KEY_IDENTIFIER)
-        except x509.ExtensionNotFound:
-            return None
-        return SubjectKeyIdentifier(ext)
+        return self._get_wrapped_extension(ExtensionOID.SUBJECT_KEY_IDENTIFIER, SubjectKeyIdentifier)
 
     @property
     def tls_feature(self):
         """The :py:class:`~django_ca.extensions.TLSFeature` extension, or ``None`` if it doesn't exist."""
-        try:
-            ext = self.x509.extensions.get_extension_for_oid(ExtensionOID.TLS_FEATURE)
-        except x509.ExtensionNotFound:
-            return None
-        return TLSFeature(ext)
+        return self._get_wrapped_extension(ExtensionOID.TLS_FEATURE, TLSFeature)
 
     #################################
     # Old-style extension accessors #
     #################################
 
     def certificatePolicies(self):
-        try:
-            ext = self.x509.extensions.get_extension_for_oid(ExtensionOID.CERTIFICATE_POLICIES)
-        except x509.ExtensionNotFound:
+        ext = self._get_extension(ExtensionOID.CERTIFICATE_POLICIES)
+        if ext is None:
             return None
 
         policies = []
@@ -488,9 +550,8 @@ class X509CertMixin(models.Model):
         return ext.critical, policies
 
     def crlDistributionPoints(self):
-        try:
-            ext = self.x509.extensions.get_extension_for_oid(ExtensionOID.CRL_DISTRIBUTION_POINTS)
-        except x509.ExtensionNotFound:
+        ext = self._get_extension(ExtensionOID.CRL_DISTRIBUTION_POINTS)
+        if ext is None:
             return None
 
         value = []
@@ -555,10 +616,34 @@ class CertificateAuthority(X509CertMixin):
             self._key = load_pem_private_key(key_data, password, default_backend())
         return self._key
 
+    def signing_key(self, password):
+        """Get the private key used for signing.
+
+        This is a :py:class:`~django_ca.signing.SigningKey` if :ref:`CA_SIGNING_BACKEND
+        <settings-ca-signing-backend>` is set, otherwise the same as :py:func:`key`.
+        """
+        backend = get_signing_backend()
+        if backend is not None:
+            return backend.get_key(self.private_key_path, self.x509.public_key(), password=password)
+        return self.key(password)
+
+    def test_signing_key(self, password):
+        """Test if the private key can be used for signing with the given password.
+
+        Raises an exception if the key cannot be used.
+        """
+        key = self.signing_key(password)
+        if isinstance(key, SigningKey):
+            key.sign(b'', hashes.SHA256())
+
     @property
     def key_exists(self):
         if self._key is not None:
             return True
+
+        backend = get_signing_backend()
+        if backend is not None:
+            return backend.key_exists(self.private_key_path)
         elif os.path.isabs(self.private_key_path):
             log.warning('%s: CA uses absolute path. Use "manage.py migrate_ca" to update.', self.serial)
             return os.path.exists(self.private_key_path)
@@ -568,9 +653,8 @@ class CertificateAuthority(X509CertMixin):
     def get_authority_key_identifier(self):
         """Return the AuthorityKeyIdentifier extension used in certificates signed by this CA."""
 
-        try:
-            ski = self.x509.extensions.get_extension_for_class(x509.SubjectKeyIdentifier)
-        except x509.ExtensionNotFound:
+        ski = self._get_extension(ExtensionOID.SUBJECT_KEY_IDENTIFIER)
+        if ski is None:
             return x509.AuthorityKeyIdentifier.from_issuer_public_key(self.x509.public_key())
         else:
             return x509.AuthorityKeyIdentifier.from_issuer_subject_key_identifier(ski)
@@ -579,9 +663,8 @@ class CertificateAuthority(X509CertMixin):
     def pathlen(self):
         """The ``pathlen`` attribute of the ``BasicConstraints`` extension (either an ``int`` or ``None``)."""
 
-        try:
-            ext = self.x509.extensions.get_extension_for_oid(ExtensionOID.BASIC_CONSTRAINTS)
-        except x509.ExtensionNotFound:  # pragma: no cover - extension should always be present
+        ext = self._get_extension(ExtensionOID.BASIC_CONSTRAINTS)
+        if ext is None:  # pragma: no cover - extension should always be present
             return None
         return ext.value.path_length
 
@@ -644,11 +727,246 @@ class Certificate(X509CertMixin):
                            verbose_name=_('Certificate Authority'))
     csr = models.TextField(verbose_name=_('CSR'), blank=True)
 
+    class Meta:
+        unique_together = (('ca', 'serial_hex'), )
+        index_together = (
+            ('ca', 'revoked', 'expires'),  # CRLs
+            ('revoked', 'expires'),  # valid()/expired() and expiring certificates
+        )
+
     @property
     def bundle(self):
         """The complete certificate bundle. This includes all CAs as well as the certificates itself."""
 
         return [self] + self.ca.bundle
 
+    def get_names(self):
+        """Get the (unsaved) :py:class:`~django_ca.models.CertificateName` instances for this certificate."""
+
+        names = []
+        for attr in self.x509.subject:
+            key = OID_NAME_MAPPINGS.get(attr.oid, attr.oid.dotted_string)
+            names.append((CertificateName.SUBJECT, '%s=%s' % (key, attr.value)))
+
+        san = self.subject_alternative_name
+        if san is not None:
+            names += [(CertificateName.SUBJECT_ALTERNATIVE_NAME, format_general_name(n)) for n in san.value]
+
+        key_usage = self.key_usage
+        if key_usage is not None:
+            names += [(CertificateName.KEY_USAGE, v) for v in key_usage.value]
+
+        extended_key_usage = self.extended_key_usage
+        if extended_key_usage is not None:
+            names += [(CertificateName.EXTENDED_KEY_USAGE, v) for v in extended_key_usage.value]
+
+        return [CertificateName(cert=self, field=field, value=CertificateName.normalize(value))
+                for field, value in names]
+
+    def update_names(self):
+        """Update the names used for searching this certificate."""
+
+        self.names.all().delete()
+        CertificateName.objects.bulk_create(self.get_names())
+        self._update_names = False
+
+    def save(self, *args, **kwargs):
+        super(Certificate, self).save(*args, **kwargs)
+
+        if self._update_names is True:
+            self.update_names()
+
     def __str__(self):
         return self.cn
+
+
+class CertificateName(models.Model):
+    """A name in a certificate, stored in an indexed table for searching certificates.
+
+    Names are lower-cased and stored as ``<type>:<value>`` for subject alternative names (e.g.
+    ``"dns:example.com"``), ``<key>=<value>`` for subject fields (e.g. ``"cn=example.com"``) and the name of
+    the key usage for (extended) key usage (e.g. ``"serverauth"``). Use
+    :py:meth:`~django_ca.querysets.CertificateQuerySet.with_name` for searching certificates.
+    """
+
+    SUBJECT = 'subject'
+    SUBJECT_ALTERNATIVE_NAME = 'san'
+    KEY_USAGE = 'key_usage'
+    EXTENDED_KEY_USAGE = 'ext_key_usage'
+    FIELD_CHOICES = (
+        (SUBJECT, _('Subject')),
+        (SUBJECT_ALTERNATIVE_NAME, _('subjectAltName')),
+        (KEY_USAGE, _('keyUsage')),
+        (EXTENDED_KEY_USAGE, _('extendedKeyUsage')),
+    )
+
+    cert = models.ForeignKey(Certificate, on_delete=models.CASCADE, related_name='names')
+    field = models.CharField(max_length=16, choices=FIELD_CHOICES)
+    value = models.CharField(max_length=255, db_index=True)
+
+    class Meta:
+        index_together = (('field', 'value'), )
+
+    @classmethod
+    def normalize(cls, value):
+        """Normalize a value for storing it or searching for it."""
+
+        return value.strip().lower()[:cls._meta.get_field('value').max_length]
+
+    def __str__(self):
+        return '%s: %s' % (self.field, self.value)
+
+
+class CertificateRevocationList(models.Model):
+    """State of the Certificate Revocation Lists (CRLs) issued by a certificate authority.
+
+    The state is used to add a monotonically increasing ``CRLNumber`` extension to every CRL and to generate
+    delta CRLs that only contain certificates revoked since the last full CRL. The last full and delta CRL are
+    stored so that they can be served again in other encodings, see :py:func:`~django_ca.crl.get_crl`. A CA
+    has separate state for CRLs of revoked certificates and CRLs of revoked child CAs (``ca_crl=True``).
+    """
+
+    ca = models.ForeignKey(CertificateAuthority, on_delete=models.CASCADE, related_name='crls',
+                           verbose_name=_('Certificate Authority'))
+    ca_crl = models.BooleanField(default=False, help_text=_('If the CRLs contain revoked child CAs.'))
+    number = models.PositiveIntegerField(default=0, help_text=_('CRLNumber of the last issued CRL.'))
+    full_number = models.PositiveIntegerField(null=True, blank=True,
+                                              help_text=_('CRLNumber of the last full CRL.'))
+    full_last_update = models.DateTimeField(
+        null=True, blank=True, help_text=_('Certificates revoked since then are not in the last full CRL.'))
+    full_crl = models.BinaryField(null=True, blank=True, help_text=_('The last full CRL in DER format.'))
+    delta_crl = models.BinaryField(null=True, blank=True, help_text=_('The last delta CRL in DER format.'))
+
+    class Meta:
+        verbose_name = _('Certificate Revocation List')
+        verbose_name_plural = _('Certificate Revocation Lists')
+        unique_together = (('ca', 'ca_crl'), )
+
+    def __str__(self):
+        return '%s (%s)' % (self.ca, self.number)
+
+
+class PooledPrivateKey(models.Model):
+    """A pre-generated private key, see :py:mod:`django_ca.keypool`.
+
+    The key is stored as encrypted PKCS8 in DER format.
+    """
+
+    created = models.DateTimeField(auto_now_add=True)
+    key_type = models.CharField(max_length=3)
+    key_size = models.PositiveIntegerField(null=True)
+    ecc_curve = models.CharField(max_length=32, blank=True)
+    key = models.BinaryField()
+
+    class Meta:
+        index_together = (('key_type', 'key_size', 'ecc_curve'), )
+
+    def __str__(self):
+        return '%s:%s' % (self.key_type, self.ecc_curve or self.key_size)
+
+
+class IssuanceJob(models.Model):
+    """A certificate that is issued asynchronously by ``manage.py run_signing_worker``.
+
+    Parameters for :py:func:`~django_ca.managers.CertificateManager.sign_cert` are stored as JSON in
+    ``options``, use :py:func:`~django_ca.managers.IssuanceJobManager.init` to create new jobs.
+    """
+
+    STATUS_PENDING = 'pending'
+    STATUS_RUNNING = 'running'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = (
+        (STATUS_PENDING, _('Pending')),
+        (STATUS_RUNNING, _('Running')),
+        (STATUS_DONE, _('Done')),
+        (STATUS_FAILED, _('Failed')),
+    )
+
+    objects = IssuanceJobManager()
+
+    ca = models.ForeignKey(CertificateAuthority, on_delete=models.CASCADE,
+                           verbose_name=_('Certificate Authority'))
+    csr = models.TextField(verbose_name=_('CSR'))
+    expires = models.DateTimeField(null=True, blank=True)
+    options = models.TextField(default='{}')
+    watchers = models.ManyToManyField(Watcher, related_name='issuance_jobs', blank=True)
+
+    status = models.CharField(max_length=8, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    cert = models.ForeignKey(Certificate, on_delete=models.SET_NULL, null=True, blank=True,
+                             related_name='issuance_jobs', verbose_name=_('Certificate'))
+    error = models.TextField(blank=True)
+    created = models.DateTimeField(auto_now_add=True)
+    started = models.DateTimeField(null=True, blank=True)
+    finished = models.DateTimeField(null=True, blank=True)
+
+    # Set when a worker claims the job, only this worker may finish it until the lease expires
+    claim_token = models.CharField(max_length=32, blank=True)
+    leased_until = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = _('Issuance job')
+        verbose_name_plural = _('Issuance jobs')
+        index_together = (('status', 'created'), )
+
+    @property
+    def duration(self):
+        """Seconds it took to issue the certificate, or ``None`` if the job is not finished."""
+
+        if self.started is None or self.finished is None:
+            return None
+        return (self.finished - self.started).total_seconds()
+
+    def get_kwargs(self):
+        """Get keyword arguments for :py:func:`~django_ca.managers.CertificateManager.sign_cert`."""
+
+        kwargs = {k: v for k, v in json.loads(self.options).items() if v is not None}
+        if self.expires is not None:
+            kwargs['expires'] = self.expires
+        return kwargs
+
+    def as_dict(self):
+        """Get the current state of this job as dictionary that can be serialized as JSON."""
+
+        def isoformat(value):
+            return value.isoformat() if value is not None else None
+
+        return {
+            'id': self.pk,
+            'status': self.status,
+            'ca': self.ca.serial,
+            'created': isoformat(self.created),
+            'started': isoformat(self.started),
+            'finished': isoformat(self.finished),
+            'duration': self.duration,
+            'error': self.error,
+            'cert': self.cert.serial if self.cert_id is not None else None,
+        }
+
+    def __str__(self):
+        return '%s (%s)' % (self.pk, self.get_status_display())
+
+
+class OutboxEvent(models.Model):
+    """An event that still has to be delivered by ``manage.py dispatch_outbox``, see
+    :py:mod:`django_ca.outbox`."""
+
+    event = models.CharField(max_length=32)
+    payload = models.TextField(default='{}')
+    created = models.DateTimeField(default=timezone.now)
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt = models.DateTimeField(default=timezone.now, db_index=True)
+    error = models.TextField(blank=True)
+
+    def as_dict(self):
+        """Get this event as dictionary as it is passed to handlers and webhooks."""
+
+        return {
+            'id': self.pk,
+            'event': self.event,
+            'created': self.created.isoformat(),
+            'data': json.loads(self.payload),
+        }
+
+    def __str__(self):
+        return '%s: %s' % (self.pk, self.event)
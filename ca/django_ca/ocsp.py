@@ -13,17 +13,67 @@
 # You should have received a copy of the GNU General Public License along with django-ca.  If not,
 # see <http://www.gnu.org/licenses/>.
 
+import multiprocessing
 from datetime import datetime
+from datetime import timedelta
+from itertools import islice
+
+import pytz
+
+from asn1crypto import core as asn1_core
+from asn1crypto import ocsp as asn1_ocsp
+from asn1crypto import x509 as asn1_x509
+from cryptography import x509
+from cryptography.hazmat.backends import default_backend
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import dsa
+from cryptography.hazmat.primitives.asymmetric import ec
+from cryptography.hazmat.primitives.asymmetric import rsa
+from cryptography.hazmat.primitives.serialization import Encoding
+from cryptography.hazmat.primitives.serialization import load_der_private_key
+
+from django.utils.encoding import force_bytes
+
+from . import ca_settings
+from .signing import SigningKey
+from .signing import sign_data
+from .utils import int_to_hex
+
+if ca_settings.CRYPTOGRAPHY_OCSP is True:  # pragma: only cryptography>=2.4
+    from cryptography.x509 import ocsp
 
 # We need a two-letter year, otherwise OCSP doesn't work
 date_format = '%y%m%d%H%M%SZ'
 
+# State of worker processes used by sign_responses()
+_worker = {}
+
+
+def get_ocsp_cache_key(ca_serial, serial):
+    """Get the cache key for cached OCSP responses for the given certificate.
+
+    The cache entry contains a token that is stored with the responses cached by every OCSP view (see
+    :py:func:`get_ocsp_response_cache_key`). Deleting it invalidates the cached responses of all views.
+    """
+
+    return 'ocsp_%s_%s' % (ca_serial, serial)
+
+
+def get_ocsp_response_cache_key(ca_serial, serial, responder_id):
+    """Get the cache key for an OCSP response cached by a single view, see
+    :py:func:`~django_ca.views.OCSPBaseView.get_cached_response`.
+    """
+
+    return 'ocsp_%s_%s_%s' % (ca_serial, serial, responder_id)
+
 
 def get_index(ca):
     now = datetime.utcnow()
 
     # Write index file (required by "openssl ocsp")
-    for cert in ca.certificate_set.all():
+    # The certificate is needed for the subject, but not the PEM or the CSR
+    for cert in ca.certificate_set.defer('pub', 'csr'):
         revocation = ''
         if cert.expires < now:
             status = 'E'
@@ -45,3 +95,320 @@ def get_index(ca):
             'unknown',  # we don't save to any file
             cert.distinguishedName(),
         ])
+
+
+def get_response_builder(cert, issuer, responder_cert, expires, revocation_time=None, revocation_reason=None):
+    """Get an OCSP response builder for a single certificate.
+
+    Note that this function requires cryptography>=2.4.
+
+    Parameters
+    ----------
+
+    cert : :py:class:`cg:cryptography.x509.Certificate`
+        The certificate to create the response for.
+    issuer : :py:class:`cg:cryptography.x509.Certificate`
+        The certificate authority that issued ``cert``.
+    responder_cert : :py:class:`cg:cryptography.x509.Certificate`
+        The certificate of the OCSP responder.
+    expires : int
+        Time in seconds that the response remains valid.
+    revocation_time : datetime, optional
+        The naive datetime (in UTC) when the certificate was revoked. If not passed, the certificate is
+        considered valid.
+    revocation_reason : :py:class:`cg:cryptography.x509.ReasonFlags`, optional
+        The reason why the certificate was revoked.
+    """
+    if revocation_time is None:
+        status = ocsp.OCSPCertStatus.GOOD
+    else:
+        status = ocsp.OCSPCertStatus.REVOKED
+
+    now = datetime.utcnow()
+    builder = ocsp.OCSPResponseBuilder()
+    builder = builder.add_response(
+        cert=cert, issuer=issuer, algorithm=hashes.SHA1(),
+        cert_status=status,
+        this_update=now,
+        next_update=now + timedelta(seconds=expires),
+        revocation_time=revocation_time,
+        revocation_reason=revocation_reason
+    ).responder_id(
+        ocsp.OCSPResponderEncoding.HASH, responder_cert
+    )
+
+    # Add the responder cert to the response, necessary because we (so far) always use delegate
+    # certificates
+    return builder.certificates([responder_cert])
+
+
+def get_combined_response(tbs_request, certs, responder_cert, expires, sign):
+    """Get a signed OCSP response for a request for multiple certificates.
+
+    Neither cryptography nor ocspbuilder can create responses with more than one ``SingleResponse``, so the
+    response is assembled using asn1crypto. Certificates that are not found in ``certs`` are reported with
+    the status ``unknown``.
+
+    Parameters
+    ----------
+
+    tbs_request : ``asn1crypto.ocsp.TBSRequest``
+        The parsed request.
+    certs : dict
+        Mapping of serials (as returned by :py:func:`~django_ca.utils.int_to_hex`) to the certificates (or
+        child certificate authorities) they identify.
+    responder_cert : bytes
+        The DER-encoded certificate of the OCSP responder.
+    expires : int
+        Time in seconds that the response remains valid.
+    sign : callable
+        Called with the DER-encoded ``ResponseData`` to sign, returns a tuple of the name of the signature
+        algorithm (e.g. ``"sha256_rsa"``) and the signature.
+
+    Returns
+    -------
+
+    bytes
+        The DER-encoded OCSP response.
+    """
+
+    now = datetime.now(pytz.utc)
+    next_update = now + timedelta(seconds=expires)
+    responder_cert = asn1_x509.Certificate.load(responder_cert)
+
+    responses = []
+    for single_request in tbs_request['request_list']:
+        req_cert = single_request['req_cert']
+        cert = certs.get(int_to_hex(req_cert['serial_number'].native))
+
+        if cert is None:
+            cert_status = asn1_ocsp.CertStatus(name='unknown', value=asn1_core.Null())
+        elif cert.revoked is False:
+            cert_status = asn1_ocsp.CertStatus(name='good', value=asn1_core.Null())
+        else:
+            revocation_time = pytz.utc.localize(cert.get_revocation_time())
+            cert_status = asn1_ocsp.CertStatus(name='revoked', value=asn1_ocsp.RevokedInfo({
+                'revocation_time': revocation_time,
+                'revocation_reason': cert.revoked_reason or 'unspecified',
+            }))
+
+        responses.append(asn1_ocsp.SingleResponse({
+            'cert_id': req_cert.copy(),
+            'cert_status': cert_status,
+            'this_update': now,
+            'next_update': next_update,
+        }))
+
+    response_extensions = []
+    for extension in tbs_request['request_extensions']:
+        if extension['extn_id'].native == 'nonce':
+            response_extensions.append(asn1_ocsp.ResponseDataExtension({
+                'extn_id': 'nonce',
+                'critical': extension['critical'].native,
+                'extn_value': extension['extn_value'].parsed.native,
+            }))
+
+    return _sign_response_data(now, responses, response_extensions, responder_cert, sign)
+
+
+def get_signed_response(serial, issuer, responder_cert, expires, sign, revocation_time=None,
+                        revocation_reason=None):
+    """Get a signed OCSP response for a single certificate.
+
+    Unlike :py:func:`get_response_builder`, the response is assembled using asn1crypto, so it can be signed
+    with any callable, e.g. one using a :py:class:`~django_ca.signing.SigningKey`.
+
+    Parameters
+    ----------
+
+    serial : int
+        The serial of the certificate to create the response for.
+    issuer : bytes
+        The DER-encoded certificate authority that issued the certificate.
+    responder_cert : bytes
+        The DER-encoded certificate of the OCSP responder.
+    expires : int
+        Time in seconds that the response remains valid.
+    sign : callable
+        Called with the DER-encoded ``ResponseData`` to sign, see :py:func:`get_combined_response`.
+    revocation_time : datetime, optional
+        The naive datetime (in UTC) when the certificate was revoked. If not passed, the certificate is
+        considered valid.
+    revocation_reason : :py:class:`cg:cryptography.x509.ReasonFlags`, optional
+        The reason why the certificate was revoked.
+
+    Returns
+    -------
+
+    bytes
+        The DER-encoded OCSP response.
+    """
+
+    now = datetime.now(pytz.utc)
+    issuer = asn1_x509.Certificate.load(issuer)
+    responder_cert = asn1_x509.Certificate.load(responder_cert)
+
+    if revocation_time is None:
+        cert_status = asn1_ocsp.CertStatus(name='good', value=asn1_core.Null())
+    else:
+        revoked_info = {'revocation_time': pytz.utc.localize(revocation_time)}
+        if revocation_reason is not None:
+            revoked_info['revocation_reason'] = revocation_reason.name
+        cert_status = asn1_ocsp.CertStatus(name='revoked', value=asn1_ocsp.RevokedInfo(revoked_info))
+
+    response = asn1_ocsp.SingleResponse({
+        'cert_id': {
+            'hash_algorithm': {'algorithm': 'sha1'},
+            'issuer_name_hash': issuer.subject.sha1,
+            'issuer_key_hash': issuer.public_key.sha1,
+            'serial_number': serial,
+        },
+        'cert_status': cert_status,
+        'this_update': now,
+        'next_update': now + timedelta(seconds=expires),
+    })
+    return _sign_response_data(now, [response], [], responder_cert, sign)
+
+
+def sign_response_data(responder_key, data):
+    """Sign the DER-encoded ``ResponseData`` of an OCSP response using SHA256.
+
+    ``responder_key`` may be a private key or a :py:class:`~django_ca.signing.SigningKey`. The return value is
+    suitable for the ``sign`` parameter of :py:func:`get_combined_response`.
+    """
+
+    public_key = responder_key.public_key()
+    if isinstance(public_key, rsa.RSAPublicKey):
+        algorithm = 'sha256_rsa'
+    elif isinstance(public_key, ec.EllipticCurvePublicKey):
+        algorithm = 'sha256_ecdsa'
+    elif isinstance(public_key, dsa.DSAPublicKey):
+        algorithm = 'sha256_dsa'
+    else:  # pragma: no cover
+        raise ValueError('Unsupported responder key type: %r' % responder_key)
+    return algorithm, sign_data(responder_key, data, hashes.SHA256())
+
+
+def _sign_response_data(now, responses, response_extensions, responder_cert, sign):
+    response_data = asn1_ocsp.ResponseData({
+        'responder_id': asn1_ocsp.ResponderId(name='by_key', value=responder_cert.public_key.sha1),
+        'produced_at': now,
+        'responses': responses,
+        'response_extensions': response_extensions or None,
+    })
+    signature_algorithm, signature = sign(response_data.dump())
+
+    return asn1_ocsp.OCSPResponse({
+        'response_status': 'successful',
+        'response_bytes': {
+            'response_type': 'basic_ocsp_response',
+            'response': asn1_ocsp.BasicOCSPResponse({
+                'tbs_response_data': response_data,
+                'signature_algorithm': {'algorithm': signature_algorithm},
+                'signature': signature,
+                'certs': [responder_cert],
+            }),
+        },
+    }).dump()
+
+
+def _init_worker(responder_key, responder_cert, issuer, expires):
+    backend = default_backend()
+    if not isinstance(responder_key, SigningKey):
+        responder_key = load_der_private_key(responder_key, None, backend)
+    _worker['responder_key'] = responder_key
+    _worker['responder_cert'] = x509.load_der_x509_certificate(responder_cert, backend)
+    _worker['issuer'] = x509.load_der_x509_certificate(issuer, backend)
+    _worker['expires'] = expires
+
+    # Responses signed with a signing backend are assembled with asn1crypto, which uses the DER encoding
+    _worker['der'] = (issuer, responder_cert)
+
+
+def _sign_response(args):
+    serial, pub, revocation_time, revocation_reason = args
+    responder_key = _worker['responder_key']
+    responder_cert = _worker['responder_cert']
+    issuer = _worker['issuer']
+
+    if isinstance(responder_key, SigningKey):
+        # cryptography can only sign responses with a loaded key, so assemble it with asn1crypto
+        issuer_der, responder_cert_der = _worker['der']
+        response = get_signed_response(
+            int(serial.replace(':', ''), 16), issuer_der, responder_cert_der, _worker['expires'],
+            lambda data: sign_response_data(responder_key, data),
+            revocation_time=revocation_time, revocation_reason=revocation_reason)
+        return serial, response
+
+    cert = x509.load_pem_x509_certificate(force_bytes(pub), default_backend())
+    builder = get_response_builder(cert, issuer, responder_cert, _worker['expires'],
+                                   revocation_time=revocation_time, revocation_reason=revocation_reason)
+    return serial, builder.sign(responder_key, hashes.SHA256()).public_bytes(Encoding.DER)
+
+
+def sign_responses(certs, issuer, responder_key, responder_cert, expires, processes=1, chunksize=100):
+    """Sign OCSP responses for many certificates.
+
+    Note that this function requires cryptography>=2.4.
+
+    Parameters
+    ----------
+
+    certs : iterable of :py:class:`~django_ca.models.Certificate` or \
+            :py:class:`~django_ca.models.CertificateAuthority`
+        The certificates to sign responses for.
+    issuer : :py:class:`cg:cryptography.x509.Certificate`
+        The certificate authority that issued all ``certs``.
+    responder_key
+        The private key of the OCSP responder or a :py:class:`~django_ca.signing.SigningKey`. Keys of a
+        signing backend cannot be passed to worker processes, so responses are always signed in the current
+        process in this case.
+    responder_cert : :py:class:`cg:cryptography.x509.Certificate`
+        The certificate of the OCSP responder.
+    expires : int
+        Time in seconds that the responses remain valid.
+    processes : int, optional
+        Number of worker processes used for signing responses. If ``1`` (the default), responses are signed in
+        the current process.
+    chunksize : int, optional
+        Number of responses passed to a worker process at once.
+
+    Yields
+    ------
+
+    tuple
+        The serial of the certificate and the DER encoded response.
+    """
+    if isinstance(responder_key, SigningKey):
+        processes = 1
+    else:
+        responder_key = responder_key.private_bytes(Encoding.DER, serialization.PrivateFormat.PKCS8,
+                                                    serialization.NoEncryption())
+
+    initargs = (
+        responder_key,
+        responder_cert.public_bytes(Encoding.DER),
+        issuer.public_bytes(Encoding.DER),
+        expires,
+    )
+    args = ((c.serial, c.pub, c.get_revocation_time(), c.get_revocation_reason()) for c in certs)
+
+    if processes == 1:
+        _init_worker(*initargs)
+        for arg in args:
+            yield _sign_response(arg)
+        return
+
+    # Certificates are read in batches in this thread, as database connections are bound to the thread that
+    # opened them and the pool would otherwise consume the iterator in a thread of its own.
+    pool = multiprocessing.Pool(processes, initializer=_init_worker, initargs=initargs)
+    batch_size = chunksize * processes * 4
+    try:
+        batch = list(islice(args, batch_size))
+        while batch:
+            for response in pool.imap_unordered(_sign_response, batch, chunksize=chunksize):
+                yield response
+            batch = list(islice(args, batch_size))
+    finally:
+        pool.terminate()
+        pool.join()
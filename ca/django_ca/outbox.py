@@ -0,0 +1,182 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of django-ca (https://github.com/mathiasertl/django-ca).
+#
+# django-ca is free software: you can redistribute it and/or modify it under the terms of the GNU
+# General Public License as published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# django-ca is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without
+# even the implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with django-ca.  If not,
+# see <http://www.gnu.org/licenses/>.
+
+"""Transactional outbox for delivering events to slow or unreliable receivers.
+
+Receivers of signals are called synchronously, so a slow receiver (e.g. one that calls a
+webhook) delays issuing or revoking certificates. If :ref:`CA_OUTBOX_HANDLERS <settings-ca-outbox-handlers>`
+or :ref:`CA_OUTBOX_WEBHOOKS <settings-ca-outbox-webhooks>` are set, an event is stored in the database in the
+same transaction as the certificate (or revocation) it describes. ``manage.py dispatch_outbox`` later
+delivers events in batches and retries failed deliveries with an exponential backoff.
+
+Events are delivered at least once, so handlers and webhooks should use the ``id`` of an event to ignore
+events they have already received.
+"""
+
+import json
+import logging
+from datetime import timedelta
+
+from django.db import connection
+from django.db import transaction
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from django.utils.six.moves.urllib.request import Request
+from django.utils.six.moves.urllib.request import urlopen
+
+from . import ca_settings
+from .models import CertificateAuthority
+from .models import OutboxEvent
+
+log = logging.getLogger(__name__)
+
+RETRY_DELAY = 10
+"""Seconds to wait before delivering events again after the first failed attempt."""
+
+MAX_RETRY_DELAY = 3600
+"""Maximum number of seconds to wait before delivering events again."""
+
+EVENTS = ('post_create_ca', 'post_issue_cert', 'post_revoke_cert', )
+
+
+def is_enabled():
+    """Return ``True`` if events should be stored in the outbox."""
+
+    return bool(ca_settings.CA_OUTBOX_HANDLERS or ca_settings.CA_OUTBOX_WEBHOOKS)
+
+
+def get_payload(event, obj):
+    """Get the data of an event for the given certificate or certificate authority."""
+
+    def isoformat(value):
+        return value.isoformat() if value is not None else None
+
+    if isinstance(obj, CertificateAuthority):
+        issuer = obj.parent
+    else:
+        issuer = obj.ca
+
+    data = {
+        'serial': obj.serial,
+        'cn': obj.cn,
+        'expires': isoformat(obj.expires),
+        'issuer': issuer.serial if issuer is not None else None,
+    }
+    if event == 'post_create_ca':
+        data['name'] = obj.name
+    elif event == 'post_revoke_cert':
+        data['revoked_date'] = isoformat(obj.revoked_date)
+        data['revoked_reason'] = obj.revoked_reason
+    return data
+
+
+def record(event, objs):
+    """Store events for the given certificates or certificate authorities in the outbox.
+
+    Call this function in the same transaction that stores the objects, so that events are only stored if
+    the objects are stored as well. If the outbox is not enabled, this function does nothing.
+
+    Parameters
+    ----------
+
+    event : str
+        The name of the event, one of ``"post_create_ca"``, ``"post_issue_cert"`` or ``"post_revoke_cert"``.
+    objs : list
+        The :py:class:`~django_ca.models.Certificate` or :py:class:`~django_ca.models.CertificateAuthority`
+        instances that the events are about.
+    """
+    if event not in EVENTS:
+        raise ValueError('%s: Unknown event.' % event)
+    if not is_enabled():
+        return
+
+    OutboxEvent.objects.bulk_create([
+        OutboxEvent(event=event, payload=json.dumps(get_payload(event, obj))) for obj in objs
+    ])
+
+
+def post_webhook(url, events, timeout=10):
+    """Send events to a webhook as JSON encoded ``{"events": [...]}`` with a POST request.
+
+    Any HTTP status code >= 400 raises an exception.
+    """
+    data = json.dumps({'events': events}).encode('utf-8')
+    request = Request(url, data=data, headers={'Content-Type': 'application/json'})
+    response = urlopen(request, timeout=timeout)
+    response.close()
+
+
+def deliver(events, timeout=10):
+    """Deliver events to all configured handlers and webhooks.
+
+    Handlers configured with :ref:`CA_OUTBOX_HANDLERS <settings-ca-outbox-handlers>` are called with the list
+    of events. Any exception raised by a handler or webhook is passed on to the caller.
+    """
+    for path in ca_settings.CA_OUTBOX_HANDLERS:
+        import_string(path)(events)
+    for url in ca_settings.CA_OUTBOX_WEBHOOKS:
+        post_webhook(url, events, timeout=timeout)
+
+
+def claim(count, lease=300):
+    """Claim up to ``count`` events that are due for delivery.
+
+    Claimed events are not claimed by other dispatchers for ``lease`` seconds, which should be longer than
+    it takes to deliver the events.
+    """
+    skip_locked = connection.features.has_select_for_update_skip_locked
+    now = timezone.now()
+
+    with transaction.atomic():
+        qs = OutboxEvent.objects.filter(next_attempt__lte=now).order_by('pk')
+        events = list(qs.select_for_update(skip_locked=skip_locked)[:count])
+        OutboxEvent.objects.filter(pk__in=[e.pk for e in events]).update(
+            next_attempt=now + timedelta(seconds=lease))
+    return events
+
+
+def dispatch(batch_size=100, timeout=10, lease=300):
+    """Deliver one batch of events from the outbox.
+
+    Delivered events are removed from the outbox. If delivery fails, the events are delivered again after
+    :py:data:`RETRY_DELAY` seconds, doubling the delay after every failed attempt (up to
+    :py:data:`MAX_RETRY_DELAY` seconds).
+
+    Returns
+    -------
+
+    tuple
+        The number of delivered events and the number of events that could not be delivered.
+    """
+    events = claim(batch_size, lease=lease)
+    if not events:
+        return 0, 0
+
+    try:
+        deliver([e.as_dict() for e in events], timeout=timeout)
+    except Exception as e:
+        log.exception('Could not deliver %s events.', len(events))
+
+        now = timezone.now()
+        for event in events:
+            event.attempts += 1
+            event.error = str(e)
+            delay = min(RETRY_DELAY * 2 ** (event.attempts - 1), MAX_RETRY_DELAY)
+            event.next_attempt = now + timedelta(seconds=delay)
+            event.save(update_fields=['attempts', 'error', 'next_attempt'])
+        return 0, len(events)
+
+    OutboxEvent.objects.filter(pk__in=[e.pk for e in events]).delete()
+    return len(events), 0
@@ -13,16 +13,40 @@
 # You should have received a copy of the GNU General Public License along with django-ca.  If not,
 # see <http://www.gnu.org/licenses/>.
 
+from django.core.cache import cache
 from django.db import models
+from django.db import transaction
 from django.db.models import Q
 from django.utils import timezone
 
+from .signals import post_bulk_revoke_cert
+from .signals import post_revoke_cert
+from .signals import pre_bulk_revoke_cert
+from .signals import pre_revoke_cert
+from .utils import SERIAL_RE
+from .utils import bytes_to_hex
+from .utils import hex_to_bytes
+from .utils import pad_serial
+
+
+def _normalize_hex(value):
+    # Accept upper/lower case with and without colons
+    return bytes_to_hex(hex_to_bytes(value.strip()))
+
 
 class DjangoCAMixin(object):
     def get_by_serial_or_cn(self, identifier):
         identifier = identifier.strip()
         serial = identifier.upper()
 
+        if SERIAL_RE.match(serial):
+            # Try an exact match first, it is much cheaper than a prefix match. Serials are only unique per
+            # CA, so several CAs might have issued a certificate with this serial.
+            try:
+                return self.get(serial_hex=pad_serial(serial))
+            except (self.model.DoesNotExist, self.model.MultipleObjectsReturned):
+                pass
+
         return self.get(Q(serial__startswith=serial) | Q(cn=identifier))
 
     def revoked(self):
@@ -30,6 +54,32 @@ class DjangoCAMixin(object):
 
         return self.filter(revoked=True)
 
+    def by_fingerprint(self, fingerprint, algorithm='SHA256'):
+        """Return certificates with the given fingerprint.
+
+        ``fingerprint`` is a hex string with or without colons, ``algorithm`` is either ``"SHA256"`` or
+        ``"SHA1"``.
+        """
+
+        algorithm = algorithm.upper()
+        if algorithm not in ['SHA256', 'SHA1']:
+            raise ValueError('%s: Unsupported fingerprint algorithm.' % algorithm)
+
+        return self.filter(**{'%s_fingerprint' % algorithm.lower(): _normalize_hex(fingerprint)})
+
+    def by_ski(self, ski):
+        """Return certificates with the given SubjectKeyIdentifier (as hex string)."""
+
+        return self.filter(ski=_normalize_hex(ski))
+
+    def issued_by_aki(self, aki):
+        """Return certificates with the given AuthorityKeyIdentifier (as hex string).
+
+        Pass the SubjectKeyIdentifier of a CA to get certificates issued by that CA.
+        """
+
+        return self.filter(aki=_normalize_hex(aki))
+
 
 class CertificateAuthorityQuerySet(models.QuerySet, DjangoCAMixin):
     def enabled(self):
@@ -54,3 +104,98 @@ class CertificateQuerySet(models.QuerySet, DjangoCAMixin):
         Note that this method does not return revoked certificates that would otherwise be expired.
         """
         return self.filter(revoked=False, expires__lt=timezone.now())
+
+    def light(self):
+        """Return certificates without loading the certificate itself or the CSR.
+
+        Use this for listing certificates if only fields like ``serial``, ``cn``, ``expires`` or the
+        revocation status are used. The certificate is still loaded (with an extra query) if you access it.
+        """
+
+        return self.defer('pub', 'der', 'csr')
+
+    def with_name(self, value, field=None):
+        """Return certificates that contain the given name.
+
+        The lookup uses the indexed :py:class:`~django_ca.models.CertificateName` table, see there for the
+        format of ``value``. Pass ``field`` to only search subject fields, subject alternative names or
+        (extended) key usage, e.g. ``with_name('DNS:*.example.com', field='san')``.
+        """
+
+        kwargs = {'names__value': value.strip().lower()}
+        if field is not None:
+            kwargs['names__field'] = field
+        return self.filter(**kwargs).distinct()
+
+    def bulk_revoke(self, reason=None, chunk_size=900):
+        """Revoke all certificates in this queryset that are not yet revoked.
+
+        Certificates are revoked with one ``UPDATE`` query per ``chunk_size`` certificates, all in a single
+        transaction. :py:data:`~django_ca.signals.pre_bulk_revoke_cert` and
+        :py:data:`~django_ca.signals.post_bulk_revoke_cert` are sent once per chunk,
+        :py:data:`~django_ca.signals.pre_revoke_cert` and :py:data:`~django_ca.signals.post_revoke_cert`
+        are still sent for every certificate (with ``bulk=True``), but before the transaction is committed.
+        Cached OCSP responses for the revoked certificates and cached CRLs of the issuing certificate
+        authorities are removed once all certificates are revoked.
+
+        Parameters
+        ----------
+
+        reason : str, optional
+            The reason for the revocation.
+        chunk_size : int, optional
+            Number of certificates revoked with a single query. The default stays below the limit of 999
+            query parameters of SQLite.
+
+        Returns
+        -------
+
+        int
+            The number of revoked certificates.
+        """
+        # imported here to avoid circular imports
+        from .crl import get_crl_cache_keys
+        from .ocsp import get_ocsp_cache_key
+        from .outbox import record as record_event
+
+        ca_model = self.model._meta.get_field('ca').related_model
+        pks = list(self.filter(revoked=False).order_by('pk').values_list('pk', flat=True))
+        cas = {}
+        cache_keys = []
+        count = 0
+        now = timezone.now()
+
+        with transaction.atomic():
+            for i in range(0, len(pks), chunk_size):
+                qs = self.model.objects.filter(pk__in=pks[i:i + chunk_size], revoked=False).order_by('pk')
+                certs = list(qs.select_for_update().light())
+
+                # Load certificate authorities only once
+                missing = {c.ca_id for c in certs if c.ca_id not in cas}
+                if missing:
+                    cas.update(ca_model.objects.in_bulk(missing))
+                for cert in certs:
+                    cert.ca = cas[cert.ca_id]
+
+                pre_bulk_revoke_cert.send(sender=self.model, certs=certs, reason=reason)
+                for cert in certs:
+                    pre_revoke_cert.send(sender=self.model, cert=cert, reason=reason, bulk=True)
+                self.model.objects.filter(pk__in=[c.pk for c in certs]).update(
+                    revoked=True, revoked_date=now, revoked_reason=reason)
+
+                for cert in certs:
+                    cert.revoked = True
+                    cert.revoked_date = now
+                    cert.revoked_reason = reason
+                    cache_keys.append(get_ocsp_cache_key(cert.ca.serial, cert.serial))
+
+                record_event('post_revoke_cert', certs)
+                for cert in certs:
+                    post_revoke_cert.send(sender=self.model, cert=cert, bulk=True)
+                post_bulk_revoke_cert.send(sender=self.model, certs=certs)
+                count += len(certs)
+
+        for ca in cas.values():
+            cache_keys += get_crl_cache_keys(ca.serial)
+        cache.delete_many(cache_keys)
+        return count
@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of django-ca (https://github.com/mathiasertl/django-ca).
+#
+# django-ca is free software: you can redistribute it and/or modify it under the terms of the GNU
+# General Public License as published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# django-ca is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without
+# even the implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with django-ca.  If not,
+# see <http://www.gnu.org/licenses/>.
+
+"""Signal receivers used internally by **django-ca**."""
+
+from django.core.cache import cache
+from django.db.models.signals import post_delete
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from .managers import ca_extensions_cache
+from .models import CertificateAuthority
+from .ocsp import get_ocsp_cache_key
+from .signals import post_revoke_cert
+
+
+@receiver(post_revoke_cert)
+def invalidate_ocsp_cache(sender, cert, bulk=False, **kwargs):
+    """Remove any cached OCSP response for a certificate that was just revoked."""
+
+    if bulk is True:  # bulk_revoke() removes cached responses for all certificates at once
+        return
+
+    if isinstance(cert, CertificateAuthority):
+        ca = cert.parent
+        if ca is None:  # root CAs are not validated via OCSP
+            return
+    else:
+        ca = cert.ca
+
+    cache.delete(get_ocsp_cache_key(ca.serial, cert.serial))
+
+
+@receiver(post_save, sender=CertificateAuthority)
+@receiver(post_delete, sender=CertificateAuthority)
+def invalidate_ca_extensions(sender, instance, **kwargs):
+    """Remove the cached extensions for certificates signed by a CA that was just changed."""
+
+    ca_extensions_cache.pop(instance.pk, None)
@@ -72,18 +72,22 @@ cert : :py:class:`~django_ca.models.Certificate`
     The certificate that was just issued.
 """
 
-pre_revoke_cert = django.dispatch.Signal(providing_args=['cert', 'reason'])
+pre_revoke_cert = django.dispatch.Signal(providing_args=['cert', 'reason', 'bulk'])
 """Called before a certificate is revoked.
 
 Parameters
 ----------
 
-ca
-csr
-**kwargs
+cert : :py:class:`~django_ca.models.Certificate`
+    The certificate that is about to be revoked.
+reason : str
+    The reason for the revocation.
+bulk : bool
+    ``True`` if the certificate is revoked with
+    :py:meth:`~django_ca.querysets.CertificateQuerySet.bulk_revoke`. Not passed otherwise.
 """
 
-post_revoke_cert = django.dispatch.Signal(providing_args=['cert'])
+post_revoke_cert = django.dispatch.Signal(providing_args=['cert', 'bulk'])
 """Called after a certificate was revoked
 
 Parameters
@@ -91,4 +95,37 @@ Parameters
 
 cert : :py:class:`~django_ca.models.Certificate`
     The certificate that was just revoked.
+bulk : bool
+    ``True`` if the certificate was revoked with
+    :py:meth:`~django_ca.querysets.CertificateQuerySet.bulk_revoke`, in which case the signal is sent before
+    the transaction is committed. Not passed otherwise.
+"""
+
+pre_bulk_revoke_cert = django.dispatch.Signal(providing_args=['certs', 'reason'])
+"""Called before a chunk of certificates is revoked with
+:py:meth:`~django_ca.querysets.CertificateQuerySet.bulk_revoke`.
+
+:py:data:`pre_revoke_cert` is sent for every certificate after this signal.
+
+Parameters
+----------
+
+certs : list of :py:class:`~django_ca.models.Certificate`
+    The certificates that are about to be revoked.
+reason : str
+    The reason for the revocation.
+"""
+
+post_bulk_revoke_cert = django.dispatch.Signal(providing_args=['certs'])
+"""Called after a chunk of certificates was revoked with
+:py:meth:`~django_ca.querysets.CertificateQuerySet.bulk_revoke`.
+
+The signal is sent before the transaction is committed and after :py:data:`post_revoke_cert` was sent for
+every certificate.
+
+Parameters
+----------
+
+certs : list of :py:class:`~django_ca.models.Certificate`
+    The certificates that were just revoked.
 """
@@ -0,0 +1,634 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of django-ca (https://github.com/mathiasertl/django-ca).
+#
+# django-ca is free software: you can redistribute it and/or modify it under the terms of the GNU
+# General Public License as published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# django-ca is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without
+# even the implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with django-ca.  If not,
+# see <http://www.gnu.org/licenses/>.
+
+"""Signing data with private keys that are not loaded by the current process.
+
+By default, every process that signs certificates, CRLs or OCSP responses loads the private keys it needs
+from :ref:`CA_FILE_STORAGE <settings-ca-file-storage>`. If :ref:`CA_SIGNING_BACKEND
+<settings-ca-signing-backend>` is set, keys are instead provided by a backend:
+
+* :py:class:`SocketBackend` uses a daemon started with ``manage.py run_signing_daemon``. The daemon loads
+  every key only once and signs data sent to it over a unix socket.
+* :py:class:`PKCS11Backend` uses keys stored in a hardware security module (HSM).
+
+The protocol of the signing daemon is line-based: Every request and every response is a JSON object on a
+single line. A request contains the ``path`` of the private key (as used by :ref:`CA_FILE_STORAGE
+<settings-ca-file-storage>`), the base64-encoded ``password`` (or ``null``), the name of the hash
+``algorithm`` and the base64-encoded ``data`` to sign. The response contains either the base64-encoded
+``signature`` or an ``error``. The daemon only uses private keys of certificate authorities and OCSP
+views (see :py:func:`get_key_paths`) and rejects requests if too many requests are pending.
+"""
+
+import base64
+import errno
+import json
+import logging
+import os
+import socket
+import threading
+from contextlib import contextmanager
+from multiprocessing.pool import ThreadPool
+
+import six
+from six.moves import queue
+from six.moves import socketserver
+
+from asn1crypto import crl as asn1_crl
+from asn1crypto import x509 as asn1_x509
+from cryptography import x509
+from cryptography.hazmat.backends import default_backend
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.asymmetric import dsa
+from cryptography.hazmat.primitives.asymmetric import ec
+from cryptography.hazmat.primitives.asymmetric import padding
+from cryptography.hazmat.primitives.asymmetric import rsa
+from cryptography.hazmat.primitives.serialization import Encoding
+from cryptography.hazmat.primitives.serialization import load_pem_private_key
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection
+from django.urls import get_resolver
+from django.utils.encoding import force_text
+from django.utils.module_loading import import_string
+
+from . import ca_settings
+from .utils import ca_storage
+from .utils import parse_hash_algorithm
+from .utils import read_file
+
+log = logging.getLogger(__name__)
+
+# Throwaway keys used to build certificates and CRLs that are then signed by a backend
+_placeholder_keys = {}
+
+# The configured backend, so that it is only created once per process
+_backends = {}
+
+
+class SigningKey(object):
+    """Base class for private keys that are provided by a signing backend.
+
+    Subclasses must implement :py:func:`sign`.
+
+    Parameters
+    ----------
+
+    path : str
+        Path (or label) of the private key.
+    public_key
+        The public key matching the private key.
+    """
+
+    def __init__(self, path, public_key):
+        self.path = path
+        self._public_key = public_key
+
+    def __repr__(self):
+        return '<%s: %s>' % (type(self).__name__, self.path)
+
+    def public_key(self):
+        return self._public_key
+
+    def sign(self, data, algorithm):
+        """Sign ``data`` using the given hash algorithm.
+
+        RSA signatures must use PKCS #1 v1.5 padding, ECDSA and DSA signatures must be DER-encoded.
+        """
+        raise NotImplementedError
+
+
+class RemoteKey(SigningKey):
+    """A private key held by the signing daemon.
+
+    Parameters
+    ----------
+
+    path : str
+        Path to the private key as used by :ref:`CA_FILE_STORAGE <settings-ca-file-storage>`.
+    public_key
+        The public key matching the private key.
+    password : bytes, optional
+        Password used to load the private key.
+    socket_path : str, optional
+        Path to the socket of the daemon. The default is the value of :ref:`CA_SIGNING_SOCKET
+        <settings-ca-signing-socket>`.
+    """
+
+    def __init__(self, path, public_key, password=None, socket_path=None):
+        super(RemoteKey, self).__init__(path, public_key)
+        self.password = password
+        self.socket_path = socket_path or ca_settings.CA_SIGNING_SOCKET
+
+    def sign(self, data, algorithm):
+        """Let the daemon sign ``data`` using the given hash algorithm.
+
+        Raises ``ValueError`` if the daemon could not sign the data.
+        """
+
+        password = self.password
+        if password is not None:
+            password = force_text(base64.b64encode(password))
+
+        request = json.dumps({
+            'path': self.path,
+            'password': password,
+            'algorithm': type(algorithm).__name__,
+            'data': force_text(base64.b64encode(data)),
+        })
+
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            sock.connect(self.socket_path)
+            try:
+                sock.sendall(request.encode('utf-8') + b'\n')
+            except socket.error:
+                pass  # the daemon closed the connection, e.g. because it was rejected, see below
+            stream = sock.makefile('rb')
+            try:
+                response = stream.readline()
+            except socket.error:
+                response = b''
+            finally:
+                stream.close()
+        finally:
+            sock.close()
+
+        if not response:
+            raise ValueError('%s: Signing daemon closed the connection.' % self.path)
+
+        response = json.loads(response.decode('utf-8'))
+        if 'error' in response:
+            raise ValueError('%s: %s' % (self.path, response['error']))
+        return base64.b64decode(response['signature'])
+
+
+class PKCS11Key(SigningKey):  # pragma: only PKCS11
+    """A private key stored in a hardware security module, see :py:class:`PKCS11Backend`."""
+
+    def __init__(self, path, public_key, backend):
+        super(PKCS11Key, self).__init__(path, public_key)
+        self.backend = backend
+
+    def sign(self, data, algorithm):
+        return self.backend.sign(self, data, algorithm)
+
+
+class SigningBackend(object):
+    """Base class for signing backends.
+
+    Backends are configured with :ref:`CA_SIGNING_BACKEND <settings-ca-signing-backend>` and are created
+    only once per process with the keyword arguments in :ref:`CA_SIGNING_BACKEND_KWARGS
+    <settings-ca-signing-backend>`. Subclasses must implement :py:func:`get_key`.
+    """
+
+    def get_key(self, path, public_key, password=None):
+        """Get the :py:class:`SigningKey` for the private key at ``path``.
+
+        Parameters
+        ----------
+
+        path : str
+            The ``private_key_path`` of a certificate authority or the ``responder_key`` of an OCSP view.
+        public_key
+            The public key matching the private key.
+        password : bytes, optional
+            Password used to load the private key.
+        """
+        raise NotImplementedError
+
+    def key_exists(self, path):
+        """Return ``True`` if a private key for ``path`` exists.
+
+        The default implementation checks if the file exists in :ref:`CA_FILE_STORAGE
+        <settings-ca-file-storage>`.
+        """
+        if os.path.isabs(path):
+            return os.path.exists(path)
+        return ca_storage.exists(path)
+
+
+class SocketBackend(SigningBackend):
+    """Backend using the signing daemon started with ``manage.py run_signing_daemon``.
+
+    This backend is used by default if :ref:`CA_SIGNING_SOCKET <settings-ca-signing-socket>` is set.
+
+    Parameters
+    ----------
+
+    path : str, optional
+        Path to the socket of the daemon. The default is the value of :ref:`CA_SIGNING_SOCKET
+        <settings-ca-signing-socket>`.
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+
+    def get_key(self, path, public_key, password=None):
+        return RemoteKey(path, public_key, password=password, socket_path=self.path)
+
+
+class SessionPool(object):
+    """A thread-safe pool of at most ``size`` sessions.
+
+    Sessions are created by calling ``create`` when they are first needed. If ``size`` sessions are in use,
+    :py:func:`session` blocks until a session is returned to the pool.
+    """
+
+    def __init__(self, create, size=4):
+        self.create = create
+        self.size = size
+        self.created = 0
+        self.lock = threading.Lock()
+        self.sessions = queue.LifoQueue()
+
+    @contextmanager
+    def session(self):
+        try:
+            session = self.sessions.get_nowait()
+        except queue.Empty:
+            with self.lock:
+                create = self.created < self.size
+                if create:
+                    self.created += 1
+
+            if create:
+                try:
+                    session = self.create()
+                except Exception:
+                    with self.lock:
+                        self.created -= 1
+                    raise
+            else:
+                session = self.sessions.get()
+
+        try:
+            yield session
+        finally:
+            self.sessions.put(session)
+
+
+class PKCS11Backend(SigningBackend):  # pragma: only PKCS11
+    """Backend using private keys stored in a hardware security module (HSM) via PKCS #11.
+
+    This backend requires `python-pkcs11 <https://python-pkcs11.readthedocs.io/>`_. Private keys are found by
+    their label, which is the ``private_key_path`` of the certificate authority (or the ``responder_key`` of
+    an OCSP view). Passwords are ignored, the token is accessed with ``pin`` instead.
+
+    Every session is used by only one thread at a time, so concurrent signing operations use up to
+    ``sessions`` sessions. Only the first session logs in to the token, the login is shared with all other
+    sessions of the process. The first session is thus never closed while the backend is in use.
+
+    Parameters
+    ----------
+
+    lib : str
+        Path to the PKCS #11 library of the HSM (e.g. ``/usr/lib/softhsm/libsofthsm2.so``).
+    token : str
+        Label of the token.
+    pin : str
+        User PIN of the token.
+    sessions : int, optional
+        Maximum number of sessions opened at the same time, the default is ``4``.
+    """
+
+    def __init__(self, lib, token, pin, sessions=4):
+        try:
+            import pkcs11
+        except ImportError:
+            raise ImproperlyConfigured('PKCS11Backend requires python-pkcs11.')
+
+        self.pkcs11 = pkcs11
+        self.token = pkcs11.lib(lib).get_token(token_label=token)
+        self.pin = pin
+        self.login_session = None
+        self.lock = threading.Lock()
+        self.pool = SessionPool(self.open_session, size=sessions)
+        self.keys = {}
+
+    def open_session(self):
+        """Open a new session, logging in to the token only if no other session has done so yet."""
+
+        with self.lock:
+            if self.login_session is None:
+                # Closing this session would log out all other sessions, so it is kept until the process exits
+                self.login_session = self.token.open(user_pin=self.pin)
+                return self.login_session
+        return self.token.open()
+
+    def get_key(self, path, public_key, password=None):
+        return PKCS11Key(path, public_key, self)
+
+    def get_session_key(self, session, label):
+        # Key handles are only valid for the session they were found with
+        cache_key = (id(session), label)
+        if cache_key not in self.keys:
+            self.keys[cache_key] = session.get_key(
+                object_class=self.pkcs11.ObjectClass.PRIVATE_KEY, label=label)
+        return self.keys[cache_key]
+
+    def key_exists(self, path):
+        with self.pool.session() as session:
+            try:
+                self.get_session_key(session, path)
+                return True
+            except self.pkcs11.exceptions.NoSuchKey:
+                return False
+
+    def sign(self, key, data, algorithm):
+        """Sign ``data`` with the given :py:class:`PKCS11Key`."""
+
+        Mechanism = self.pkcs11.Mechanism
+        public_key = key.public_key()
+        if isinstance(public_key, rsa.RSAPublicKey):
+            mechanism = getattr(Mechanism, '%s_RSA_PKCS' % type(algorithm).__name__)
+            encode = None
+        else:
+            # Hash the data ourselves, as not every HSM supports ECDSA/DSA mechanisms including a hash
+            digest = hashes.Hash(algorithm, default_backend())
+            digest.update(data)
+            data = digest.finalize()
+
+            if isinstance(public_key, ec.EllipticCurvePublicKey):
+                from pkcs11.util.ec import encode_ecdsa_signature as encode
+                mechanism = Mechanism.ECDSA
+            elif isinstance(public_key, dsa.DSAPublicKey):
+                from pkcs11.util.dsa import encode_dsa_signature as encode
+                mechanism = Mechanism.DSA
+            else:
+                raise ValueError('Unsupported public key type: %r' % public_key)
+
+        with self.pool.session() as session:
+            signature = self.get_session_key(session, key.path).sign(data, mechanism=mechanism)
+
+        if encode is not None:
+            signature = encode(signature)
+        return signature
+
+
+def get_signing_backend():
+    """Get the backend configured with :ref:`CA_SIGNING_BACKEND <settings-ca-signing-backend>`.
+
+    Returns ``None`` if no backend is configured, in which case private keys are loaded by the current
+    process.
+    """
+
+    path = ca_settings.CA_SIGNING_BACKEND
+    if path is None:
+        return None
+
+    kwargs = ca_settings.CA_SIGNING_BACKEND_KWARGS
+    cached = _backends.get(path)
+    if cached is None or cached[0] != kwargs:
+        cached = _backends[path] = (kwargs, import_string(path)(**kwargs))
+    return cached[1]
+
+
+def sign_data(private_key, data, algorithm):
+    """Sign ``data`` with the padding used for certificates (PKCS #1 v1.5 for RSA keys).
+
+    ``private_key`` may also be a :py:class:`SigningKey`.
+    """
+
+    if isinstance(private_key, SigningKey):
+        return private_key.sign(data, algorithm)
+    elif isinstance(private_key, rsa.RSAPrivateKey):
+        return private_key.sign(data, padding.PKCS1v15(), algorithm)
+    elif isinstance(private_key, ec.EllipticCurvePrivateKey):
+        return private_key.sign(data, ec.ECDSA(algorithm))
+    elif isinstance(private_key, dsa.DSAPrivateKey):
+        return private_key.sign(data, algorithm)
+    raise ValueError('Unsupported private key type: %r' % private_key)
+
+
+def get_placeholder_key(public_key):
+    """Get a throwaway private key that produces the same signature algorithm as ``public_key``."""
+
+    if isinstance(public_key, ec.EllipticCurvePublicKey):
+        cache_key = public_key.curve.name
+    else:
+        cache_key = type(public_key)
+
+    if cache_key not in _placeholder_keys:
+        backend = default_backend()
+        if isinstance(public_key, rsa.RSAPublicKey):
+            key = rsa.generate_private_key(public_exponent=65537, key_size=1024, backend=backend)
+        elif isinstance(public_key, ec.EllipticCurvePublicKey):
+            key = ec.generate_private_key(public_key.curve, backend)
+        elif isinstance(public_key, dsa.DSAPublicKey):
+            key = dsa.generate_private_key(key_size=1024, backend=backend)
+        else:
+            raise ValueError('Unsupported public key type: %r' % public_key)
+        _placeholder_keys[cache_key] = key
+
+    return _placeholder_keys[cache_key]
+
+
+def sign_builder(builder, private_key, algorithm):
+    """Sign a certificate or CRL builder.
+
+    If ``private_key`` is a :py:class:`SigningKey`, the certificate or CRL is first signed with a throwaway
+    key of the same type and the signature is then replaced by one created by the signing backend. OCSP
+    responses are assembled with asn1crypto instead, see :py:func:`~django_ca.ocsp.get_signed_response`.
+
+    Parameters
+    ----------
+
+    builder : :py:class:`cg:cryptography.x509.CertificateBuilder` or \
+            :py:class:`cg:cryptography.x509.CertificateRevocationListBuilder`
+    private_key
+        A private key or a :py:class:`SigningKey`.
+    algorithm : :py:class:`~cg:cryptography.hazmat.primitives.hashes.HashAlgorithm`
+        The hash algorithm to use.
+    """
+
+    backend = default_backend()
+
+    if isinstance(private_key, SigningKey):
+        sign_key = get_placeholder_key(private_key.public_key())
+    else:
+        sign_key = private_key
+
+    signed = builder.sign(private_key=sign_key, algorithm=algorithm, backend=backend)
+    if not isinstance(private_key, SigningKey):
+        return signed
+
+    if isinstance(builder, x509.CertificateRevocationListBuilder):
+        asn1 = asn1_crl.CertificateList.load(signed.public_bytes(Encoding.DER))
+        asn1['signature'] = private_key.sign(asn1['tbs_cert_list'].dump(), algorithm)
+        return x509.load_der_x509_crl(asn1.dump(force=True), backend)
+
+    asn1 = asn1_x509.Certificate.load(signed.public_bytes(Encoding.DER))
+    asn1['signature_value'] = private_key.sign(asn1['tbs_certificate'].dump(), algorithm)
+    return x509.load_der_x509_certificate(asn1.dump(force=True), backend)
+
+
+def _get_responder_keys(patterns):
+    from .views import OCSPBaseView  # imported here to avoid circular imports
+
+    for pattern in patterns:
+        if hasattr(pattern, 'url_patterns'):  # patterns added with include()
+            for path in _get_responder_keys(pattern.url_patterns):
+                yield path
+            continue
+
+        view_class = getattr(pattern.callback, 'view_class', None)
+        if view_class is not None and issubclass(view_class, OCSPBaseView):
+            yield pattern.callback.view_initkwargs.get('responder_key', view_class.responder_key)
+
+
+def get_key_paths():
+    """Get the paths of all private keys that may be used by the signing daemon.
+
+    These are the private keys of all certificate authorities, of all OCSP views in the URL configuration
+    and of the OCSP responders configured in ``CA_OCSP_URLS`` (also used by ``manage.py
+    generate_ocsp_responses``).
+    """
+
+    from .models import CertificateAuthority  # imported here to avoid circular imports
+
+    ocsp_urls = getattr(settings, 'CA_OCSP_URLS', {})
+    responder_keys = [kwargs.get('responder_key') for kwargs in ocsp_urls.values()]
+    responder_keys += _get_responder_keys(get_resolver().url_patterns)
+
+    paths = set(CertificateAuthority.objects.values_list('private_key_path', flat=True))
+    for responder_key in responder_keys:
+        if isinstance(responder_key, six.string_types):
+            paths.add(responder_key)
+    return paths
+
+
+class SigningRequestHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        for line in iter(self.rfile.readline, b''):
+            response = self.server.process(line)
+            self.wfile.write(json.dumps(response).encode('utf-8') + b'\n')
+
+
+class SigningServer(socketserver.UnixStreamServer):
+    """Server for the signing daemon.
+
+    Connections are handled by a pool of ``workers`` threads. If ``workers`` connections are being handled
+    and ``queue_size`` more connections are waiting for a thread, new connections are rejected with an
+    error. Private keys are loaded when they are first used and kept in memory until the server exits.
+
+    Parameters
+    ----------
+
+    path : str
+        Path of the unix socket to listen on.
+    workers : int, optional
+        Number of threads handling connections, the default is ``1``.
+    queue_size : int, optional
+        Maximum number of pending connections, the default is ``4`` for every worker.
+    key_paths : callable, optional
+        Returns the paths of all private keys the daemon may use, the default is :py:func:`get_key_paths`.
+        It is called in a worker thread if a private key is not yet loaded.
+    """
+
+    def __init__(self, path, workers=1, queue_size=None, key_paths=get_key_paths):
+        if queue_size is None:
+            queue_size = workers * 4
+
+        self.keys = {}
+        self.key_paths = key_paths
+        self.lock = threading.Lock()
+        self.pool = ThreadPool(workers)
+        self.slots = threading.BoundedSemaphore(workers + queue_size)
+        socketserver.UnixStreamServer.__init__(self, path, SigningRequestHandler)
+
+    def server_bind(self):
+        if os.path.exists(self.server_address):
+            os.remove(self.server_address)  # left over from a previous run
+
+        socketserver.UnixStreamServer.server_bind(self)
+
+        # Anybody who can connect can use keys once they are loaded, so only allow the current user
+        os.chmod(self.server_address, 0o600)
+
+    def server_close(self):
+        socketserver.UnixStreamServer.server_close(self)
+        self.pool.close()
+        self.pool.join()
+        if os.path.exists(self.server_address):
+            os.remove(self.server_address)
+
+    def process_request(self, request, client_address):
+        if not self.slots.acquire(False):
+            log.warning('Rejecting connection: Too many pending requests.')
+            self.reject_request(request)
+            return
+
+        self.pool.apply_async(self.process_request_thread, (request, client_address))
+
+    def reject_request(self, request):
+        try:
+            request.sendall(json.dumps({'error': 'Too many pending requests.'}).encode('utf-8') + b'\n')
+
+            # Closing a connection with unread data resets it, which discards the error for the client
+            request.setblocking(False)
+            while request.recv(4096):
+                pass
+        except socket.error as e:
+            if e.errno not in (errno.EAGAIN, errno.EWOULDBLOCK):
+                log.warning('Could not reject connection: %s', e)
+        finally:
+            self.shutdown_request(request)
+
+    def process_request_thread(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+            self.slots.release()
+
+    def check_key_path(self, path):
+        try:
+            key_paths = self.key_paths()
+        finally:
+            # Worker threads live as long as the server, so do not keep the database connection open
+            connection.close()
+
+        if path not in key_paths:
+            raise ValueError('%s: Not a private key of a certificate authority or OCSP view.' % path)
+
+    def get_key(self, path, password):
+        # Keys are cached together with the password, so a wrong password is never accepted
+        cache_key = (path, password)
+        with self.lock:
+            if cache_key not in self.keys:
+                self.check_key_path(path)
+                log.info('%s: Loading private key.', path)
+                self.keys[cache_key] = load_pem_private_key(read_file(path), password, default_backend())
+            return self.keys[cache_key]
+
+    def process(self, line):
+        """Process a single request and return the response."""
+
+        try:
+            request = json.loads(line.decode('utf-8'))
+            password = request.get('password')
+            if password is not None:
+                password = base64.b64decode(password)
+
+            key = self.get_key(request['path'], password)
+            algorithm = parse_hash_algorithm(request['algorithm'])
+            signature = sign_data(key, base64.b64decode(request['data']), algorithm)
+            return {'signature': force_text(base64.b64encode(signature))}
+        except Exception as e:
+            log.exception(e)
+            return {'error': str(e) or type(e).__name__}
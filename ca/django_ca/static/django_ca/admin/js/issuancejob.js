@@ -0,0 +1,28 @@
+// Reload the change view of a pending or running issuance job once the job is finished.
+django.jQuery(document).ready(function() {
+    var path = window.location.pathname;
+    if (! /\/[0-9]+\/change\/$/.test(path)) {
+        return;  // not a change view
+    }
+    var status_url = path.replace(/change\/$/, 'status/');
+
+    function is_finished(data) {
+        return data.status != 'pending' && data.status != 'running';
+    }
+
+    function poll() {
+        django.jQuery.getJSON(status_url, function(data) {
+            if (is_finished(data)) {
+                window.location.reload();
+            } else {
+                window.setTimeout(poll, 2000);
+            }
+        });
+    }
+
+    django.jQuery.getJSON(status_url, function(data) {
+        if (! is_finished(data)) {
+            window.setTimeout(poll, 2000);
+        }
+    });
+});
@@ -6,10 +6,12 @@ Replace this with more appropriate tests for your application.
 """
 
 import inspect
+import json
 import os
 import re
 import shutil
 import tempfile
+import threading
 from contextlib import contextmanager
 from datetime import datetime
 from datetime import timedelta
@@ -38,6 +40,8 @@ from django.test.utils import override_settings as _override_settings
 from django.utils.encoding import force_text
 from django.utils.six import StringIO
 from django.utils.six.moves import reload_module
+from django.utils.six.moves.BaseHTTPServer import BaseHTTPRequestHandler
+from django.utils.six.moves.BaseHTTPServer import HTTPServer
 
 from .. import ca_settings
 from ..extensions import AuthorityInformationAccess
@@ -58,6 +62,8 @@ from ..profiles import get_cert_profile_kwargs
 from ..signals import post_create_ca
 from ..signals import post_issue_cert
 from ..signals import post_revoke_cert
+from ..signing import SigningServer
+from ..signing import get_key_paths
 from ..subject import Subject
 from ..utils import OID_NAME_MAPPINGS
 from ..utils import ca_storage
@@ -76,6 +82,19 @@ if ca_settings.CRYPTOGRAPHY_HAS_PRECERT_POISON:  # pragma: no branch, pragma: on
     from ..extensions import PrecertPoison
 
 
+class WebhookRequestHandler(BaseHTTPRequestHandler):
+    """Request handler for :py:meth:`DjangoCATestCase.webhook_server`."""
+
+    def do_POST(self):
+        length = int(self.headers['Content-Length'])
+        self.server.requests.append((self.path, json.loads(self.rfile.read(length).decode('utf-8'))))
+        self.send_response(self.server.status)
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass  # don't clutter the output of the test suite
+
+
 def _load_key(path, password=None):
     path = os.path.join(settings.FIXTURES_DIR, path)
     with open(path, 'rb') as stream:
@@ -474,6 +493,48 @@ class DjangoCATestCase(TestCase):
     def mock_cadir(self, path):
         return mock_cadir(path)
 
+    @contextmanager
+    def signing_daemon(self, workers=1, queue_size=None):
+        """Context manager to run a signing daemon in a thread and use it for signing."""
+        tmpdir = tempfile.mkdtemp()
+
+        # Worker threads cannot read data of the test transaction, so key paths are read in advance
+        key_paths = get_key_paths()
+        server = SigningServer(os.path.join(tmpdir, 'signing.sock'), workers=workers, queue_size=queue_size,
+                               key_paths=lambda: key_paths)
+        thread = threading.Thread(target=server.serve_forever)
+        thread.start()
+
+        try:
+            with self.settings(CA_SIGNING_SOCKET=server.server_address):
+                yield server
+        finally:
+            server.shutdown()
+            thread.join()
+            server.server_close()
+            shutil.rmtree(tmpdir)
+
+    @contextmanager
+    def webhook_server(self, status=200):
+        """Context manager for a local HTTP server that records the JSON data posted to it.
+
+        The server has a ``url`` attribute and posted data is appended to its ``requests`` attribute as
+        ``(path, data)`` tuples. All requests are answered with the HTTP status code in ``status``.
+        """
+        server = HTTPServer(('127.0.0.1', 0), WebhookRequestHandler)
+        server.requests = []
+        server.status = status
+        server.url = 'http://%s:%s' % server.server_address
+        thread = threading.Thread(target=server.serve_forever)
+        thread.start()
+
+        try:
+            yield server
+        finally:
+            server.shutdown()
+            thread.join()
+            server.server_close()
+
     def assertAuthorityKeyIdentifier(self, issuer, cert, critical=False):
         self.assertEqual(cert.authority_key_identifier.value, issuer.subject_key_identifier.value)
 
@@ -139,6 +139,23 @@ class ChangelistTestCase(AdminTestMixin, DjangoCAWithCertTestCase):
         response = client.get(self.changelist_url)
         self.assertRequiresLogin(response)
 
+    def test_search(self):
+        def search(term):
+            return self.client.get(self.changelist_url, {'q': term})
+
+        # Search by name, either a plain name or in the format of the indexed names
+        self.assertResponse(search('www.derstandard.at'), [self.cert_godaddy_derstandardat])
+        self.assertResponse(search(' DNS:Jabber.Wien '), [self.cert_letsencrypt_jabber_at])
+        self.assertResponse(search('cn=jabber.at'), [self.cert_letsencrypt_jabber_at])
+        self.assertResponse(search('serverAuth'), [
+            self.cert, self.cert2, self.cert3, self.cert_all, self.cert_cloudflare_1,
+            self.cert_letsencrypt_jabber_at, self.cert_godaddy_derstandardat])
+
+        # Names must match exactly, but the CommonName and serial are still searched
+        self.assertResponse(search('derstandard'), [self.cert_godaddy_derstandardat])
+        self.assertResponse(search('jabber.wie'), [])
+        self.assertResponse(search(self.cert.serial[:8]), [self.cert])
+
 
 class RevokeActionTestCase(AdminTestMixin, DjangoCAWithCertTestCase):
     """Test the "revoke" action in the changelist."""
@@ -280,16 +297,15 @@ class ChangeTestCase(AdminTestMixin, DjangoCAWithCertTestCase):
         oid = ObjectIdentifier('1.1.1.1')
         value = UnrecognizedExtension(oid, b'foo')
         ext = Extension(oid=oid, critical=False, value=value)
-        orig_func = cert.x509.extensions.get_extension_for_oid
+        orig_func = Certificate._get_extension
 
-        def side_effect(key):
+        def side_effect(obj, key):
             if key == ExtensionOID.PRECERT_SIGNED_CERTIFICATE_TIMESTAMPS:
                 return ext
             else:
-                return orig_func(key)
+                return orig_func(obj, key)
 
-        with mock.patch('cryptography.x509.extensions.Extensions.get_extension_for_oid',
-                        side_effect=side_effect):
+        with mock.patch.object(Certificate, '_get_extension', autospec=True, side_effect=side_effect):
             response = self.client.get(self.change_url(cert.pk))
             self.assertChangeResponse(response)
 
@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of django-ca (https://github.com/mathiasertl/django-ca).
+#
+# django-ca is free software: you can redistribute it and/or modify it under the terms of the GNU
+# General Public License as published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# django-ca is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without
+# even the implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with django-ca.  If not,
+# see <http://www.gnu.org/licenses/>.
+
+import os
+
+from cryptography.hazmat.primitives import hashes
+
+from .. import ca_settings
+from .base import DjangoCAWithCATestCase
+from .base import override_tmpcadir
+
+try:
+    import unittest.mock as mock
+except ImportError:
+    import mock
+
+
+class BenchmarkSigningTestCase(DjangoCAWithCATestCase):
+    @override_tmpcadir()
+    def test_file(self):
+        stdout, stderr = self.cmd('benchmark_signing', ca=self.ca, count=3)
+        self.assertRegex(stdout, r'^file: Created 3 signatures in [0-9.]+ seconds \([0-9.]+ signatures per '
+                                 r'second\)\.\nNo signing backend configured\.\n$')
+        self.assertEqual(stderr, '')
+
+    @override_tmpcadir()
+    def test_signing_daemon(self):
+        with self.signing_daemon():
+            stdout, stderr = self.cmd('benchmark_signing', ca=self.pwd_ca, count=4, jobs=2,
+                                      password=b'test_password', algorithm=hashes.SHA256())
+        self.assertRegex(stdout, r'^file: Created 4 signatures .*\nSocketBackend: Created 4 signatures .*\n$')
+        self.assertEqual(stderr, '')
+
+    @override_tmpcadir()
+    def test_absolute_path(self):
+        self.ca.private_key_path = os.path.join(ca_settings.CA_DIR, self.ca.private_key_path)
+        stdout, stderr = self.cmd('benchmark_signing', ca=self.ca, count=1)
+        self.assertRegex(stdout, r'^file: Created 1 signatures .*\nNo signing backend configured\.\n$')
+
+    @override_tmpcadir()
+    def test_no_file(self):
+        self.ca.private_key_path = 'does-not-exist.key'
+        stdout, stderr = self.cmd('benchmark_signing', ca=self.ca, count=1)
+        self.assertEqual(stdout, 'file: Private key not found.\nNo signing backend configured.\n')
+
+    @override_tmpcadir()
+    def test_errors(self):
+        with self.assertCommandError(r'^--count must be at least 1\.$'):
+            self.cmd('benchmark_signing', ca=self.ca, count=0)
+        with self.assertCommandError(r'^--jobs must be at least 1\.$'):
+            self.cmd('benchmark_signing', ca=self.ca, jobs=0)
+        with self.assertCommandError(r'^Bad decrypt'):
+            self.cmd('benchmark_signing', ca=self.pwd_ca, password=b'wrong')
+
+        with mock.patch('django_ca.management.commands.benchmark_signing.sign_data',
+                        side_effect=ValueError('signing failed')), \
+                self.assertCommandError(r'^file: signing failed$'):
+            self.cmd('benchmark_signing', ca=self.ca, count=1)
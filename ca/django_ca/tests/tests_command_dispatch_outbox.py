@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of django-ca (https://github.com/mathiasertl/django-ca).
+#
+# django-ca is free software: you can redistribute it and/or modify it under the terms of the GNU
+# General Public License as published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# django-ca is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without
+# even the implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with django-ca.  If not,
+# see <http://www.gnu.org/licenses/>.
+
+from .. import outbox
+from ..models import OutboxEvent
+from .base import DjangoCAWithCertTestCase
+from .base import override_settings
+
+try:
+    import unittest.mock as mock
+except ImportError:
+    import mock
+
+
+class DispatchOutboxTestCase(DjangoCAWithCertTestCase):
+    def test_basic(self):
+        with self.webhook_server() as server, self.settings(CA_OUTBOX_WEBHOOKS=[server.url]):
+            outbox.record('post_issue_cert', [self.cert, self.cert2, self.cert3])
+            stdout, stderr = self.cmd('dispatch_outbox', batch_size=2)
+
+        self.assertRegex(stdout, r'^Delivered 3 events in [0-9.]+ seconds, 0 failed\.\n$')
+        self.assertEqual(stderr, '')
+        self.assertEqual([len(data['events']) for path, data in server.requests], [2, 1])
+        self.assertFalse(OutboxEvent.objects.exists())
+
+    def test_failed(self):
+        with self.webhook_server(status=503) as server, self.settings(CA_OUTBOX_WEBHOOKS=[server.url]), \
+                self.assertLogs('django_ca.outbox', 'ERROR'):
+            outbox.record('post_issue_cert', [self.cert, self.cert2, self.cert3])
+            stdout, stderr = self.cmd('dispatch_outbox', batch_size=2)
+
+        # Dispatching stops after the first failed batch
+        self.assertRegex(stdout, r'^Delivered 0 events in [0-9.]+ seconds, 2 failed\.\n$')
+        self.assertEqual(len(server.requests), 1)
+        self.assertEqual(OutboxEvent.objects.count(), 3)
+
+    @override_settings(CA_OUTBOX_WEBHOOKS=['http://localhost/'])
+    def test_interval(self):
+        with mock.patch('time.sleep', side_effect=[None, KeyboardInterrupt]) as sleep:
+            stdout, stderr = self.cmd('dispatch_outbox', interval=5)
+        self.assertEqual(sleep.call_args_list, [mock.call(5), mock.call(5)])
+        self.assertEqual(stdout, '')  # no events
+
+    def test_errors(self):
+        with self.assertCommandError(r'^Please set the CA_OUTBOX_HANDLERS or CA_OUTBOX_WEBHOOKS setting\.$'):
+            self.cmd('dispatch_outbox')
+
+        with self.settings(CA_OUTBOX_WEBHOOKS=['http://localhost/']):
+            with self.assertCommandError(r'^--batch-size must be at least 1\.$'):
+                self.cmd('dispatch_outbox', batch_size=0)
+            with self.assertCommandError(r'^0: Interval must be greater than 0\.$'):
+                self.cmd('dispatch_outbox', interval=0)
@@ -15,21 +15,32 @@
 
 import os
 import re
+from datetime import timedelta
 from io import BytesIO
 
+from freezegun import freeze_time
+
 from cryptography import x509
 from cryptography.hazmat.backends import default_backend
 from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.serialization import Encoding
 
 from django.utils import six
+from django.utils import timezone
 
 from .. import ca_settings
 from ..models import Certificate
 from ..models import CertificateAuthority
+from ..models import CertificateRevocationList
 from .base import DjangoCAWithCertTestCase
 from .base import override_settings
 from .base import override_tmpcadir
 
+try:
+    import unittest.mock as mock
+except ImportError:
+    import mock
+
 
 @override_settings(CA_MIN_KEY_SIZE=1024, CA_PROFILES={}, CA_DEFAULT_SUBJECT={})
 class DumpCRLTestCase(DjangoCAWithCertTestCase):
@@ -166,3 +177,143 @@ class DumpCRLTestCase(DjangoCAWithCertTestCase):
     @override_settings(USE_TZ=True)
     def test_revoked_with_use_tz(self):
         self.test_revoked()
+
+    @override_tmpcadir()
+    @freeze_time('2019-02-03 15:43:12')
+    def test_revoked_without_loading_certs(self):
+        for cert in Certificate.objects.filter(ca=self.ca):
+            cert.revoke('key_compromise')
+        qs = Certificate.objects.filter(ca=self.ca, expires__gt=timezone.now())
+        serials = sorted(c.x509.serial_number for c in qs)
+
+        # Certificates are not loaded when generating the CRL
+        with mock.patch.object(Certificate, 'x509', new_callable=mock.PropertyMock,
+                               side_effect=Exception('cert loaded')):
+            stdout, stderr = self.cmd('dump_crl', stdout=BytesIO(), stderr=BytesIO())
+
+        crl = x509.load_pem_x509_crl(stdout, default_backend())
+        self.assertEqual(sorted(r.serial_number for r in crl), serials)
+        self.assertEqual(set(r.extensions[0].value.reason for r in crl), {x509.ReasonFlags.key_compromise})
+
+    @override_tmpcadir()
+    def test_crl_number(self):
+        def dump(**kwargs):
+            kwargs.setdefault('format', Encoding.DER)
+            stdout, stderr = self.cmd('dump_crl', stdout=BytesIO(), stderr=BytesIO(), **kwargs)
+            self.assertEqual(stderr, b'')
+            return x509.load_der_x509_crl(stdout, default_backend())
+
+        def number(crl):
+            return crl.extensions.get_extension_for_class(x509.CRLNumber).value.crl_number
+
+        with freeze_time('2019-02-03 15:43:12') as frozen:
+            crl = dump()
+            self.assertEqual(number(crl), 1)
+
+            # During the first half of its validity, the same CRL is returned in every encoding and algorithm
+            stdout, stderr = self.cmd('dump_crl', format=Encoding.PEM, stdout=BytesIO(), stderr=BytesIO())
+            self.assertEqual(stdout, crl.public_bytes(Encoding.PEM))
+            sha256_crl = dump(algorithm=hashes.SHA256())
+            self.assertIsInstance(sha256_crl.signature_hash_algorithm, hashes.SHA256)
+            self.assertEqual(number(sha256_crl), 1)
+            self.assertEqual(sha256_crl.last_update, crl.last_update)
+            self.assertEqual(sha256_crl.next_update, crl.next_update)
+            self.assertEqual(list(sha256_crl.extensions), list(crl.extensions))
+
+            # ... but not if the validity is different
+            self.assertEqual(number(dump(expires=3600)), 2)
+            self.assertEqual(number(dump()), 3)
+
+            # A new CRL is generated after half of its validity passed
+            frozen.tick(timedelta(seconds=43200))
+            crl = dump()
+            self.assertEqual(number(crl), 4)
+            self.assertEqual(number(dump()), 4)
+
+            # ... or if the revoked certificates change
+            cert = Certificate.objects.get(serial=self.cert.serial)
+            cert.revoke()
+            crl = dump()
+            self.assertEqual(number(crl), 5)
+            self.assertEqual([r.serial_number for r in crl], [cert.x509.serial_number])
+            self.assertEqual(number(dump()), 5)
+
+            cert.revoked_reason = 'key_compromise'
+            cert.save()
+            crl = dump()
+            self.assertEqual(number(crl), 6)
+            self.assertEqual(crl[0].extensions.get_extension_for_class(x509.CRLReason).value.reason,
+                             x509.ReasonFlags.key_compromise)
+
+            # revoked certificates are copied when the stored CRL is signed with a different algorithm
+            sha256_crl = dump(algorithm=hashes.SHA256())
+            self.assertEqual(number(sha256_crl), 6)
+            self.assertEqual([(r.serial_number, r.revocation_date, list(r.extensions)) for r in sha256_crl],
+                             [(r.serial_number, r.revocation_date, list(r.extensions)) for r in crl])
+
+        state = CertificateRevocationList.objects.get(ca=self.ca, ca_crl=False)
+        self.assertEqual(state.number, 6)
+        self.assertEqual(state.full_number, 6)
+        self.assertEqual(bytes(state.full_crl), crl.public_bytes(Encoding.DER))
+        self.assertEqual(str(state), '%s (6)' % self.ca)
+
+        # CRLs for child CAs are numbered independently
+        stdout, stderr = self.cmd('dump_crl', ca_crl=True, stdout=BytesIO(), stderr=BytesIO())
+        crl = x509.load_pem_x509_crl(stdout, default_backend())
+        self.assertEqual(crl.extensions.get_extension_for_class(x509.CRLNumber).value, x509.CRLNumber(1))
+
+    @override_tmpcadir()
+    def test_delta(self):
+        def number(crl, ext=x509.CRLNumber):
+            return crl.extensions.get_extension_for_class(ext).value.crl_number
+
+        first = Certificate.objects.get(serial=self.certs[0].serial)
+        second = Certificate.objects.get(serial=self.certs[1].serial)
+        with freeze_time('2019-02-03 15:43:12'):
+            first.revoke()
+
+        # Without a full CRL, a full CRL is generated first
+        with freeze_time('2019-02-03 15:44:12'):
+            stdout, stderr = self.cmd('dump_crl', delta=True, stdout=BytesIO(), stderr=BytesIO())
+        self.assertEqual(stderr, b'')
+        crl = x509.load_pem_x509_crl(stdout, default_backend())
+        self.assertEqual(list(crl), [])
+        self.assertEqual(number(crl), 2)
+        self.assertEqual(number(crl, x509.DeltaCRLIndicator), 1)
+
+        state = CertificateRevocationList.objects.get(ca=self.ca, ca_crl=False)
+        self.assertEqual((state.number, state.full_number), (2, 1))
+        full_crl = x509.load_der_x509_crl(bytes(state.full_crl), default_backend())
+        self.assertEqual([r.serial_number for r in full_crl], [first.x509.serial_number])
+
+        # The full CRL generated for the delta CRL is served as full CRL
+        with freeze_time('2019-02-03 15:44:42'):
+            stdout, stderr = self.cmd('dump_crl', format=Encoding.DER, stdout=BytesIO(), stderr=BytesIO())
+        self.assertEqual(stdout, bytes(state.full_crl))
+
+        # A delta CRL contains only certificates revoked since the last full CRL
+        with freeze_time('2019-02-03 15:45:12'):
+            second.revoke()
+            stdout, stderr = self.cmd('dump_crl', delta=True, stdout=BytesIO(), stderr=BytesIO())
+        self.assertEqual(stderr, b'')
+        crl = x509.load_pem_x509_crl(stdout, default_backend())
+        self.assertEqual([r.serial_number for r in crl], [second.x509.serial_number])
+        self.assertEqual(number(crl), 3)
+        delta_indicator = crl.extensions.get_extension_for_class(x509.DeltaCRLIndicator)
+        self.assertTrue(delta_indicator.critical)
+        self.assertEqual(delta_indicator.value, x509.DeltaCRLIndicator(1))
+
+        # the stored full CRL is not replaced by the delta CRL
+        state = CertificateRevocationList.objects.get(ca=self.ca, ca_crl=False)
+        self.assertEqual((state.number, state.full_number), (3, 1))
+        self.assertEqual(bytes(state.delta_crl), crl.public_bytes(Encoding.DER))
+
+        # A new full CRL replaces the delta CRL, as it refers to the previous full CRL
+        with freeze_time('2019-02-03 15:46:12'):
+            stdout, stderr = self.cmd('dump_crl', stdout=BytesIO(), stderr=BytesIO())
+        crl = x509.load_pem_x509_crl(stdout, default_backend())
+        self.assertEqual(number(crl), 4)
+        self.assertEqual(len(list(crl)), 2)
+        state = CertificateRevocationList.objects.get(ca=self.ca, ca_crl=False)
+        self.assertEqual((state.number, state.full_number), (4, 4))
+        self.assertIsNone(state.delta_crl)
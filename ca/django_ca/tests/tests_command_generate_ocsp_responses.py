@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of django-ca (https://github.com/mathiasertl/django-ca).
+#
+# django-ca is free software: you can redistribute it and/or modify it under the terms of the GNU
+# General Public License as published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# django-ca is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without
+# even the implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with django-ca.  If not,
+# see <http://www.gnu.org/licenses/>
+
+import binascii
+import os
+import unittest
+
+from freezegun import freeze_time
+
+from asn1crypto.x509 import Certificate as Asn1Certificate
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.asymmetric import padding
+from cryptography.hazmat.primitives.serialization import Encoding
+
+from django.utils import timezone
+
+from .. import ca_settings
+from ..views import OCSPView
+from .base import DjangoCAWithCertTestCase
+from .base import certs
+from .base import child_pubkey
+from .base import override_settings
+from .base import override_tmpcadir
+
+try:
+    import unittest.mock as mock
+except ImportError:
+    import mock
+
+
+@unittest.skipUnless(ca_settings.CRYPTOGRAPHY_OCSP, 'Skip cryptography test for cryptography<2.4')
+@override_settings(CA_OCSP_URLS={
+    'root': {
+        'ca': certs['root']['serial'],
+        'responder_key': 'ocsp.key',
+        'responder_cert': 'ocsp.pem',
+    },
+})
+@freeze_time('2019-02-03 15:43:12')
+class GenerateOCSPResponsesTestCase(DjangoCAWithCertTestCase):
+    def get_directory(self, responder='root'):
+        issuer = Asn1Certificate.load(self.ca.dump_certificate(Encoding.DER))
+        return os.path.join(ca_settings.CA_DIR, responder,
+                            binascii.hexlify(issuer.subject.sha1).decode('utf-8'),
+                            binascii.hexlify(issuer.public_key.sha1).decode('utf-8'))
+
+    def assertResponses(self, certs, responder='root'):
+        from cryptography.x509 import ocsp
+
+        directory = self.get_directory(responder)
+        self.assertEqual(sorted(os.listdir(directory)),
+                         sorted(['%s.der' % c.serial.replace(':', '') for c in certs]))
+
+        for cert in certs:
+            with open(os.path.join(directory, '%s.der' % cert.serial.replace(':', '')), 'rb') as stream:
+                response = ocsp.load_der_ocsp_response(stream.read())
+
+            self.assertEqual(response.response_status, ocsp.OCSPResponseStatus.SUCCESSFUL)
+            self.assertEqual(response.serial_number, cert.x509.serial_number)
+            self.assertEqual(response.responder_key_hash, self.ocsp.x509.extensions.get_extension_for_class(
+                x509.SubjectKeyIdentifier).value.digest)
+            if cert.revoked:
+                self.assertEqual(response.certificate_status, ocsp.OCSPCertStatus.REVOKED)
+                self.assertEqual(response.revocation_time, cert.get_revocation_time())
+                self.assertEqual(response.revocation_reason, cert.get_revocation_reason())
+            else:
+                self.assertEqual(response.certificate_status, ocsp.OCSPCertStatus.GOOD)
+            self.ocsp.x509.public_key().verify(response.signature, response.tbs_response_bytes,
+                                               padding.PKCS1v15(), hashes.SHA256())
+
+    def valid_certs(self):
+        return [c for c in self.certs if c.expires > timezone.now()]
+
+    @override_tmpcadir()
+    def test_basic(self):
+        self.cert.revoke()
+        stdout, stderr = self.cmd('generate_ocsp_responses', ca_settings.CA_DIR, jobs=1)
+        self.assertEqual(stderr, '')
+        self.assertTrue(stdout.startswith('root: Wrote %s responses to %s in ' % (
+            len(self.valid_certs()), self.get_directory())))
+        self.assertEqual(len(self.valid_certs()), 8)
+        self.assertResponses(self.valid_certs())
+
+    @override_tmpcadir()
+    def test_jobs(self):
+        stdout, stderr = self.cmd('generate_ocsp_responses', ca_settings.CA_DIR, jobs=2)
+        self.assertEqual(stderr, '')
+        self.assertResponses(self.valid_certs())
+
+    @override_tmpcadir()
+    def test_signing_daemon(self):
+        self.cert.revoke()
+        self.cert_all.revoke(reason='key_compromise')
+        with self.signing_daemon() as server, \
+                mock.patch.object(OCSPView, 'load_responder_key', side_effect=Exception('loaded locally')):
+            # Keys of a signing backend cannot be passed to worker processes, so jobs are ignored
+            stdout, stderr = self.cmd('generate_ocsp_responses', ca_settings.CA_DIR, jobs=2)
+        self.assertEqual(stderr, '')
+        self.assertTrue(stdout.startswith('root: Wrote 8 responses to %s in ' % self.get_directory()))
+        self.assertResponses(self.valid_certs())
+        self.assertEqual(list(server.keys), [('ocsp.key', None)])
+
+    @override_tmpcadir(CA_OCSP_URLS={
+        'root': {
+            'ca': certs['root']['serial'],
+            'responder_key': 'ocsp.key',
+            'responder_cert': 'ocsp.pem',
+        },
+        'root-ca': {
+            'ca': certs['root']['serial'],
+            'responder_key': 'ocsp.key',
+            'responder_cert': 'ocsp.pem',
+            'ca_ocsp': True,
+        },
+    })
+    def test_multiple_responders(self):
+        child = self.load_ca(name='child', x509=child_pubkey, parent=self.ca)
+
+        # Responders for the same CA write responses to different directories
+        stdout, stderr = self.cmd('generate_ocsp_responses', ca_settings.CA_DIR, jobs=1)
+        self.assertEqual(stderr, '')
+        self.assertEqual(stdout.count('Wrote'), 2)
+        self.assertIn('root-ca: Wrote 1 responses to %s in ' % self.get_directory('root-ca'), stdout)
+        self.assertResponses(self.valid_certs())
+        self.assertResponses([child], responder='root-ca')
+
+        # Existing directories are reused and responders can be selected
+        stdout, stderr = self.cmd('generate_ocsp_responses', ca_settings.CA_DIR, jobs=1,
+                                  responders=['root-ca'])
+        self.assertTrue(stdout.startswith('root-ca: Wrote 1 responses to '))
+        self.assertEqual(stdout.count('Wrote'), 1)
+
+    @override_tmpcadir(CA_OCSP_URLS={'root': {'ca': 'AB:CD', 'responder_key': 'ocsp.key',
+                                              'responder_cert': 'ocsp.pem'}})
+    def test_unknown_ca(self):
+        with self.assertCommandError(r'^AB:CD: Certificate Authority could not be found\.$'):
+            self.cmd('generate_ocsp_responses', ca_settings.CA_DIR)
+
+    @override_tmpcadir(CA_OCSP_URLS={'root': {'ca': certs['root']['serial'], 'responder_key': 'missing.key',
+                                              'responder_cert': 'ocsp.pem'}})
+    def test_bad_responder_key(self):
+        with self.assertCommandError(r'^root: Could not read responder key/cert: '):
+            self.cmd('generate_ocsp_responses', ca_settings.CA_DIR)
+
+    def test_unknown_responder(self):
+        with self.assertCommandError(r'^foo: Not configured in CA_OCSP_URLS\.$'):
+            self.cmd('generate_ocsp_responses', '/non/existent', responders=['foo'])
+
+    def test_bad_jobs(self):
+        with self.assertCommandError(r'^0: Number of jobs must be at least 1\.$'):
+            self.cmd('generate_ocsp_responses', '/non/existent', jobs=0)
@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of django-ca (https://github.com/mathiasertl/django-ca).
+#
+# django-ca is free software: you can redistribute it and/or modify it under the terms of the GNU
+# General Public License as published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# django-ca is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without
+# even the implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with django-ca.  If not,
+# see <http://www.gnu.org/licenses/>
+
+import os
+
+from freezegun import freeze_time
+
+from cryptography import x509
+from cryptography.hazmat.backends import default_backend
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.serialization import Encoding
+
+from django.core.cache import cache
+
+from .. import ca_settings
+from ..crl import get_cached_crl
+from ..crl import get_crl_cache_key
+from ..models import Certificate
+from .base import DjangoCAWithCertTestCase
+from .base import override_settings
+from .base import override_tmpcadir
+
+try:
+    import unittest.mock as mock
+except ImportError:
+    import mock
+
+
+@override_settings(CA_MIN_KEY_SIZE=1024)
+class PublishCRLsTestCase(DjangoCAWithCertTestCase):
+    def setUp(self):
+        super(PublishCRLsTestCase, self).setUp()
+        cache.clear()
+
+    def assertPublished(self, ca, path, ca_crl=False, revoked=None):
+        basename = ca.serial.replace(':', '')
+        if ca_crl is True:
+            basename += '.ca'
+
+        with open(os.path.join(path, '%s.der' % basename), 'rb') as stream:
+            der = stream.read()
+        with open(os.path.join(path, '%s.pem' % basename), 'rb') as stream:
+            pem = stream.read()
+
+        crl = x509.load_der_x509_crl(der, default_backend())
+        self.assertEqual(x509.load_pem_x509_crl(pem, default_backend()), crl)
+        self.assertEqual(crl.issuer, ca.x509.subject)
+        self.assertEqual([r.serial_number for r in crl], [c.x509.serial_number for c in revoked or []])
+
+        # The cache used by the CRL view is warmed
+        algorithm = hashes.SHA512()
+        der_key = get_crl_cache_key(ca.serial, Encoding.DER, algorithm, ca_crl=ca_crl)
+        pem_key = get_crl_cache_key(ca.serial, Encoding.PEM, algorithm, ca_crl=ca_crl)
+        self.assertEqual(get_cached_crl(der_key), (der, False))
+        self.assertEqual(get_cached_crl(pem_key), (pem, False))
+
+    @override_tmpcadir()
+    def test_basic(self):
+        path = os.path.join(ca_settings.CA_DIR, 'crl')
+        stdout, stderr = self.cmd('publish_crls', path, algorithm=hashes.SHA512())
+
+        self.assertPublished(self.ca, path)
+        self.assertPublished(self.ca, path, ca_crl=True)
+        self.assertPublished(self.ecc_ca, path)
+        self.assertEqual(stdout.count('Published CRLs'), 2)
+
+        # The CA with an encrypted private key is skipped
+        self.assertFalse(os.path.exists(os.path.join(path, '%s.der' % self.pwd_ca.serial.replace(':', ''))))
+        self.assertEqual(stderr, '%s: Could not generate CRL: Password was not given but private key is '
+                                 'encrypted\n' % self.pwd_ca.serial)
+
+    @override_tmpcadir()
+    def test_missing_key(self):
+        path = os.path.join(ca_settings.CA_DIR, 'crl')
+        os.remove(os.path.join(ca_settings.CA_DIR, self.ca.private_key_path))
+        stdout, stderr = self.cmd('publish_crls', path, algorithm=hashes.SHA512())
+
+        self.assertPublished(self.ecc_ca, path)
+        self.assertEqual(stdout.count('Published CRLs'), 1)
+        self.assertIn('%s: Private key does not exist.\n' % self.ca.serial, stderr)
+        self.assertFalse(os.path.exists(os.path.join(path, '%s.der' % self.ca.serial.replace(':', ''))))
+
+    @override_tmpcadir()
+    def test_write_error(self):
+        path = os.path.join(ca_settings.CA_DIR, 'crl')
+        os.makedirs(path)  # the directory may already exist
+        with mock.patch('os.rename', side_effect=OSError('rename failed')):
+            stdout, stderr = self.cmd('publish_crls', path, algorithm=hashes.SHA512())
+
+        self.assertEqual(stdout, '')
+        self.assertIn('%s: Could not generate CRL: rename failed\n' % self.ca.serial, stderr)
+        self.assertIn('%s: Could not generate CRL: rename failed\n' % self.ecc_ca.serial, stderr)
+
+        # No temporary files are left behind
+        self.assertEqual(os.listdir(path), [])
+
+    @override_tmpcadir()
+    @freeze_time('2019-02-03 15:43:12')
+    def test_interval(self):
+        path = os.path.join(ca_settings.CA_DIR, 'crl')
+        cert = Certificate.objects.get(pk=self.cert.pk)
+
+        # revoke a certificate during the first interval, stop the loop during the second
+        def sleep(seconds):
+            if cert.revoked is False:
+                cert.revoke()
+            else:
+                raise KeyboardInterrupt
+
+        with mock.patch('time.sleep', side_effect=sleep) as patched:
+            self.cmd('publish_crls', path, interval=600, expires=1200, algorithm=hashes.SHA512())
+        self.assertEqual(patched.call_args_list, [mock.call(600), mock.call(600)])
+
+        self.assertPublished(self.ca, path, revoked=[cert])
+
+    def test_bad_interval(self):
+        with self.assertCommandError(r'^600: Interval must be greater than 0 and smaller than --expires\.$'):
+            self.cmd('publish_crls', '/tmp', interval=600, expires=600)
+        with self.assertCommandError(r'^0: Interval must be greater than 0 and smaller than --expires\.$'):
+            self.cmd('publish_crls', '/tmp', interval=0)
@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of django-ca (https://github.com/mathiasertl/django-ca).
+#
+# django-ca is free software: you can redistribute it and/or modify it under the terms of the GNU
+# General Public License as published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# django-ca is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without
+# even the implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with django-ca.  If not,
+# see <http://www.gnu.org/licenses/>.
+
+from ..models import PooledPrivateKey
+from .base import DjangoCATestCase
+from .base import override_settings
+
+try:
+    import unittest.mock as mock
+except ImportError:
+    import mock
+
+
+@override_settings(CA_KEY_POOL={'RSA:1024': 2, 'ECC:SECP256R1': 1}, CA_KEY_POOL_PASSWORD='secret')
+class RefillKeyPoolTestCase(DjangoCATestCase):
+    def test_basic(self):
+        stdout, stderr = self.cmd('refill_key_pool', jobs=1)
+        self.assertRegex(stdout, r'^ECC:SECP256R1: Generated 1 keys\.\nRSA:1024: Generated 2 keys\.\n'
+                                 r'Refilled key pool in [0-9.]+ seconds\.\n$')
+        self.assertEqual(stderr, '')
+        self.assertEqual(PooledPrivateKey.objects.count(), 3)
+
+    def test_interval(self):
+        with mock.patch('time.sleep', side_effect=[None, KeyboardInterrupt]) as sleep:
+            stdout, stderr = self.cmd('refill_key_pool', jobs=1, interval=10)
+        self.assertEqual(sleep.call_args_list, [mock.call(10), mock.call(10)])
+        self.assertEqual(stdout.count('Refilled key pool'), 2)
+        self.assertEqual(PooledPrivateKey.objects.count(), 3)
+
+    def test_errors(self):
+        with self.assertCommandError(r'^--jobs must be at least 1\.$'):
+            self.cmd('refill_key_pool', jobs=0)
+        with self.assertCommandError(r'^0: Interval must be greater than 0\.$'):
+            self.cmd('refill_key_pool', interval=0)
+
+        with self.settings(CA_KEY_POOL={'FOO': 1}), \
+                self.assertCommandError(r'^FOO: Unknown key type\.$'):
+            self.cmd('refill_key_pool')
+
+    @override_settings(CA_KEY_POOL={})
+    def test_no_pool(self):
+        with self.assertCommandError(r'^The CA_KEY_POOL setting is empty\.$'):
+            self.cmd('refill_key_pool')
+
+    @override_settings(CA_KEY_POOL_PASSWORD=None)
+    def test_no_password(self):
+        with self.assertCommandError(r'^Please set the CA_KEY_POOL_PASSWORD setting to use the key pool\.$'):
+            self.cmd('refill_key_pool')
+        self.assertFalse(PooledPrivateKey.objects.exists())
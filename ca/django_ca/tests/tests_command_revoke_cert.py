@@ -13,12 +13,28 @@
 # You should have received a copy of the GNU General Public License along with django-ca.  If not,
 # see <http://www.gnu.org/licenses/>
 
+import os
+import shutil
+import tempfile
+
+from django.utils.six import StringIO
+
+from ..management.commands.revoke_cert import Command
 from ..models import Certificate
+from ..models import CertificateAuthority
+from ..signals import post_bulk_revoke_cert
 from ..signals import post_revoke_cert
+from ..signals import pre_bulk_revoke_cert
 from ..signals import pre_revoke_cert
 from .base import DjangoCAWithCertTestCase
+from .base import DjangoCAWithChildCATestCase
 from .base import override_settings
 
+try:
+    import unittest.mock as mock
+except ImportError:
+    import mock
+
 
 @override_settings(CA_MIN_KEY_SIZE=1024, CA_PROFILES={}, CA_DEFAULT_SUBJECT={})
 class RevokeCertTestCase(DjangoCAWithCertTestCase):
@@ -74,3 +90,92 @@ class RevokeCertTestCase(DjangoCAWithCertTestCase):
         self.assertTrue(cert.revoked)
         self.assertTrue(cert.revoked_date is not None)
         self.assertEqual(cert.revoked_reason, 'keyCompromise')
+
+
+class BulkRevokeCertTestCase(DjangoCAWithChildCATestCase):
+    def setUp(self):
+        super(BulkRevokeCertTestCase, self).setUp()
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        super(BulkRevokeCertTestCase, self).tearDown()
+        shutil.rmtree(self.tmpdir)
+
+    def write_serials(self, *serials):
+        path = os.path.join(self.tmpdir, 'serials.txt')
+        with open(path, 'w') as stream:
+            stream.write('\n'.join(serials))
+        return path
+
+    def test_filter(self):
+        with self.assertSignal(pre_bulk_revoke_cert) as pre, self.assertSignal(post_bulk_revoke_cert) as post:
+            stdout, stderr = self.cmd('revoke_cert', filter='cn=%s' % self.cert.cn, reason='keyCompromise')
+        self.assertEqual(stdout, 'Revoked 1 certificates.\n')
+        self.assertEqual(stderr, '')
+        self.assertEqual(pre.call_count, 1)
+        self.assertEqual(post.call_count, 1)
+        self.assertRevoked(self.cert, 'keyCompromise')
+        self.assertNotRevoked(self.cert2)
+
+    def test_ca(self):
+        Certificate.objects.filter(pk=self.cert3.pk).update(ca=self.child_ca)
+        stdout, stderr = self.cmd('revoke_cert', ca=self.child_ca.serial)
+        self.assertEqual(stdout, 'Revoked 1 certificates.\n')
+        self.assertRevoked(self.cert3)
+        self.assertNotRevoked(self.cert)
+
+        # Options are combined
+        stdout, stderr = self.cmd('revoke_cert', ca=self.ca.serial, filter='cn=%s' % self.cert2.cn)
+        self.assertEqual(stdout, 'Revoked 1 certificates.\n')
+        self.assertRevoked(self.cert2)
+        self.assertNotRevoked(self.cert)
+
+    def test_from_file(self):
+        path = self.write_serials('# compromised certificates', self.cert.serial, '',
+                                  self.cert2.serial.replace(':', '').lower(), '00:AB')
+        stdout, stderr = self.cmd('revoke_cert', from_file=path, reason='keyCompromise')
+        self.assertEqual(stdout, 'Revoked 2 certificates.\n')
+        self.assertRevoked(self.cert, 'keyCompromise')
+        self.assertRevoked(self.cert2, 'keyCompromise')
+        self.assertNotRevoked(self.cert3)
+
+    def test_from_stdin(self):
+        stdin = StringIO('%s\n%s\n' % (self.cert.serial, self.cert3.serial))
+        stdout, stderr = self.cmd('revoke_cert', from_file='-', ca=self.ca.serial, stdin=stdin)
+        self.assertEqual(stdout, 'Revoked 2 certificates.\n')
+        self.assertRevoked(self.cert)
+        self.assertRevoked(self.cert3)
+        self.assertNotRevoked(self.cert2)
+
+    def test_from_file_chunks(self):
+        serials = ['%X' % i for i in range(1, 50)] + [self.cert.serial, self.cert2.serial, self.cert3.serial]
+        path = self.write_serials(*serials)
+        with mock.patch.object(Command, 'serials_chunk_size', 10), \
+                self.assertSignal(pre_bulk_revoke_cert) as pre:
+            stdout, stderr = self.cmd('revoke_cert', from_file=path)
+        self.assertEqual(stdout, 'Revoked 3 certificates.\n')
+
+        # Only the last two chunks contain certificates that exist
+        self.assertEqual([[c.pk for c in call[1]['certs']] for call in pre.call_args_list],
+                         [[self.cert.pk], [self.cert2.pk, self.cert3.pk]])
+        for cert in [self.cert, self.cert2, self.cert3]:
+            self.assertRevoked(cert)
+
+    def test_errors(self):
+        with self.assertCommandError(r'^Please name a certificate or use --filter, --ca or --from-file\.$'):
+            self.cmd('revoke_cert')
+
+        with self.assertCommandError(
+                r'^Cannot name a certificate when using --filter, --ca or --from-file\.$'):
+            self.cmd('revoke_cert', self.cert.serial, filter='cn=example.com')
+
+        with self.assertCommandError(r'^foo: Certificate authority not found\.$'):
+            self.cmd('revoke_cert', ca='foo')
+
+        CertificateAuthority.objects.filter(pk__in=[self.ca.pk, self.child_ca.pk]).update(cn='duplicate')
+        with self.assertCommandError(r'^duplicate: Multiple Certificate authorities match\.$'):
+            self.cmd('revoke_cert', ca='duplicate')
+
+        with self.assertCommandError(r'^foo: Not a valid serial\.$'):
+            self.cmd('revoke_cert', from_file=self.write_serials(self.cert.serial, 'foo'))
+        self.assertNotRevoked(self.cert)
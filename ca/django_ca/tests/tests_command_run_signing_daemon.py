@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of django-ca (https://github.com/mathiasertl/django-ca).
+#
+# django-ca is free software: you can redistribute it and/or modify it under the terms of the GNU
+# General Public License as published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# django-ca is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without
+# even the implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with django-ca.  If not,
+# see <http://www.gnu.org/licenses/>.
+
+import os
+import shutil
+import tempfile
+
+from ..signing import SigningServer
+from .base import DjangoCATestCase
+from .base import override_settings
+
+try:
+    import unittest.mock as mock
+except ImportError:
+    import mock
+
+
+class RunSigningDaemonTestCase(DjangoCATestCase):
+    def setUp(self):
+        super(RunSigningDaemonTestCase, self).setUp()
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, 'signing.sock')
+
+    def tearDown(self):
+        super(RunSigningDaemonTestCase, self).tearDown()
+        shutil.rmtree(self.tmpdir)
+
+    def test_basic(self):
+        with mock.patch.object(SigningServer, 'serve_forever', side_effect=KeyboardInterrupt) as serve:
+            stdout, stderr = self.cmd('run_signing_daemon', socket=self.path, workers=2)
+        serve.assert_called_once_with()
+        self.assertEqual(stdout, 'Listening on %s with 2 workers.\n' % self.path)
+        self.assertEqual(stderr, '')
+
+        # socket is removed when the daemon exits
+        self.assertFalse(os.path.exists(self.path))
+
+    def test_stale_socket(self):
+        with open(self.path, 'w'):
+            pass
+
+        def serve_forever():
+            self.assertEqual(os.stat(self.path).st_mode & 0o777, 0o600)
+            raise KeyboardInterrupt
+
+        with mock.patch.object(SigningServer, 'serve_forever', side_effect=serve_forever):
+            self.cmd('run_signing_daemon', socket=self.path, workers=1)
+        self.assertFalse(os.path.exists(self.path))
+
+    def test_queue_size(self):
+        with mock.patch.object(SigningServer, 'serve_forever', side_effect=KeyboardInterrupt), \
+                mock.patch('django_ca.management.commands.run_signing_daemon.SigningServer',
+                           wraps=SigningServer) as cls:
+            self.cmd('run_signing_daemon', socket=self.path, workers=2, queue_size=0)
+        cls.assert_called_once_with(self.path, workers=2, queue_size=0)
+
+    def test_errors(self):
+        with self.assertCommandError(r'^--workers must be at least 1\.$'):
+            self.cmd('run_signing_daemon', socket=self.path, workers=0)
+        with self.assertCommandError(r'^--queue-size must not be negative\.$'):
+            self.cmd('run_signing_daemon', socket=self.path, workers=1, queue_size=-1)
+
+    @override_settings(CA_SIGNING_SOCKET=None)
+    def test_no_socket(self):
+        with self.assertCommandError(r'^Please set the CA_SIGNING_SOCKET setting or pass --socket\.$'):
+            self.cmd('run_signing_daemon')
@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of django-ca (https://github.com/mathiasertl/django-ca).
+#
+# django-ca is free software: you can redistribute it and/or modify it under the terms of the GNU
+# General Public License as published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# django-ca is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without
+# even the implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with django-ca.  If not,
+# see <http://www.gnu.org/licenses/>.
+
+from datetime import timedelta
+
+from cryptography.hazmat.primitives.serialization import Encoding
+
+from django.utils import timezone
+
+from ..models import IssuanceJob
+from .base import DjangoCAWithCSRTestCase
+from .base import override_tmpcadir
+
+try:
+    import unittest.mock as mock
+except ImportError:
+    import mock
+
+
+class RunSigningWorkerTestCase(DjangoCAWithCSRTestCase):
+    def create_jobs(self, count):
+        return [IssuanceJob.objects.init(
+            self.ca, self.create_csr('/CN=host%s.example.com' % i)[1].public_bytes(Encoding.PEM),
+            subject='/CN=host%s.example.com' % i, expires=self.expires(720)) for i in range(count)]
+
+    @override_tmpcadir()
+    def test_once(self):
+        self.create_jobs(3)
+        stdout, stderr = self.cmd('run_signing_worker', batch_size=2, once=True)
+        self.assertRegex(stdout, r'^Processed 2 jobs in [0-9.]+ seconds, 0 failed\.\n'
+                                 r'Processed 1 jobs in [0-9.]+ seconds, 0 failed\.\n$')
+        self.assertEqual(stderr, '')
+        self.assertEqual(IssuanceJob.objects.filter(status=IssuanceJob.STATUS_DONE).count(), 3)
+
+    @override_tmpcadir()
+    def test_interval(self):
+        self.create_jobs(1)
+        with mock.patch('time.sleep', side_effect=[None, KeyboardInterrupt]) as sleep:
+            stdout, stderr = self.cmd('run_signing_worker', interval=5)
+        self.assertEqual(sleep.call_args_list, [mock.call(5), mock.call(5)])
+        self.assertRegex(stdout, r'^Processed 1 jobs in [0-9.]+ seconds, 0 failed\.\n$')
+        self.assertEqual(IssuanceJob.objects.get().status, IssuanceJob.STATUS_DONE)
+
+    @override_tmpcadir()
+    def test_lease(self):
+        job = self.create_jobs(1)[0]
+        IssuanceJob.objects.claim(1)  # claimed by a worker that died
+
+        stdout, stderr = self.cmd('run_signing_worker', once=True)
+        self.assertEqual(stdout, '')
+
+        IssuanceJob.objects.filter(pk=job.pk).update(leased_until=timezone.now() - timedelta(seconds=1))
+        with mock.patch.object(IssuanceJob.objects, 'run', wraps=IssuanceJob.objects.run) as run:
+            stdout, stderr = self.cmd('run_signing_worker', lease=30, once=True)
+        self.assertEqual(run.call_args[1], {'processes': 1, 'lease': 30})
+        self.assertRegex(stdout, r'^Processed 1 jobs in [0-9.]+ seconds, 0 failed\.\n$')
+        self.assertEqual(IssuanceJob.objects.get().status, IssuanceJob.STATUS_DONE)
+
+    def test_failed(self):
+        # The private key of the CA is not available
+        self.create_jobs(1)
+        stdout, stderr = self.cmd('run_signing_worker', once=True)
+        self.assertRegex(stdout, r'^Processed 1 jobs in [0-9.]+ seconds, 1 failed\.\n$')
+        self.assertEqual(IssuanceJob.objects.get().status, IssuanceJob.STATUS_FAILED)
+
+    def test_errors(self):
+        with self.assertCommandError(r'^--jobs must be at least 1\.$'):
+            self.cmd('run_signing_worker', jobs=0)
+        with self.assertCommandError(r'^--batch-size must be at least 1\.$'):
+            self.cmd('run_signing_worker', batch_size=0)
+        with self.assertCommandError(r'^0: Interval must be greater than 0\.$'):
+            self.cmd('run_signing_worker', interval=0)
+        with self.assertCommandError(r'^--lease must be at least 1\.$'):
+            self.cmd('run_signing_worker', lease=0)
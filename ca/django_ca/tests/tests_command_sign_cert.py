@@ -31,6 +31,7 @@ from ..extensions import ExtendedKeyUsage
 from ..extensions import KeyUsage
 from ..extensions import SubjectAlternativeName
 from ..extensions import TLSFeature
+from ..management.commands.sign_cert import Command
 from ..models import Certificate
 from ..models import CertificateAuthority
 from ..signals import post_issue_cert
@@ -420,6 +421,188 @@ class SignCertTestCase(DjangoCAWithCSRTestCase):
         self.assertFalse(post.called)
 
 
+@override_settings(CA_MIN_KEY_SIZE=1024, CA_PROFILES={}, CA_DEFAULT_SUBJECT={})
+class SignCertBatchTestCase(DjangoCAWithCSRTestCase):
+    def write_csrs(self, path, count):
+        os.makedirs(path)
+        paths = []
+        for i in range(count):
+            csr = self.create_csr('/CN=host%s.example.com' % i)[1]
+            paths.append(os.path.join(path, 'host%s.csr' % i))
+            with open(paths[-1], 'wb') as stream:
+                stream.write(csr.public_bytes(Encoding.PEM))
+        return paths
+
+    def assertCerts(self, out_dir, names):
+        self.assertEqual(sorted(os.listdir(out_dir)), ['%s.pem' % n for n in names])
+        for name in names:
+            cert = Certificate.objects.get(cn='%s.example.com' % name)
+            self.assertEqual(cert.subject_alternative_name,
+                             SubjectAlternativeName('DNS:%s.example.com' % name))
+            with open(os.path.join(out_dir, '%s.pem' % name)) as stream:
+                self.assertEqual(stream.read(), cert.pub)
+
+    @freeze_time('2019-02-03 15:43:12')
+    @override_tmpcadir()
+    def test_csr_dir(self):
+        csr_dir = os.path.join(ca_settings.CA_DIR, 'csrs')
+        out_dir = os.path.join(ca_settings.CA_DIR, 'out')
+        os.makedirs(out_dir)
+        self.write_csrs(csr_dir, 3)
+        with open(os.path.join(csr_dir, 'broken.csr'), 'w') as stream:
+            stream.write('foobar')
+        os.makedirs(os.path.join(csr_dir, 'subdir.csr'))  # directories are ignored
+
+        with self.assertSignal(pre_issue_cert) as pre, self.assertSignal(post_issue_cert) as post:
+            stdout, stderr = self.cmd('sign_cert', csr_dir=csr_dir, out_dir=out_dir,
+                                      watch=['user@example.com'])
+        self.assertEqual(pre.call_count, 3)
+        self.assertEqual(post.call_count, 3)
+        self.assertRegex(stdout, r'^Signed 3 certificates in [0-9.]+ seconds \([0-9.]+ certificates per '
+                                 r'second\), 1 failed\.\n$')
+        self.assertTrue(stderr.startswith('%s: ' % os.path.join(csr_dir, 'broken.csr')), stderr)
+        self.assertCerts(out_dir, ['host0', 'host1', 'host2'])
+        self.assertEqual(Certificate.objects.filter(watchers__mail='user@example.com').count(), 3)
+
+    @freeze_time('2019-02-03 15:43:12')
+    @override_tmpcadir()
+    def test_csr_list(self):
+        csr_dir = os.path.join(ca_settings.CA_DIR, 'csrs')
+        out_dir = os.path.join(ca_settings.CA_DIR, 'out')
+        os.makedirs(out_dir)
+        paths = self.write_csrs(csr_dir, 4)
+
+        csr_list = os.path.join(ca_settings.CA_DIR, 'csrs.txt')
+        with open(csr_list, 'w') as stream:
+            stream.write('\n'.join(paths[1:] + ['', os.path.join(csr_dir, 'missing.csr')]))
+
+        stdout, stderr = self.cmd('sign_cert', csr_list=csr_list, out_dir=out_dir, jobs=2,
+                                  subject=Subject([('C', 'AT')]))
+        self.assertRegex(stdout, r'^Signed 3 certificates in .*, 1 failed\.\n$')
+        self.assertIn('missing.csr: ', stderr)
+        self.assertCerts(out_dir, ['host1', 'host2', 'host3'])
+        self.assertEqual(Certificate.objects.get(cn='host1.example.com').subject,
+                         Subject([('C', 'AT'), ('CN', 'host1.example.com')]))
+
+    @freeze_time('2019-02-03 15:43:12')
+    @override_tmpcadir()
+    def test_csr_name_collision(self):
+        out_dir = os.path.join(ca_settings.CA_DIR, 'out')
+        os.makedirs(out_dir)
+        paths = self.write_csrs(os.path.join(ca_settings.CA_DIR, 'csrs'), 2)
+        other = self.write_csrs(os.path.join(ca_settings.CA_DIR, 'other'), 1)[0]
+
+        csr_list = os.path.join(ca_settings.CA_DIR, 'csrs.txt')
+        with open(csr_list, 'w') as stream:
+            stream.write('\n'.join(paths + [other]))
+
+        # CSRs with the same name are detected in different chunks, before they are signed
+        with mock.patch.object(Command, 'csrs_chunk_size', 1):
+            stdout, stderr = self.cmd('sign_cert', csr_list=csr_list, out_dir=out_dir)
+        self.assertRegex(stdout, r'^Signed 2 certificates in .*, 1 failed\.\n$')
+        self.assertEqual(stderr, '%s: Another CSR is also saved as host0.pem, not signing it.\n' % other)
+        self.assertCerts(out_dir, ['host0', 'host1'])
+
+    @freeze_time('2019-02-03 15:43:12')
+    @override_tmpcadir()
+    def test_chunks(self):
+        csr_dir = os.path.join(ca_settings.CA_DIR, 'csrs')
+        out_dir = os.path.join(ca_settings.CA_DIR, 'out')
+        os.makedirs(out_dir)
+        self.write_csrs(csr_dir, 3)
+
+        # The private key is loaded once when testing options and once for all chunks
+        with mock.patch.object(Command, 'csrs_chunk_size', 1), \
+                mock.patch.object(CertificateAuthority, 'key', autospec=True,
+                                  side_effect=CertificateAuthority.key) as key:
+            stdout, stderr = self.cmd('sign_cert', csr_dir=csr_dir, out_dir=out_dir)
+        self.assertEqual(key.call_args_list, [mock.call(self.ca, None), mock.call(self.ca, None)])
+        self.assertRegex(stdout, r'^Signed 3 certificates in .*, 0 failed\.\n$')
+        self.assertEqual(stderr, '')
+        self.assertCerts(out_dir, ['host0', 'host1', 'host2'])
+
+    @freeze_time('2019-02-03 15:43:12')
+    @override_tmpcadir()
+    def test_batch_with_password(self):
+        ca = self.create_ca('with password', password=b'testpassword')
+        csr_dir = os.path.join(ca_settings.CA_DIR, 'csrs')
+        out_dir = os.path.join(ca_settings.CA_DIR, 'out')
+        os.makedirs(out_dir)
+        self.write_csrs(csr_dir, 1)
+
+        with self.assertCommandError(self.re_false_password):
+            self.cmd('sign_cert', ca=ca, csr_dir=csr_dir, out_dir=out_dir, password=b'wrong')
+        self.assertEqual(os.listdir(out_dir), [])
+
+        stdout, stderr = self.cmd('sign_cert', ca=ca, csr_dir=csr_dir, out_dir=out_dir,
+                                  password=b'testpassword')
+        self.assertRegex(stdout, r'^Signed 1 certificates in .*, 0 failed\.\n$')
+        self.assertCerts(out_dir, ['host0'])
+
+    @freeze_time('2019-02-03 15:43:12')
+    @override_tmpcadir()
+    def test_batch_der(self):
+        csr_dir = os.path.join(ca_settings.CA_DIR, 'csrs')
+        out_dir = os.path.join(ca_settings.CA_DIR, 'out')
+        os.makedirs(csr_dir)
+        os.makedirs(out_dir)
+        for name, subject in [('host0', '/CN=host0.example.com'), ('no-cn', '/O=example')]:
+            with open(os.path.join(csr_dir, '%s.csr' % name), 'wb') as stream:
+                stream.write(self.create_csr(subject)[1].public_bytes(Encoding.DER))
+
+        # CSRs without a CommonName only get the given subjectAlternativeNames
+        stdout, stderr = self.cmd('sign_cert', csr_dir=csr_dir, out_dir=out_dir, csr_format=Encoding.DER,
+                                  alt=SubjectAlternativeName(['extra.example.com']))
+        self.assertRegex(stdout, r'^Signed 2 certificates in .*, 0 failed\.\n$')
+        self.assertEqual(stderr, '')
+        self.assertEqual(sorted(os.listdir(out_dir)), ['host0.pem', 'no-cn.pem'])
+        cert = Certificate.objects.get(cn='host0.example.com')
+        self.assertEqual(cert.subject_alternative_name,
+                         SubjectAlternativeName(['DNS:host0.example.com', 'DNS:extra.example.com']))
+        cert = Certificate.objects.get(cn='extra.example.com')
+        self.assertEqual(cert.subject_alternative_name, SubjectAlternativeName(['DNS:extra.example.com']))
+
+        # A CommonName given with --subject is used for all CSRs
+        Certificate.objects.all().delete()
+        stdout, stderr = self.cmd('sign_cert', csr_dir=csr_dir, out_dir=out_dir, csr_format=Encoding.DER,
+                                  subject=Subject('/CN=fixed.example.com'))
+        self.assertRegex(stdout, r'^Signed 2 certificates in .*, 0 failed\.\n$')
+        self.assertEqual(list(Certificate.objects.values_list('cn', flat=True)),
+                         ['fixed.example.com', 'fixed.example.com'])
+
+    @freeze_time('2019-02-03 15:43:12')
+    @override_tmpcadir()
+    def test_signing_error(self):
+        csr_dir = os.path.join(ca_settings.CA_DIR, 'csrs')
+        out_dir = os.path.join(ca_settings.CA_DIR, 'out')
+        os.makedirs(out_dir)
+        self.write_csrs(csr_dir, 2)
+
+        # CommonName cannot be used as subjectAlternativeName
+        csr = self.create_csr('/CN=foo bar')[1]
+        with open(os.path.join(csr_dir, 'invalid.csr'), 'wb') as stream:
+            stream.write(csr.public_bytes(Encoding.PEM))
+
+        stdout, stderr = self.cmd('sign_cert', csr_dir=csr_dir, out_dir=out_dir)
+        self.assertRegex(stdout, r'^Signed 2 certificates in .*, 1 failed\.\n$')
+        self.assertEqual(stderr, '%s: %s: Could not parse CommonName as subjectAlternativeName.\n' % (
+            os.path.join(csr_dir, 'invalid.csr'), 'foo bar'))
+        self.assertCerts(out_dir, ['host0', 'host1'])
+
+    @freeze_time('2019-02-03 15:43:12')
+    @override_tmpcadir()
+    def test_errors(self):
+        csr_dir = os.path.join(ca_settings.CA_DIR, 'csrs')
+        with self.assertCommandError(r'^--csr-dir and --csr-list cannot be used together\.$'):
+            self.cmd('sign_cert', csr_dir=csr_dir, csr_list='foo')
+        with self.assertCommandError(r'^--csr and --out cannot be used with --csr-dir or --csr-list\.$'):
+            self.cmd('sign_cert', csr_dir=csr_dir, csr='foo')
+        with self.assertCommandError(r'^--out-dir is required with --csr-dir or --csr-list\.$'):
+            self.cmd('sign_cert', csr_dir=csr_dir)
+        with self.assertCommandError(r'^--jobs must be at least 1\.$'):
+            self.cmd('sign_cert', csr_dir=csr_dir, out_dir=csr_dir, jobs=0)
+
+
 @override_settings(CA_MIN_KEY_SIZE=1024, CA_PROFILES={}, CA_DEFAULT_SUBJECT={})
 class SignCertChildCATestCase(DjangoCAWithCSRTestCase):
     @classmethod
@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of django-ca (https://github.com/mathiasertl/django-ca).
+#
+# django-ca is free software: you can redistribute it and/or modify it under the terms of the GNU
+# General Public License as published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# django-ca is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without
+# even the implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with django-ca.  If not,
+# see <http://www.gnu.org/licenses/>
+
+from ..models import Certificate
+from ..models import CertificateName
+from .base import DjangoCAWithCertTestCase
+
+
+class UpdateCertificateNamesTestCase(DjangoCAWithCertTestCase):
+    def test_basic(self):
+        expected = sorted(CertificateName.objects.values_list('cert_id', 'field', 'value'))
+        CertificateName.objects.all().delete()
+        self.assertEqual(Certificate.objects.with_name('dns:host1.example.com').count(), 0)
+
+        stdout, stderr = self.cmd('update_certificate_names', batch_size=3)
+        self.assertEqual(stdout, 'Updated names of %s certificates.\n' % len(self.certs))
+        self.assertEqual(stderr, '')
+        self.assertEqual(sorted(CertificateName.objects.values_list('cert_id', 'field', 'value')), expected)
+        self.assertEqual(list(Certificate.objects.with_name('dns:host1.example.com')), [self.cert])
+
+        # running again does not create duplicates
+        self.cmd('update_certificate_names')
+        self.assertEqual(sorted(CertificateName.objects.values_list('cert_id', 'field', 'value')), expected)
@@ -0,0 +1,361 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of django-ca (https://github.com/mathiasertl/django-ca).
+#
+# django-ca is free software: you can redistribute it and/or modify it under the terms of the GNU
+# General Public License as published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# django-ca is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without
+# even the implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with django-ca.  If not,
+# see <http://www.gnu.org/licenses/>.
+
+import json
+import time
+from datetime import timedelta
+
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.serialization import Encoding
+
+from django.contrib.auth.models import Permission
+from django.contrib.auth.models import User
+from django.test import Client
+from django.urls import reverse
+from django.utils import timezone
+
+from ..extensions import ExtendedKeyUsage
+from ..extensions import KeyUsage
+from ..extensions import SubjectAlternativeName
+from ..managers import CertificateManager
+from ..models import Certificate
+from ..models import IssuanceJob
+from ..models import Watcher
+from ..signals import post_issue_cert
+from ..signals import pre_issue_cert
+from ..subject import Subject
+from .base import DjangoCAWithCSRTestCase
+from .base import override_settings
+from .base import override_tmpcadir
+
+try:
+    import unittest.mock as mock
+except ImportError:
+    import mock
+
+
+class IssuanceJobTestCase(DjangoCAWithCSRTestCase):
+    def create_jobs(self, count, **kwargs):
+        kwargs.setdefault('expires', self.expires(720))
+        return [IssuanceJob.objects.init(
+            self.ca, self.create_csr('/CN=host%s.example.com' % i)[1].public_bytes(Encoding.PEM),
+            subject='/CN=host%s.example.com' % i, **kwargs) for i in range(count)]
+
+    def test_init(self):
+        watcher = Watcher.objects.create(mail='user@example.com')
+        expires = self.expires(720)
+        job = IssuanceJob.objects.init(
+            self.ca, self.csr_pem, expires=expires, algorithm='SHA256',
+            subject=Subject([('CN', 'example.com')]), subject_alternative_name=['example.net'],
+            key_usage='critical,digitalSignature', extended_key_usage=ExtendedKeyUsage('serverAuth'),
+            watchers=[watcher])
+
+        job = IssuanceJob.objects.get(pk=job.pk)
+        self.assertEqual(job.status, IssuanceJob.STATUS_PENDING)
+        self.assertEqual(job.csr, self.csr_pem)
+        self.assertEqual(list(job.watchers.all()), [watcher])
+        self.assertIsNone(job.duration)
+        self.assertEqual(job.get_kwargs(), {
+            'expires': expires,
+            'algorithm': 'SHA256',
+            'subject': '/CN=example.com',
+            'cn_in_san': True,
+            'ocsp_no_check': False,
+            'subject_alternative_name': 'DNS:example.net',
+            'key_usage': 'critical,digitalSignature',
+            'extended_key_usage': 'serverAuth',
+        })
+
+    def test_init_parse(self):
+        job = IssuanceJob.objects.init(self.ca, self.csr_pem, algorithm=hashes.SHA512(),
+                                       subject=[('C', 'AT'), ('CN', 'example.com')])
+        kwargs = job.get_kwargs()
+        self.assertEqual(kwargs['algorithm'], 'SHA512')
+        self.assertEqual(kwargs['subject'], '/C=AT/CN=example.com')
+
+    def test_claim(self):
+        jobs = self.create_jobs(3)
+
+        claimed = IssuanceJob.objects.claim(2)
+        self.assertEqual(claimed, jobs[:2])
+        for job in claimed:
+            self.assertEqual(job.status, IssuanceJob.STATUS_RUNNING)
+            self.assertIsNotNone(job.started)
+        self.assertEqual(IssuanceJob.objects.filter(status=IssuanceJob.STATUS_RUNNING).count(), 2)
+
+        # Claimed jobs are not claimed again
+        self.assertEqual(IssuanceJob.objects.claim(2), jobs[2:])
+        self.assertEqual(IssuanceJob.objects.claim(2), [])
+
+    def test_claim_expired_lease(self):
+        jobs = self.create_jobs(2)
+        claimed = IssuanceJob.objects.claim(2, lease=600)
+        self.assertEqual(claimed, jobs)
+        self.assertEqual(len({j.claim_token for j in claimed}), 1)
+        self.assertEqual(claimed[0].leased_until, claimed[0].started + timedelta(seconds=600))
+        self.assertEqual(IssuanceJob.objects.claim(2), [])
+
+        # The worker that claimed the first job died
+        started = claimed[0].started
+        IssuanceJob.objects.filter(pk=jobs[0].pk).update(leased_until=timezone.now() - timedelta(seconds=1))
+
+        reclaimed = IssuanceJob.objects.claim(2)
+        self.assertEqual(reclaimed, jobs[:1])
+        self.assertGreater(reclaimed[0].started, started)
+        self.assertNotEqual(reclaimed[0].claim_token, claimed[0].claim_token)
+        self.assertEqual(IssuanceJob.objects.claim(2), [])
+
+        # Only the worker that claimed the job again still owns it
+        self.assertEqual(list(IssuanceJob.objects.owned(claimed)), jobs[1:])
+        self.assertEqual(list(IssuanceJob.objects.owned(reclaimed)), jobs[:1])
+
+    def test_renew(self):
+        jobs = self.create_jobs(2)
+        claimed = IssuanceJob.objects.claim(2)
+        past = timezone.now() - timedelta(seconds=1)
+        IssuanceJob.objects.update(leased_until=past)
+        IssuanceJob.objects.filter(pk=jobs[1].pk).update(status=IssuanceJob.STATUS_DONE)
+
+        self.assertEqual(IssuanceJob.objects.renew(claimed, lease=60), 1)
+        self.assertGreater(IssuanceJob.objects.get(pk=jobs[0].pk).leased_until, past)
+        self.assertEqual(IssuanceJob.objects.get(pk=jobs[1].pk).leased_until, past)
+        self.assertEqual(IssuanceJob.objects.claim(2), [])
+
+    @override_tmpcadir()
+    def test_run(self):
+        watcher = Watcher.objects.create(mail='user@example.com')
+        jobs = self.create_jobs(3, key_usage='critical,digitalSignature', watchers=[watcher])
+        jobs[1].csr = 'foobar'
+        jobs[1].save()
+
+        with self.assertSignal(post_issue_cert) as post:
+            failed = IssuanceJob.objects.run(IssuanceJob.objects.claim(3), processes=2)
+        self.assertEqual(failed, 1)
+        self.assertEqual(post.call_count, 2)
+
+        for job in IssuanceJob.objects.filter(pk__in=[jobs[0].pk, jobs[2].pk]):
+            self.assertEqual(job.status, IssuanceJob.STATUS_DONE)
+            self.assertEqual(job.error, '')
+            self.assertGreaterEqual(job.duration, 0)
+            self.assertEqual(job.cert.cn, job.get_kwargs()['subject'][4:])
+            self.assertEqual(job.cert.key_usage, KeyUsage('critical,digitalSignature'))
+            self.assertEqual(list(job.cert.watchers.all()), [watcher])
+
+        job = IssuanceJob.objects.get(pk=jobs[1].pk)
+        self.assertEqual(job.status, IssuanceJob.STATUS_FAILED)
+        self.assertIsNone(job.cert)
+        self.assertNotEqual(job.error, '')
+        self.assertIsNotNone(job.finished)
+
+    @override_tmpcadir()
+    def test_run_failed_batch(self):
+        jobs = self.create_jobs(3)
+        bulk_init = CertificateManager.bulk_init
+
+        def bulk_init_batch_size(self, *args, **kwargs):
+            return bulk_init(self, *args, batch_size=1, **kwargs)
+
+        # Signals are sent after a batch was stored, so the second certificate is issued nonetheless
+        with mock.patch.object(CertificateManager, 'bulk_init', bulk_init_batch_size), \
+                self.assertSignal(post_issue_cert) as post:
+            post.side_effect = [None, Exception('receiver failed')]
+            self.assertEqual(IssuanceJob.objects.run(IssuanceJob.objects.claim(3)), 1)
+
+        jobs = [IssuanceJob.objects.get(pk=job.pk) for job in jobs]
+        self.assertEqual([j.status for j in jobs],
+                         [IssuanceJob.STATUS_DONE, IssuanceJob.STATUS_DONE, IssuanceJob.STATUS_FAILED])
+        self.assertEqual(Certificate.objects.count(), 2)
+        self.assertEqual({j.cert for j in jobs[:2]}, set(Certificate.objects.all()))
+        self.assertIsNone(jobs[2].cert)
+        self.assertEqual(jobs[2].error, 'receiver failed')
+
+    @override_tmpcadir()
+    def test_run_renews_lease(self):
+        self.create_jobs(1)
+
+        # Signing takes longer than the lease
+        with mock.patch.object(IssuanceJob.objects, 'renew') as renew, \
+                self.assertSignal(pre_issue_cert) as pre:
+            pre.side_effect = lambda **kwargs: time.sleep(0.2)
+            self.assertEqual(IssuanceJob.objects.run(IssuanceJob.objects.claim(1, lease=0.03), lease=0.03), 0)
+        self.assertTrue(renew.called)
+        self.assertEqual(renew.call_args[1], {'lease': 0.03})
+        self.assertEqual(IssuanceJob.objects.get().status, IssuanceJob.STATUS_DONE)
+
+    @override_tmpcadir()
+    def test_run_expired_lease(self):
+        jobs = self.create_jobs(3)
+        bulk_init = CertificateManager.bulk_init
+
+        def bulk_init_batch_size(self, *args, **kwargs):
+            return bulk_init(self, *args, batch_size=2, **kwargs)
+
+        claimed = IssuanceJob.objects.claim(3)
+        other = []
+
+        def lease_expired(**kwargs):
+            # The lease of the second job expires while the first batch is signed and another worker claims it
+            if not other:
+                IssuanceJob.objects.filter(pk=jobs[1].pk).update(
+                    leased_until=timezone.now() - timedelta(seconds=1))
+                other.extend(IssuanceJob.objects.claim(3))
+
+        with mock.patch.object(CertificateManager, 'bulk_init', bulk_init_batch_size), \
+                self.assertSignal(pre_issue_cert) as pre, self.assertSignal(post_issue_cert) as post:
+            pre.side_effect = lease_expired
+            self.assertEqual(IssuanceJob.objects.run(claimed), 0)
+        self.assertEqual(other, jobs[1:2])
+
+        # No certificates where stored, the jobs not claimed by the other worker are released
+        self.assertFalse(post.called)
+        self.assertFalse(Certificate.objects.exists())
+        self.assertEqual([IssuanceJob.objects.get(pk=j.pk).status for j in jobs],
+                         [IssuanceJob.STATUS_PENDING, IssuanceJob.STATUS_RUNNING, IssuanceJob.STATUS_PENDING])
+        self.assertEqual([j.status for j in claimed],
+                         [IssuanceJob.STATUS_PENDING, IssuanceJob.STATUS_RUNNING, IssuanceJob.STATUS_PENDING])
+
+        # Finishing the jobs again issues every certificate exactly once
+        self.assertEqual(IssuanceJob.objects.run(other), 0)
+        self.assertEqual(IssuanceJob.objects.run(IssuanceJob.objects.claim(3)), 0)
+        self.assertEqual(sorted(Certificate.objects.values_list('cn', flat=True)),
+                         ['host%s.example.com' % i for i in range(3)])
+        for job in IssuanceJob.objects.all():
+            self.assertEqual(job.status, IssuanceJob.STATUS_DONE)
+            self.assertEqual(job.cert.cn, job.get_kwargs()['subject'][4:])
+
+    def test_run_unusable_ca(self):
+        # The private key of the CA is not available
+        jobs = self.create_jobs(3)
+        claimed = IssuanceJob.objects.claim(3)
+
+        # The last job was claimed by another worker in the meantime, so it's not marked as failed
+        IssuanceJob.objects.filter(pk=jobs[2].pk).update(leased_until=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(IssuanceJob.objects.claim(1), jobs[2:])
+
+        self.assertEqual(IssuanceJob.objects.run(claimed), 2)
+        for job in IssuanceJob.objects.filter(pk__in=[j.pk for j in jobs[:2]]):
+            self.assertEqual(job.status, IssuanceJob.STATUS_FAILED)
+            self.assertNotEqual(job.error, '')
+        self.assertEqual(IssuanceJob.objects.get(pk=jobs[2].pk).status, IssuanceJob.STATUS_RUNNING)
+        self.assertEqual(claimed[2].status, IssuanceJob.STATUS_RUNNING)
+        self.assertFalse(Certificate.objects.exists())
+
+
+class IssuanceJobAdminTestCase(DjangoCAWithCSRTestCase):
+    def setUp(self):
+        super(IssuanceJobAdminTestCase, self).setUp()
+        self.user = User.objects.create_superuser(username='user', password='password',
+                                                  email='user@example.com')
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def add(self, cn, **kwargs):
+        data = {
+            'csr': self.csr_pem,
+            'ca': self.ca.pk,
+            'profile': 'webserver',
+            'subject_0': 'US',
+            'subject_5': cn,
+            'subject_alternative_name_1': True,
+            'algorithm': 'SHA256',
+            'expires': self.ca.expires.strftime('%Y-%m-%d'),
+            'key_usage_0': ['digitalSignature', 'keyAgreement', ],
+            'key_usage_1': True,
+            'extended_key_usage_0': ['clientAuth', 'serverAuth', ],
+            'extended_key_usage_1': False,
+            'tls_feature_1': False,
+        }
+        data.update(kwargs)
+        return self.client.post(reverse('admin:django_ca_certificate_add'), data=data)
+
+    def status(self, job):
+        response = self.client.get(reverse('admin:django_ca_issuancejob_status', args=(job.pk, )))
+        self.assertEqual(response.status_code, 200)
+        return json.loads(response.content.decode('utf-8'))
+
+    @override_tmpcadir(CA_ASYNC_ISSUANCE=True)
+    def test_add(self):
+        cn = 'test-add.example.com'
+        watcher = Watcher.objects.create(mail='user@example.com')
+        with self.assertSignal(post_issue_cert) as post:
+            response = self.add(cn, watchers=[watcher.pk])
+        self.assertFalse(post.called)
+        self.assertFalse(Certificate.objects.exists())
+
+        job = IssuanceJob.objects.get()
+        self.assertRedirects(response, reverse('admin:django_ca_issuancejob_change', args=(job.pk, )))
+        self.assertEqual(list(job.watchers.all()), [watcher])
+        self.assertEqual(self.status(job)['status'], IssuanceJob.STATUS_PENDING)
+
+        response = self.client.get(reverse('admin:django_ca_issuancejob_change', args=(job.pk, )))
+        self.assertEqual(response.status_code, 200)
+
+        IssuanceJob.objects.run(IssuanceJob.objects.claim(1))
+        cert = Certificate.objects.get(cn=cn)
+        self.assertEqual(cert.subject_alternative_name, SubjectAlternativeName('DNS:%s' % cn))
+        self.assertEqual(cert.key_usage, KeyUsage('critical,digitalSignature,keyAgreement'))
+        self.assertEqual(cert.extended_key_usage, ExtendedKeyUsage('clientAuth,serverAuth'))
+        self.assertEqual(cert.algorithm.name, 'sha256')
+        self.assertEqual(list(cert.watchers.all()), [watcher])
+
+        status = self.status(job)
+        self.assertEqual(status['status'], IssuanceJob.STATUS_DONE)
+        self.assertEqual(status['cert'], cert.serial)
+        self.assertEqual(status['cert_url'], reverse('admin:django_ca_certificate_change', args=(cert.pk, )))
+
+    @override_tmpcadir()
+    def test_add_sync(self):
+        # Without CA_ASYNC_ISSUANCE, certificates are still issued immediately
+        response = self.add('test-add.example.com')
+        self.assertRedirects(response, reverse('admin:django_ca_certificate_changelist'))
+        self.assertFalse(IssuanceJob.objects.exists())
+        self.assertTrue(Certificate.objects.filter(cn='test-add.example.com').exists())
+
+    @override_settings(CA_ASYNC_ISSUANCE=True)
+    def test_status_errors(self):
+        response = self.client.get(reverse('admin:django_ca_issuancejob_status', args=(123, )))
+        self.assertEqual(response.status_code, 404)
+
+        job = IssuanceJob.objects.init(self.ca, self.csr_pem, subject='/CN=example.com')
+        self.client.logout()
+        response = self.client.get(reverse('admin:django_ca_issuancejob_status', args=(job.pk, )))
+        self.assertEqual(response.status_code, 302)
+
+    @override_settings(CA_ASYNC_ISSUANCE=True)
+    def test_status_permissions(self):
+        job = IssuanceJob.objects.init(self.ca, self.csr_pem, subject='/CN=example.com')
+        url = reverse('admin:django_ca_issuancejob_status', args=(job.pk, ))
+        self.user.is_superuser = False
+        self.user.save()
+
+        # Staff users without any permissions for jobs may not see their status
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 403)
+
+        # The view permission is enough to poll the status
+        self.user.user_permissions.add(Permission.objects.get(codename='view_issuancejob'))
+        self.assertEqual(self.status(job)['status'], IssuanceJob.STATUS_PENDING)
+
+    @override_tmpcadir(CA_ASYNC_ISSUANCE=True)
+    def test_changelist(self):
+        jobs = [IssuanceJob.objects.init(self.ca, self.csr_pem, subject='/CN=example%s.com' % i,
+                                         expires=self.expires(720)) for i in range(2)]
+        IssuanceJob.objects.run(IssuanceJob.objects.claim(1))
+        cert = IssuanceJob.objects.get(pk=jobs[0].pk).cert
+
+        response = self.client.get(reverse('admin:django_ca_issuancejob_changelist'))
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, '<a href="%s">%s</a>' % (
+            reverse('admin:django_ca_certificate_change', args=(cert.pk, )), cert))
@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of django-ca (https://github.com/mathiasertl/django-ca).
+#
+# django-ca is free software: you can redistribute it and/or modify it under the terms of the GNU
+# General Public License as published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# django-ca is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without
+# even the implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with django-ca.  If not,
+# see <http://www.gnu.org/licenses/>.
+
+from cryptography.hazmat.backends import default_backend
+from cryptography.hazmat.primitives.asymmetric import dsa
+from cryptography.hazmat.primitives.asymmetric import ec
+from cryptography.hazmat.primitives.asymmetric import rsa
+from cryptography.hazmat.primitives.serialization import load_der_private_key
+
+from django.db.models.query import QuerySet
+
+from ..keypool import get_private_key
+from ..keypool import parse_key_spec
+from ..keypool import refill
+from ..models import CertificateAuthority
+from ..models import PooledPrivateKey
+from .base import DjangoCATestCase
+from .base import override_settings
+from .base import override_tmpcadir
+
+try:
+    import unittest.mock as mock
+except ImportError:
+    import mock
+
+
+@override_settings(CA_KEY_POOL={'RSA:1024': 2, 'ECC:SECP256R1': 1, 'DSA:1024': 1}, CA_MIN_KEY_SIZE=1024,
+                   CA_KEY_POOL_PASSWORD='secret')
+class KeyPoolTestCase(DjangoCATestCase):
+    def test_parse_key_spec(self):
+        self.assertEqual(parse_key_spec('rsa:2048'), ('RSA', 2048, ''))
+        self.assertEqual(parse_key_spec('DSA'), ('DSA', 4096, ''))
+        self.assertEqual(parse_key_spec('ECC'), ('ECC', None, 'SECP256R1'))
+
+        with self.assertRaisesRegex(ValueError, r'^FOO: Unknown key type\.$'):
+            parse_key_spec('FOO:123')
+        with self.assertRaisesRegex(ValueError, r'^RSA:foo: Key size must be an integer\.$'):
+            parse_key_spec('RSA:foo')
+        with self.assertRaisesRegex(ValueError, r'^foo: Not a known Eliptic Curve$'):
+            parse_key_spec('ECC:foo')
+
+    def test_refill(self):
+        self.assertEqual(refill(), {'RSA:1024': 2, 'ECC:SECP256R1': 1, 'DSA:1024': 1})
+        self.assertEqual(sorted(str(k) for k in PooledPrivateKey.objects.all()),
+                         ['DSA:1024', 'ECC:SECP256R1', 'RSA:1024', 'RSA:1024'])
+
+        # pool is already full
+        self.assertEqual(refill(), {'RSA:1024': 0, 'ECC:SECP256R1': 0, 'DSA:1024': 0})
+        self.assertEqual(PooledPrivateKey.objects.count(), 4)
+
+    def test_refill_processes(self):
+        self.assertEqual(refill(processes=2), {'RSA:1024': 2, 'ECC:SECP256R1': 1, 'DSA:1024': 1})
+        self.assertEqual(PooledPrivateKey.objects.filter(key_type='RSA', key_size=1024).count(), 2)
+
+    def test_get_private_key(self):
+        refill()
+
+        key = get_private_key('RSA', 1024)
+        self.assertIsInstance(key, rsa.RSAPrivateKey)
+        self.assertEqual(key.key_size, 1024)
+        self.assertEqual(PooledPrivateKey.objects.filter(key_type='RSA').count(), 1)
+
+        self.assertIsInstance(get_private_key('ECC', ecc_curve='SECP256R1'), ec.EllipticCurvePrivateKey)
+        self.assertIsInstance(get_private_key('DSA', 1024), dsa.DSAPrivateKey)
+        self.assertEqual(PooledPrivateKey.objects.filter(key_type__in=['ECC', 'DSA']).count(), 0)
+
+        # keys are generated if the pool is empty
+        with mock.patch('django_ca.keypool.generate_private_key', side_effect=Exception('generated')):
+            get_private_key('RSA', 1024)
+            with self.assertRaisesRegex(Exception, '^generated$'):
+                get_private_key('RSA', 1024)
+
+    def test_get_private_key_concurrent(self):
+        refill()
+        first, second = PooledPrivateKey.objects.filter(key_type='RSA').order_by('pk')
+        delete = QuerySet.delete
+
+        def concurrent_delete(qs):
+            # another process uses the first key just before this one does
+            if PooledPrivateKey.objects.filter(pk=first.pk).exists():
+                delete(PooledPrivateKey.objects.filter(pk=first.pk))
+            return delete(qs)
+
+        with mock.patch.object(QuerySet, 'delete', autospec=True, side_effect=concurrent_delete):
+            key = get_private_key('RSA', 1024)
+
+        expected = load_der_private_key(bytes(second.key), b'secret', default_backend())
+        self.assertEqual(key.private_numbers(), expected.private_numbers())
+        self.assertFalse(PooledPrivateKey.objects.filter(key_type='RSA').exists())
+
+    def test_password(self):
+        refill()
+        key = PooledPrivateKey.objects.filter(key_type='RSA').first()
+
+        # keys cannot be loaded without the password
+        with self.assertRaises(TypeError):
+            load_der_private_key(bytes(key.key), None, default_backend())
+        with self.assertRaises(ValueError):
+            load_der_private_key(bytes(key.key), b'wrong', default_backend())
+        self.assertIsInstance(load_der_private_key(bytes(key.key), b'secret', default_backend()),
+                              rsa.RSAPrivateKey)
+
+    @override_settings(CA_KEY_POOL_PASSWORD=None)
+    def test_disabled(self):
+        with self.assertRaisesRegex(ValueError, r'^Please set the CA_KEY_POOL_PASSWORD setting'):
+            refill()
+
+        # keys are always generated if the pool is disabled
+        PooledPrivateKey.objects.create(key_type='RSA', key_size=1024, ecc_curve='', key=b'foo')
+        key = get_private_key('RSA', 1024)
+        self.assertIsInstance(key, rsa.RSAPrivateKey)
+        self.assertEqual(PooledPrivateKey.objects.count(), 1)
+
+    @override_tmpcadir()
+    def test_init_ca(self):
+        refill()
+        pooled = get_private_key('ECC', ecc_curve='SECP256R1')
+        refill()
+
+        with mock.patch('django_ca.keypool.generate_private_key', side_effect=Exception('generated')):
+            ca = CertificateAuthority.objects.init(name='pooled', subject='/CN=example.com', key_type='ECC')
+
+        self.assertIsInstance(ca.key(None), ec.EllipticCurvePrivateKey)
+        self.assertNotEqual(ca.x509.public_key().public_numbers(), pooled.public_key().public_numbers())
+        self.assertEqual(PooledPrivateKey.objects.filter(key_type='ECC').count(), 0)
@@ -19,6 +19,7 @@ from freezegun import freeze_time
 
 from cryptography import x509
 from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.serialization import Encoding
 from cryptography.x509.oid import ExtensionOID
 
 from django.conf import settings
@@ -35,9 +36,12 @@ from ..extensions import OCSPNoCheck
 from ..extensions import SubjectAlternativeName
 from ..extensions import SubjectKeyIdentifier
 from ..extensions import TLSFeature
+from ..managers import ca_extensions_cache
 from ..models import Certificate
 from ..models import CertificateAuthority
 from ..profiles import get_cert_profile_kwargs
+from ..signals import post_issue_cert
+from ..signals import pre_issue_cert
 from ..subject import Subject
 from .base import DjangoCATestCase
 from .base import DjangoCAWithCSRTestCase
@@ -52,6 +56,11 @@ from .base import root_issuer_url
 from .base import root_ocsp_domain
 from .base import root_ocsp_url
 
+try:
+    import unittest.mock as mock
+except ImportError:
+    import mock
+
 if ca_settings.CRYPTOGRAPHY_HAS_PRECERT_POISON:  # pragma: no branch, pragma: only cryptography>=2.4
     from ..extensions import PrecertPoison
 
@@ -450,3 +459,110 @@ class GetCertTestCase(DjangoCAWithCSRTestCase):
             Certificate.objects.init(
                 self.ca, self.csr_pem, expires=self.expires(720), subject_alternative_name=['example.com'],
                 extra_extensions=[False])
+
+
+class GetCAExtensionsTestCase(DjangoCAWithCSRTestCase):
+    def test_cache(self):
+        extensions = Certificate.objects.get_ca_extensions(self.ca)
+        self.assertIs(ca_extensions_cache[self.ca.pk][1], extensions)
+        self.assertEqual(extensions[0], (False, self.ca.get_authority_key_identifier()))
+
+        with mock.patch.object(CertificateAuthority, 'get_authority_key_identifier',
+                               side_effect=Exception('not cached')):
+            self.assertIs(Certificate.objects.get_ca_extensions(self.ca), extensions)
+
+        # modified CAs don't use the cache, even if not saved
+        self.ca.crl_url = 'http://crl.example.com'
+        self.assertNotEqual(Certificate.objects.get_ca_extensions(self.ca), extensions)
+        self.assertEqual(Certificate.objects.get_ca_extensions(self.ca)[1][1][0].full_name,
+                         [x509.UniformResourceIdentifier('http://crl.example.com')])
+
+        # saving the CA removes the cached extensions
+        self.ca.save()
+        self.assertNotIn(self.ca.pk, ca_extensions_cache)
+
+
+@override_settings(CA_PROFILES={}, CA_DEFAULT_SUBJECT={})
+class BulkInitTestCase(DjangoCAWithCSRTestCase):
+    def create_csrs(self, count):
+        return [self.create_csr('/CN=host%s.example.com' % i)[1].public_bytes(Encoding.PEM).decode('utf-8')
+                for i in range(count)]
+
+    @override_tmpcadir()
+    def test_basic(self):
+        csrs = self.create_csrs(3)
+        csrs[1] = (csrs[1], {'subject': '/CN=custom.example.com'})
+
+        with self.assertSignal(pre_issue_cert) as pre, self.assertSignal(post_issue_cert) as post, \
+                mock.patch.object(CertificateAuthority, 'key', autospec=True,
+                                  side_effect=CertificateAuthority.key) as key:
+            certs = Certificate.objects.bulk_init(self.ca, csrs, batch_size=2, expires=self.expires(720),
+                                                  key_usage='critical,digitalSignature')
+
+        key.assert_called_once_with(self.ca, None)
+        self.assertEqual(pre.call_count, 3)
+        self.assertEqual(post.call_args_list, [
+            mock.call(cert=cert, signal=post_issue_cert, sender=Certificate) for cert in certs])
+
+        self.assertEqual([c.cn for c in certs],
+                         ['host0.example.com', 'custom.example.com', 'host2.example.com'])
+        for cert in certs:
+            db_cert = Certificate.objects.get(pk=cert.pk)
+            self.assertEqual(db_cert.x509, cert.x509)
+            self.assertEqual(db_cert.ca, self.ca)
+            self.assertEqual(db_cert.key_usage, KeyUsage('critical,digitalSignature'))
+            self.assertEqual(db_cert.authority_key_identifier, self.ca.authority_key_identifier)
+            self.assertTrue(db_cert.csr.startswith('-----BEGIN CERTIFICATE REQUEST-----'))
+            self.assertEqual(list(Certificate.objects.with_name('dns:%s' % cert.cn)), [db_cert])
+
+    @override_tmpcadir()
+    def test_jobs(self):
+        certs = Certificate.objects.bulk_init(self.ca, self.create_csrs(5), jobs=3, batch_size=2,
+                                              expires=self.expires(720))
+        self.assertEqual([c.cn for c in certs], ['host%s.example.com' % i for i in range(5)])
+        self.assertEqual(Certificate.objects.filter(pk__in=[c.pk for c in certs]).count(), 5)
+
+        # database connections of worker threads are closed after every certificate
+        with mock.patch('django_ca.managers.connection') as connection:
+            Certificate.objects.bulk_init(self.ca, self.create_csrs(3), jobs=2, expires=self.expires(720))
+        self.assertEqual(connection.close.call_count, 3)
+
+        # ... but not the connection of the calling thread
+        with mock.patch('django_ca.managers.connection') as connection:
+            Certificate.objects.bulk_init(self.ca, self.create_csrs(3), expires=self.expires(720))
+        connection.close.assert_not_called()
+
+    @override_tmpcadir()
+    def test_error(self):
+        csrs = self.create_csrs(3)
+        csrs[2] = 'foobar'
+
+        with self.assertRaises(ValueError):
+            Certificate.objects.bulk_init(self.ca, csrs, batch_size=2, expires=self.expires(720))
+
+        # The first batch was stored, the second wasn't
+        self.assertEqual(list(Certificate.objects.values_list('cn', flat=True)),
+                         ['host0.example.com', 'host1.example.com'])
+
+    @override_tmpcadir()
+    def test_der(self):
+        csrs = [self.create_csr('/CN=host%s.example.com' % i)[1].public_bytes(Encoding.DER) for i in range(2)]
+        certs = Certificate.objects.bulk_init(self.ca, csrs, csr_format=Encoding.DER,
+                                              expires=self.expires(720))
+        self.assertEqual([c.cn for c in certs], ['host0.example.com', 'host1.example.com'])
+        self.assertEqual([c.subject for c in certs],
+                         [Subject('/CN=host%s.example.com' % i) for i in range(2)])
+
+    @override_tmpcadir()
+    def test_subject_alternative_name(self):
+        san = SubjectAlternativeName(['extra.example.com'])
+        csrs = [(csr, {'subject': Subject('/CN=host%s.example.com' % i)})
+                for i, csr in enumerate(self.create_csrs(2))]
+        certs = Certificate.objects.bulk_init(self.ca, csrs, subject_alternative_name=san,
+                                              expires=self.expires(720))
+
+        # The CommonName of one certificate is not added to the subjectAlternativeName of the others
+        self.assertEqual([c.subject_alternative_name for c in certs], [
+            SubjectAlternativeName(['DNS:host%s.example.com' % i, 'DNS:extra.example.com']) for i in range(2)
+        ])
+        self.assertEqual(san, SubjectAlternativeName(['extra.example.com']))
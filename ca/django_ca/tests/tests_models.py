@@ -20,6 +20,7 @@ from datetime import datetime
 from freezegun import freeze_time
 
 from cryptography import x509
+from cryptography.hazmat.primitives.serialization import Encoding
 
 from django.core.exceptions import ValidationError
 from django.test import TestCase
@@ -37,6 +38,7 @@ from ..extensions import SubjectAlternativeName
 from ..extensions import SubjectKeyIdentifier
 from ..models import Certificate
 from ..models import Watcher
+from ..models import certificate_cache
 from .base import DjangoCAWithChildCATestCase
 from .base import cert3_csr
 from .base import certs
@@ -178,6 +180,97 @@ class CertificateTests(DjangoCAWithChildCATestCase):
         with self.assertRaises(ValueError):
             c.get_revocation()
 
+        # The revoked certificate is built from the database, without loading the certificate
+        revoked_date = datetime(2019, 2, 3, 15, 43, 12)
+        c = Certificate(serial='AB:CD', revoked=True, revoked_date=revoked_date,
+                        revoked_reason='key_compromise')
+        revoked = c.get_revocation()
+        self.assertEqual(revoked.serial_number, 0xABCD)
+        self.assertEqual(revoked.revocation_date, revoked_date)
+        self.assertEqual(revoked.extensions.get_extension_for_class(x509.CRLReason).value.reason,
+                         x509.ReasonFlags.key_compromise)
+
+    def test_certificate_cache(self):
+        certificate_cache.clear()
+
+        # first access loads the certificate, all later instances get it from the cache
+        self.assertEqual(Certificate.objects.get(pk=self.cert.pk).x509, self.cert.x509)
+        self.assertEqual((certificate_cache.hits, certificate_cache.misses), (0, 1))
+        with mock.patch('cryptography.x509.load_pem_x509_certificate', side_effect=Exception('loaded')):
+            loaded = Certificate.objects.get(pk=self.cert.pk).x509
+        self.assertIs(loaded, Certificate.objects.get(pk=self.cert.pk).x509)
+        self.assertEqual((certificate_cache.hits, certificate_cache.misses), (2, 1))
+
+        # A modified certificate is loaded again
+        cert = Certificate.objects.get(pk=self.cert.pk)
+        cert.der = self.cert2.der
+        self.assertEqual(cert.x509, self.cert2.x509)
+        self.assertEqual(certificate_cache.misses, 2)
+
+        # Setting a certificate adds it to the cache
+        cert.x509 = self.cert3.x509
+        certificate_cache.clear()
+        cert.x509 = self.cert3.x509
+        self.assertIs(Certificate.objects.get(pk=self.cert3.pk).x509, self.cert3.x509)
+        self.assertEqual((certificate_cache.hits, certificate_cache.misses), (1, 0))
+
+    def test_der(self):
+        for cert in self.cas + self.certs:
+            self.assertEqual(bytes(cert.der), cert.x509.public_bytes(Encoding.DER))
+
+            loaded = type(cert).objects.get(pk=cert.pk)
+            self.assertEqual(loaded.dump_certificate(Encoding.DER), bytes(cert.der))
+            self.assertEqual(loaded.x509, cert.x509)
+
+        # certificates without DER (e.g. from before the column was added) are loaded from the PEM
+        cert = Certificate.objects.get(pk=self.cert.pk)
+        cert.der = None
+        certificate_cache.clear()
+        self.assertEqual(cert.dump_certificate(Encoding.DER), self.cert.x509.public_bytes(Encoding.DER))
+
+    def test_extension_cache(self):
+        cert = Certificate.objects.get(pk=self.cert.pk)
+        fields = list(cert.get_extension_fields())
+        extensions = list(cert.get_extensions())
+
+        # extensions are parsed and wrapped only once
+        with mock.patch.object(Certificate, 'x509', new_callable=mock.PropertyMock,
+                               side_effect=Exception('parsed again')):
+            self.assertEqual(list(cert.get_extension_fields()), fields)
+            self.assertEqual(list(cert.get_extensions()), extensions)
+            self.assertIs(cert.subject_alternative_name, cert.subject_alternative_name)
+            self.assertIsNone(cert.name_constraints)
+
+        # setting a new certificate resets the cache
+        cert.x509 = self.cert2.x509
+        self.assertEqual(cert.subject_alternative_name, self.cert2.subject_alternative_name)
+
+    def test_names(self):
+        self.assertCountEqual(self.cert_all.names.values_list('field', 'value'), [
+            ('subject', 'cn=all-extensions.example.com'),
+            ('san', 'dns:all-extensions.example.com'),
+            ('san', 'dns:extra.example.com'),
+            ('key_usage', 'encipheronly'),
+            ('key_usage', 'keyagreement'),
+            ('key_usage', 'nonrepudiation'),
+            ('ext_key_usage', 'clientauth'),
+            ('ext_key_usage', 'codesigning'),
+            ('ext_key_usage', 'emailprotection'),
+            ('ext_key_usage', 'serverauth'),
+        ])
+        name = self.cert_all.names.get(field='subject')
+        self.assertEqual(str(name), 'subject: cn=all-extensions.example.com')
+
+        # names are only updated if the certificate changes
+        with self.assertNumQueries(1):
+            self.cert_all.save()
+
+        expected = list(self.cert_no_ext.names.values_list('field', 'value'))
+        self.cert_no_ext.delete()  # serials are unique
+        self.cert_all.x509 = self.cert_no_ext.x509
+        self.cert_all.save()
+        self.assertCountEqual(self.cert_all.names.values_list('field', 'value'), expected)
+
     @override_tmpcadir()
     def test_serial(self):
         self.assertEqual(self.ca.serial, certs['root']['serial'])
@@ -337,6 +430,25 @@ class CertificateTests(DjangoCAWithChildCATestCase):
         self.assertEqual(self.cert2.hpkp_pin, certs['cert2']['hpkp'])
         self.assertEqual(self.cert3.hpkp_pin, certs['cert3']['hpkp'])
 
+    def test_stored_digests(self):
+        self.assertEqual(self.cert.sha256_fingerprint, certs['cert1']['sha256'])
+        self.assertEqual(self.cert.sha1_fingerprint, certs['cert1']['sha1'])
+        self.assertEqual(self.cert.ski, self.cert.subject_key_identifier.as_text())
+        self.assertEqual(self.cert.aki, self.ca.ski)
+        self.assertEqual(self.ca.aki, self.ca.ski)  # root CA is self-signed
+        self.assertEqual(self.child_ca.aki, self.ca.ski)
+
+        # stored values are used, but computed again if they are not set
+        cert = Certificate.objects.get(pk=self.cert.pk)
+        cert.sha256_fingerprint = 'foo'
+        cert.spki_sha256 = 'AB:CD'
+        self.assertEqual(cert.get_digest('sha256'), 'foo')
+        self.assertEqual(cert.hpkp_pin, 'q80=')
+
+        cert.sha256_fingerprint = cert.spki_sha256 = None
+        self.assertEqual(cert.get_digest('sha256'), certs['cert1']['sha256'])
+        self.assertEqual(cert.hpkp_pin, certs['cert1']['hpkp'])
+
     def test_contrib_multiple_ous_and_no_ext(self):
         cert = self.cert_multiple_ous_and_no_ext
         self.assertIsNone(cert.authority_information_access)
@@ -423,13 +535,10 @@ class CertificateTests(DjangoCAWithChildCATestCase):
         self.assertEqual(self.ecc_ca.get_authority_key_identifier(), certs['ecc_ca']['aki'])
         self.assertEqual(self.child_ca.get_authority_key_identifier(), certs['child']['aki'])
 
-        # All CAs have a subject key identifier, so we mock that this exception is not present
-        def side_effect(cls):
-            raise x509.ExtensionNotFound('mocked', x509.SubjectKeyIdentifier.oid)
-
-        with mock.patch('cryptography.x509.extensions.Extensions.get_extension_for_class',
-                        side_effect=side_effect):
+        # All CAs have a subject key identifier, so we mock that the extension is not present
+        with mock.patch.object(self.child_ca, '_get_extension', return_value=None) as get_extension:
             self.assertEqual(self.child_ca.get_authority_key_identifier(), certs['child']['aki'])
+        get_extension.assert_called_once_with(x509.ExtensionOID.SUBJECT_KEY_IDENTIFIER)
 
     ###############################################
     # Test extensions for all loaded certificates #
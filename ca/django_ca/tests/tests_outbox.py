@@ -0,0 +1,192 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of django-ca (https://github.com/mathiasertl/django-ca).
+#
+# django-ca is free software: you can redistribute it and/or modify it under the terms of the GNU
+# General Public License as published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# django-ca is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without
+# even the implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with django-ca.  If not,
+# see <http://www.gnu.org/licenses/>.
+
+import json
+from datetime import timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from .. import outbox
+from ..models import Certificate
+from ..models import OutboxEvent
+from .base import DjangoCAWithChildCATestCase
+from .base import override_settings
+from .base import override_tmpcadir
+
+try:
+    import unittest.mock as mock
+except ImportError:
+    import mock
+
+handled = []
+
+
+def handler(events):
+    handled.append(events)
+
+
+def failing_handler(events):
+    raise ValueError('handler failed')
+
+
+class OutboxTestCase(DjangoCAWithChildCATestCase):
+    def setUp(self):
+        super(OutboxTestCase, self).setUp()
+        handled[:] = []
+
+    def assertEvents(self, expected):
+        self.assertEqual([(e.event, json.loads(e.payload)) for e in OutboxEvent.objects.order_by('pk')],
+                         expected)
+
+    @override_tmpcadir()
+    def test_disabled(self):
+        Certificate.objects.init(self.ca, self.csr_pem, expires=self.expires(720), subject='/CN=example.com')
+        self.cert.revoke()
+        self.assertFalse(OutboxEvent.objects.exists())
+
+    @override_tmpcadir(CA_OUTBOX_HANDLERS=['django_ca.tests.tests_outbox.handler'])
+    def test_issue(self):
+        cert = Certificate.objects.init(self.ca, self.csr_pem, expires=self.expires(720),
+                                        subject='/CN=example.com')
+        certs = Certificate.objects.bulk_init(self.ca, [self.csr_pem], expires=self.expires(720),
+                                              subject='/CN=example.net')
+        self.assertEvents([(
+            'post_issue_cert', {
+                'serial': c.serial,
+                'cn': c.cn,
+                'expires': c.expires.isoformat(),
+                'issuer': self.ca.serial,
+            }) for c in [cert] + certs])
+
+        event = OutboxEvent.objects.order_by('pk').first()
+        self.assertEqual(str(event), '%s: post_issue_cert' % event.pk)
+
+    @override_settings(CA_OUTBOX_WEBHOOKS=['http://localhost/'])
+    def test_revoke(self):
+        self.cert.revoke('keyCompromise')
+        self.ca.revoke()
+        self.assertEvents([
+            ('post_revoke_cert', {
+                'serial': self.cert.serial,
+                'cn': self.cert.cn,
+                'expires': self.cert.expires.isoformat(),
+                'issuer': self.ca.serial,
+                'revoked_date': self.cert.revoked_date.isoformat(),
+                'revoked_reason': 'keyCompromise',
+            }),
+            ('post_revoke_cert', {
+                'serial': self.ca.serial,
+                'cn': self.ca.cn,
+                'expires': self.ca.expires.isoformat(),
+                'issuer': None,
+                'revoked_date': self.ca.revoked_date.isoformat(),
+                'revoked_reason': None,
+            }),
+        ])
+
+    @override_settings(CA_OUTBOX_HANDLERS=['django_ca.tests.tests_outbox.handler'])
+    def test_record(self):
+        outbox.record('post_create_ca', [self.child_ca])
+        self.assertEvents([('post_create_ca', {
+            'serial': self.child_ca.serial,
+            'cn': self.child_ca.cn,
+            'expires': self.child_ca.expires.isoformat(),
+            'issuer': self.ca.serial,
+            'name': self.child_ca.name,
+        })])
+
+        with self.assertRaisesRegex(ValueError, r'^foo: Unknown event\.$'):
+            outbox.record('foo', [self.cert])
+
+    @override_settings(CA_OUTBOX_HANDLERS=['django_ca.tests.tests_outbox.handler'])
+    def test_rollback(self):
+        # Events are not stored if the transaction is rolled back
+        with self.assertRaises(ValueError), mock.patch.object(Certificate, 'save', side_effect=ValueError()):
+            self.cert.revoke()
+        self.assertFalse(OutboxEvent.objects.exists())
+
+        with self.assertRaises(ValueError), transaction.atomic():
+            self.cert.revoke()
+            raise ValueError()
+        self.assertFalse(OutboxEvent.objects.exists())
+
+    @override_settings(CA_OUTBOX_HANDLERS=['django_ca.tests.tests_outbox.handler'])
+    def test_dispatch(self):
+        outbox.record('post_issue_cert', [self.cert, self.cert_all])
+        events = [e.as_dict() for e in OutboxEvent.objects.order_by('pk')]
+
+        self.assertEqual(outbox.dispatch(batch_size=1), (1, 0))
+        self.assertEqual(outbox.dispatch(batch_size=1), (1, 0))
+        self.assertEqual(outbox.dispatch(batch_size=1), (0, 0))
+        self.assertEqual(handled, [events[:1], events[1:]])
+        self.assertFalse(OutboxEvent.objects.exists())
+
+    @override_settings(CA_OUTBOX_HANDLERS=['django_ca.tests.tests_outbox.handler'])
+    def test_claim(self):
+        outbox.record('post_issue_cert', [self.cert])
+        self.assertEqual(len(outbox.claim(10)), 1)
+
+        # Claimed events are not claimed again until the lease expires
+        self.assertEqual(outbox.claim(10), [])
+        OutboxEvent.objects.update(next_attempt=timezone.now())
+        self.assertEqual(len(outbox.claim(10, lease=0)), 1)
+
+    def test_webhook(self):
+        with self.webhook_server() as server, \
+                self.settings(CA_OUTBOX_WEBHOOKS=[server.url + '/hook1', server.url + '/hook2']):
+            outbox.record('post_issue_cert', [self.cert])
+            events = [e.as_dict() for e in OutboxEvent.objects.all()]
+            self.assertEqual(outbox.dispatch(), (1, 0))
+
+        self.assertEqual(server.requests, [
+            ('/hook1', {'events': events}),
+            ('/hook2', {'events': events}),
+        ])
+        self.assertFalse(OutboxEvent.objects.exists())
+
+    def test_webhook_error(self):
+        with self.webhook_server(status=500) as server, self.settings(CA_OUTBOX_WEBHOOKS=[server.url]), \
+                self.assertLogs('django_ca.outbox', 'ERROR'):
+            outbox.record('post_issue_cert', [self.cert])
+            self.assertEqual(outbox.dispatch(), (0, 1))
+
+        event = OutboxEvent.objects.get()
+        self.assertEqual(event.attempts, 1)
+        self.assertIn('500', event.error)
+        self.assertEqual(len(server.requests), 1)
+
+    @override_settings(CA_OUTBOX_HANDLERS=['django_ca.tests.tests_outbox.failing_handler'])
+    def test_backoff(self):
+        outbox.record('post_issue_cert', [self.cert])
+
+        delays = []
+        for i in range(10):
+            OutboxEvent.objects.update(next_attempt=timezone.now())
+            with self.assertLogs('django_ca.outbox', 'ERROR'):
+                start = timezone.now()
+                self.assertEqual(outbox.dispatch(), (0, 1))
+            event = OutboxEvent.objects.get()
+            delays.append(int(round((event.next_attempt - start).total_seconds())))
+
+        self.assertEqual(delays, [10, 20, 40, 80, 160, 320, 640, 1280, 2560, 3600])
+        self.assertEqual(event.attempts, 10)
+        self.assertEqual(event.error, 'handler failed')
+
+        # Events are not delivered before the delay has passed
+        self.assertEqual(outbox.dispatch(), (0, 0))
+        OutboxEvent.objects.update(next_attempt=timezone.now() - timedelta(seconds=1))
+        with self.settings(CA_OUTBOX_HANDLERS=['django_ca.tests.tests_outbox.handler']):
+            self.assertEqual(outbox.dispatch(), (1, 0))
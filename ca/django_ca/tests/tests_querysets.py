@@ -15,19 +15,37 @@
 
 """Test querysets."""
 
+import unittest
+
 from freezegun import freeze_time
 
 from cryptography.hazmat.primitives import hashes
 from cryptography.hazmat.primitives.asymmetric.rsa import RSAPublicKey
+from cryptography.hazmat.primitives.serialization import Encoding
+
+from django.core.cache import cache
+from django.db import connection
+from django.utils import timezone
 
 from .. import ca_settings
+from ..crl import get_crl_cache_key
 from ..extensions import BasicConstraints
 from ..extensions import KeyUsage
 from ..models import Certificate
 from ..models import CertificateAuthority
+from ..models import OutboxEvent
+from ..models import certificate_cache
+from ..ocsp import get_ocsp_cache_key
+from ..signals import post_bulk_revoke_cert
+from ..signals import post_revoke_cert
+from ..signals import pre_bulk_revoke_cert
+from ..signals import pre_revoke_cert
 from ..subject import Subject
+from ..utils import pad_serial
 from .base import DjangoCATestCase
 from .base import DjangoCAWithCertTestCase
+from .base import certs
+from .base import child_pubkey
 from .base import override_settings
 from .base import override_tmpcadir
 
@@ -144,3 +162,135 @@ class CertificateQuerysetTestCase(DjangoCAWithCertTestCase):
             self.assertQuerySet(Certificate.objects.not_yet_valid())
             self.assertQuerySet(Certificate.objects.valid())
             self.assertQuerySet(Certificate.objects.expired(), *self.certs)
+
+    def test_with_name(self):
+        self.assertQuerySet(Certificate.objects.with_name('DNS:extra.example.com'), self.cert_all)
+        self.assertQuerySet(Certificate.objects.with_name('dns:host1.example.com', field='san'), self.cert)
+        self.assertQuerySet(Certificate.objects.with_name('CN=host1.example.com', field='subject'), self.cert)
+        self.assertQuerySet(Certificate.objects.with_name('dns:host1.example.com', field='subject'))
+        self.assertQuerySet(Certificate.objects.with_name('codeSigning', field='ext_key_usage'),
+                            self.cert_all)
+        self.assertQuerySet(Certificate.objects.with_name('dns:wrong.example.com'))
+
+    def test_by_fingerprint(self):
+        fingerprint = certs['cert1']['sha256']
+        self.assertQuerySet(Certificate.objects.by_fingerprint(fingerprint), self.cert)
+        self.assertQuerySet(Certificate.objects.by_fingerprint(fingerprint.replace(':', '').lower()),
+                            self.cert)
+        self.assertQuerySet(Certificate.objects.by_fingerprint(certs['cert1']['sha1'], 'sha1'), self.cert)
+        self.assertQuerySet(Certificate.objects.by_fingerprint(certs['cert1']['sha1']))
+
+        with self.assertRaisesRegex(ValueError, r'^MD5: Unsupported fingerprint algorithm\.$'):
+            Certificate.objects.by_fingerprint(certs['cert1']['md5'], 'md5')
+
+    def test_key_identifiers(self):
+        ski = self.cert.subject_key_identifier.as_text()
+        self.assertQuerySet(Certificate.objects.by_ski(ski), self.cert)
+        self.assertQuerySet(Certificate.objects.by_ski(ski.replace(':', '')), self.cert)
+        self.assertEqual(CertificateAuthority.objects.by_ski(self.ca.ski).get(), self.ca)
+
+        issued = Certificate.objects.issued_by_aki(self.ca.ski)
+        self.assertIn(self.cert, issued)
+        self.assertNotIn(self.cert_letsencrypt_jabber_at, issued)  # issued by a different CA
+
+    def test_get_by_serial_or_cn(self):
+        qs = Certificate.objects.all()
+        self.assertEqual(self.cert.serial_hex, pad_serial(self.cert.serial))
+        self.assertEqual(qs.get_by_serial_or_cn(self.cert.serial), self.cert)
+        self.assertEqual(qs.get_by_serial_or_cn(self.cert.serial.lower()), self.cert)
+        self.assertEqual(qs.get_by_serial_or_cn(self.cert.serial[:8]), self.cert)  # prefix match
+        self.assertEqual(qs.get_by_serial_or_cn(self.cert.cn), self.cert)
+
+        # exact matches need only a single query
+        with self.assertNumQueries(1):
+            qs.get_by_serial_or_cn(self.cert.serial)
+
+        with self.assertRaises(Certificate.DoesNotExist):
+            qs.get_by_serial_or_cn('AB:CD')
+
+    def test_get_by_serial_or_cn_multiple_cas(self):
+        # Another CA has a certificate with the same serial_hex (which is only unique per CA)
+        other = self.cert_letsencrypt_jabber_at
+        other_ca = self.load_ca(name='child', x509=child_pubkey)
+        Certificate.objects.filter(pk=other.pk).update(ca=other_ca, serial_hex=self.cert.serial_hex)
+
+        # The exact match is ambiguous, so the lookup falls back to the prefix match
+        with self.assertNumQueries(2):
+            self.assertEqual(Certificate.objects.get_by_serial_or_cn(self.cert.serial), self.cert)
+        self.assertEqual(Certificate.objects.filter(ca=other_ca).get_by_serial_or_cn(self.cert.serial),
+                         other)
+
+    @unittest.skipUnless(connection.vendor == 'sqlite', 'Query plan is specific to SQLite.')
+    def test_query_plans(self):
+        def get_plan(qs):
+            sql, params = qs.query.sql_with_params()
+            with connection.cursor() as cursor:
+                cursor.execute('EXPLAIN QUERY PLAN %s' % sql, params)
+                return ' '.join([str(r[-1]) for r in cursor.fetchall()])
+
+        now = timezone.now()
+        qs = Certificate.objects.filter(ca=self.ca, revoked=True, expires__gt=now)
+        self.assertIn('USING INDEX django_ca_certificate_ca_id_revoked_expires', get_plan(qs))
+
+        for qs in [Certificate.objects.valid(), Certificate.objects.expired()]:
+            self.assertIn('USING INDEX django_ca_certificate_revoked_expires', get_plan(qs))
+
+    def test_light(self):
+        cert = Certificate.objects.light().get(pk=self.cert.pk)
+        self.assertEqual(cert.get_deferred_fields(), {'pub', 'der', 'csr'})
+        self.assertEqual(cert.serial, self.cert.serial)
+
+        # accessing the certificate loads it transparently
+        certificate_cache.clear()
+        with self.assertNumQueries(1):
+            self.assertEqual(cert.x509.serial_number, self.cert.x509.serial_number)
+
+    @override_settings(CA_OUTBOX_WEBHOOKS=['http://localhost/'])
+    def test_bulk_revoke(self):
+        self.cert2.revoke('keyCompromise')  # already revoked certs are not changed
+        ocsp_key = get_ocsp_cache_key(self.ca.serial, self.cert.serial)
+        crl_key = get_crl_cache_key(self.ca.serial, Encoding.DER, hashes.SHA512())
+        cache.set(ocsp_key, b'foo')
+        cache.set(crl_key, b'foo')
+
+        qs = Certificate.objects.filter(pk__in=[self.cert.pk, self.cert2.pk, self.cert3.pk, self.ocsp.pk])
+        with self.assertSignal(pre_revoke_cert) as pre_single, \
+                self.assertSignal(post_revoke_cert) as post_single, \
+                self.assertSignal(pre_bulk_revoke_cert) as pre, \
+                self.assertSignal(post_bulk_revoke_cert) as post:
+            self.assertEqual(qs.bulk_revoke('superseded', chunk_size=2), 3)
+
+        # per-certificate signals are still sent
+        self.assertEqual([(call[1]['cert'].pk, call[1]['reason'], call[1]['bulk'])
+                          for call in pre_single.call_args_list],
+                         [(self.cert.pk, 'superseded', True), (self.cert3.pk, 'superseded', True),
+                          (self.ocsp.pk, 'superseded', True)])
+        self.assertEqual([(call[1]['cert'].pk, call[1]['cert'].revoked, call[1]['bulk'])
+                          for call in post_single.call_args_list],
+                         [(self.cert.pk, True, True), (self.cert3.pk, True, True),
+                          (self.ocsp.pk, True, True)])
+        self.assertEqual([[c.pk for c in call[1]['certs']] for call in pre.call_args_list],
+                         [[self.cert.pk, self.cert3.pk], [self.ocsp.pk]])
+        self.assertEqual([call[1]['reason'] for call in pre.call_args_list], ['superseded', 'superseded'])
+        self.assertEqual([[c.pk for c in call[1]['certs']] for call in post.call_args_list],
+                         [[self.cert.pk, self.cert3.pk], [self.ocsp.pk]])
+
+        for cert in [self.cert, self.cert3, self.ocsp]:
+            self.assertRevoked(cert, 'superseded')
+        self.assertRevoked(self.cert2, 'keyCompromise')
+        self.assertNotRevoked(self.cert_all)
+        self.assertEqual(OutboxEvent.objects.filter(event='post_revoke_cert').count(), 4)
+
+        self.assertIsNone(cache.get(ocsp_key))
+        self.assertIsNone(cache.get(crl_key))
+
+        # Nothing is revoked a second time
+        self.assertEqual(qs.bulk_revoke(), 0)
+
+    def test_bulk_revoke_queries(self):
+        # Number of queries does not depend on the number of certificates
+        qs = Certificate.objects.all()
+        count = qs.count()
+        # pks, CAs, (select, update) for two chunks and the savepoint of the transaction
+        with self.assertNumQueries(8):
+            self.assertEqual(qs.bulk_revoke(chunk_size=count - 1), count)
@@ -0,0 +1,543 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of django-ca (https://github.com/mathiasertl/django-ca).
+#
+# django-ca is free software: you can redistribute it and/or modify it under the terms of the GNU
+# General Public License as published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# django-ca is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without
+# even the implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with django-ca.  If not,
+# see <http://www.gnu.org/licenses/>.
+
+import json
+import os
+import shutil
+import socket
+import subprocess
+import tempfile
+import threading
+import unittest
+from datetime import datetime
+
+from freezegun import freeze_time
+
+from cryptography import x509
+from cryptography.hazmat.backends import default_backend
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.asymmetric import dsa
+from cryptography.hazmat.primitives.asymmetric import ec
+from cryptography.hazmat.primitives.asymmetric import padding
+from cryptography.hazmat.primitives.serialization import Encoding
+from cryptography.hazmat.primitives.serialization import NoEncryption
+from cryptography.hazmat.primitives.serialization import PrivateFormat
+from cryptography.hazmat.primitives.serialization import load_pem_private_key
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.test import TestCase
+
+from .. import ca_settings
+from ..crl import get_crl
+from ..models import Certificate
+from ..models import CertificateAuthority
+from ..ocsp import get_signed_response
+from ..ocsp import sign_response_data
+from ..signing import PKCS11Backend
+from ..signing import PKCS11Key
+from ..signing import RemoteKey
+from ..signing import SessionPool
+from ..signing import SigningBackend
+from ..signing import SigningKey
+from ..signing import SigningRequestHandler
+from ..signing import SocketBackend
+from ..signing import get_key_paths
+from ..signing import get_placeholder_key
+from ..signing import get_signing_backend
+from ..signing import sign_data
+from ..subject import Subject
+from ..utils import read_file
+from .base import DjangoCAWithCSRTestCase
+from .base import child_pubkey
+from .base import ecc_ca_key
+from .base import override_settings
+from .base import override_tmpcadir
+from .base import root_key
+
+try:
+    import unittest.mock as mock
+except ImportError:
+    import mock
+
+try:
+    import pkcs11
+    from pkcs11.util.ec import decode_ec_private_key
+    from pkcs11.util.rsa import decode_rsa_private_key
+except ImportError:
+    pkcs11 = None
+
+SOFTHSM2_LIB = os.environ.get('SOFTHSM2_LIB')
+
+
+@override_settings(CA_PROFILES={}, CA_DEFAULT_SUBJECT={})
+@freeze_time('2019-02-03 15:43:12')
+class SigningDaemonTestCase(DjangoCAWithCSRTestCase):
+    def assertSignedBy(self, ca, cert):
+        # assertSignature() cannot be used, as OpenSSL ignores freeze_time() and the CAs are expired
+        ca.x509.public_key().verify(cert.x509.signature, cert.x509.tbs_certificate_bytes, padding.PKCS1v15(),
+                                    cert.x509.signature_hash_algorithm)
+
+    def assertNoLocalKey(self):
+        return mock.patch.object(CertificateAuthority, 'key', side_effect=Exception('loaded locally'))
+
+    @override_tmpcadir()
+    def test_sign_cert(self):
+        with self.signing_daemon() as server, self.assertNoLocalKey():
+            self.assertIsInstance(self.ca.signing_key(None), RemoteKey)
+            cert = Certificate.objects.init(self.ca, self.csr_pem, expires=self.expires(720),
+                                            subject='/CN=example.com')
+
+            # the key is loaded only once
+            Certificate.objects.init(self.ca, self.csr_pem, expires=self.expires(720),
+                                     subject='/CN=example.net')
+            self.assertEqual(list(server.keys), [(self.ca.private_key_path, None)])
+
+        self.assertSignedBy(self.ca, cert)
+        self.assertEqual(cert.subject, Subject('/CN=example.com'))
+
+    @override_tmpcadir()
+    def test_bulk_init(self):
+        csrs = [self.create_csr('/CN=host%s.example.com' % i)[1].public_bytes(Encoding.PEM).decode('utf-8')
+                for i in range(3)]
+
+        with self.signing_daemon(workers=2), self.assertNoLocalKey():
+            certs = Certificate.objects.bulk_init(self.ca, csrs, jobs=2, expires=self.expires(720))
+
+        self.assertEqual(len(certs), 3)
+        for cert in certs:
+            self.assertSignedBy(self.ca, cert)
+
+    @override_tmpcadir()
+    def test_password(self):
+        with self.signing_daemon() as server, self.assertNoLocalKey():
+            cert = Certificate.objects.init(self.pwd_ca, self.csr_pem, expires=self.expires(720),
+                                            subject='/CN=example.com', password=b'test_password',
+                                            algorithm='SHA256')
+            self.assertSignedBy(self.pwd_ca, cert)
+
+            with self.assertRaisesRegex(ValueError, r'^pwd_ca\.key: Bad decrypt'):
+                Certificate.objects.init(self.pwd_ca, self.csr_pem, expires=self.expires(720),
+                                         subject='/CN=example.com', password=b'wrong', algorithm='SHA256')
+            self.assertEqual(list(server.keys), [(self.pwd_ca.private_key_path, b'test_password')])
+
+    @override_tmpcadir()
+    def test_intermediate_ca(self):
+        with self.signing_daemon(), self.assertNoLocalKey():
+            child = CertificateAuthority.objects.init(
+                name='child', subject='/CN=child.example.com', parent=self.ecc_ca, key_size=1024,
+                expires=self.expires(720))
+
+        self.assertIsInstance(child.x509.signature_hash_algorithm, hashes.SHA512)
+        self.ecc_ca.x509.public_key().verify(
+            child.x509.signature, child.x509.tbs_certificate_bytes,
+            ec.ECDSA(child.x509.signature_hash_algorithm))
+
+    @override_tmpcadir()
+    def test_crl(self):
+        with self.signing_daemon(), self.assertNoLocalKey():
+            data = get_crl(self.ca, encoding=Encoding.DER, expires=600, algorithm=hashes.SHA256(),
+                           password=None)
+        crl = x509.load_der_x509_crl(data, default_backend())
+        self.assertTrue(crl.is_signature_valid(self.ca.x509.public_key()))
+
+    @override_tmpcadir()
+    def test_sign_data(self):
+        with self.signing_daemon():
+            key = self.ca.signing_key(None)
+            signature = sign_data(key, b'foobar', hashes.SHA256())
+        self.ca.x509.public_key().verify(signature, b'foobar', padding.PKCS1v15(), hashes.SHA256())
+
+    @override_tmpcadir()
+    def test_errors(self):
+        with self.signing_daemon() as server:
+            key = RemoteKey('does-not-exist.key', self.ca.x509.public_key())
+            with self.assertRaisesRegex(ValueError, r'^does-not-exist\.key: '):
+                key.sign(b'foobar', hashes.SHA256())
+
+            self.assertEqual(server.process(b'no json'), {'error': mock.ANY})
+            response = server.process(json.dumps({
+                'path': self.ca.private_key_path, 'algorithm': 'wrong', 'data': '',
+            }).encode('utf-8'))
+            self.assertEqual(response, {'error': 'Unknown hash algorithm: wrong'})
+            self.assertEqual(server.process(b'{}'), {'error': "'path'"})
+
+            # The daemon only opens private keys of certificate authorities and OCSP views
+            response = server.process(json.dumps({
+                'path': '/etc/shadow', 'password': None, 'algorithm': 'SHA256', 'data': '',
+            }).encode('utf-8'))
+            self.assertEqual(response, {
+                'error': '/etc/shadow: Not a private key of a certificate authority or OCSP view.'})
+            self.assertNotIn(('/etc/shadow', None), server.keys)
+
+            # The daemon closes the connection after reading the request, or without reading it (which resets
+            # the connection), or because of an error
+            key = self.ca.signing_key(None)
+            msg = r'^%s: Signing daemon closed the connection\.$' % self.ca.private_key_path
+            with mock.patch.object(SigningRequestHandler, 'handle', lambda h: h.rfile.readline()), \
+                    self.assertRaisesRegex(ValueError, msg):
+                key.sign(b'foobar', hashes.SHA256())
+            with mock.patch.object(SigningRequestHandler, 'handle',
+                                   lambda h: h.connection.recv(1, socket.MSG_PEEK)), \
+                    self.assertRaisesRegex(ValueError, msg):
+                key.sign(b'foobar', hashes.SHA256())
+            with mock.patch.object(SigningRequestHandler, 'handle', side_effect=Exception('error')), \
+                    mock.patch.object(type(server), 'handle_error') as handle_error, \
+                    self.assertRaisesRegex(ValueError, msg):
+                key.sign(b'foobar', hashes.SHA256())
+            handle_error.assert_called_once_with(mock.ANY, mock.ANY)
+
+    @override_tmpcadir()
+    def test_queue_full(self):
+        with self.signing_daemon(workers=1, queue_size=0) as server:
+            # A connection that does not send a request blocks the only worker
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.connect(server.server_address)
+            try:
+                with self.assertRaisesRegex(ValueError, r': Too many pending requests\.$'), \
+                        self.assertLogs('django_ca.signing', 'WARNING') as logs:
+                    self.ca.signing_key(None).sign(b'foobar', hashes.SHA256())
+            finally:
+                sock.close()
+        self.assertEqual(logs.output, [
+            'WARNING:django_ca.signing:Rejecting connection: Too many pending requests.',
+        ])
+
+        # Requests are read before the connection is closed, so the client receives the error
+        server_sock, client_sock = socket.socketpair(socket.AF_UNIX, socket.SOCK_STREAM)
+        client_sock.sendall(b'{}\n')
+        server.reject_request(server_sock)
+        self.assertEqual(client_sock.recv(4096), b'{"error": "Too many pending requests."}\n')
+        client_sock.close()
+
+        server_sock, client_sock = socket.socketpair(socket.AF_UNIX, socket.SOCK_STREAM)
+        client_sock.shutdown(socket.SHUT_WR)
+        server.reject_request(server_sock)
+        self.assertEqual(client_sock.recv(4096), b'{"error": "Too many pending requests."}\n')
+        client_sock.close()
+
+        request = mock.Mock(**{'sendall.side_effect': socket.error('broken pipe')})
+        with self.assertLogs('django_ca.signing', 'WARNING') as logs:
+            server.reject_request(request)
+        request.close.assert_called_once_with()
+        self.assertEqual(logs.output, [
+            'WARNING:django_ca.signing:Could not reject connection: broken pipe',
+        ])
+
+    def test_server_close(self):
+        with self.signing_daemon() as server:
+            os.remove(server.server_address)
+        self.assertFalse(os.path.exists(server.server_address))
+
+    @override_settings(CA_OCSP_URLS={'foo': {'responder_key': 'foo.key'}, 'bar': {}})
+    def test_get_key_paths(self):
+        ca_paths = set(CertificateAuthority.objects.values_list('private_key_path', flat=True))
+        self.assertEqual(len(ca_paths), len(self.cas))
+
+        # OCSP views are found in included URL configurations
+        self.assertEqual(get_key_paths(), ca_paths | {'foo.key', settings.OCSP_KEY_PATH})
+
+        with self.settings(ROOT_URLCONF='django_ca.tests.tests_views_ocsp'):
+            self.assertEqual(get_key_paths(), ca_paths | {
+                'foo.key', 'ocsp.key', '/false/foobar', settings.OCSP_KEY_PATH})
+
+    @override_tmpcadir()
+    def test_test_signing_key(self):
+        with self.signing_daemon():
+            self.assertTrue(self.pwd_ca.key_exists)
+            self.pwd_ca.test_signing_key(b'test_password')
+            with self.assertRaisesRegex(ValueError, r'^pwd_ca\.key: Bad decrypt'):
+                self.pwd_ca.test_signing_key(b'wrong')
+
+
+class FileKey(SigningKey):
+    def __init__(self, path, public_key, private_key):
+        super(FileKey, self).__init__(path, public_key)
+        self.private_key = private_key
+
+    def sign(self, data, algorithm):
+        return sign_data(self.private_key, data, algorithm)
+
+
+class FileKeyBackend(SigningBackend):
+    """Backend that loads keys from file storage, used for testing the extension point."""
+
+    def __init__(self, prefix=''):
+        self.prefix = prefix
+
+    def get_key(self, path, public_key, password=None):
+        private_key = load_pem_private_key(read_file(path), password, default_backend())
+        return FileKey(self.prefix + path, public_key, private_key)
+
+    def key_exists(self, path):
+        return path.startswith(self.prefix)
+
+
+@override_settings(CA_PROFILES={}, CA_DEFAULT_SUBJECT={})
+@freeze_time('2019-02-03 15:43:12')
+class SigningBackendTestCase(DjangoCAWithCSRTestCase):
+    def test_get_signing_backend(self):
+        self.assertIsNone(get_signing_backend())
+
+        with self.settings(CA_SIGNING_SOCKET='/run/django-ca.sock'):
+            backend = get_signing_backend()
+            self.assertIsInstance(backend, SocketBackend)
+            self.assertIs(get_signing_backend(), backend)
+            self.assertEqual(backend.get_key('foo.key', None).socket_path, '/run/django-ca.sock')
+
+        path = 'django_ca.tests.tests_signing.FileKeyBackend'
+        with self.settings(CA_SIGNING_BACKEND=path):
+            backend = get_signing_backend()
+            self.assertIsInstance(backend, FileKeyBackend)
+            self.assertIs(get_signing_backend(), backend)
+
+        # backend is created again if arguments change
+        with self.settings(CA_SIGNING_BACKEND=path, CA_SIGNING_BACKEND_KWARGS={'prefix': 'foo'}):
+            self.assertIsNot(get_signing_backend(), backend)
+            self.assertEqual(get_signing_backend().prefix, 'foo')
+
+        with self.settings(CA_SIGNING_BACKEND='django_ca.tests.tests_signing.WrongBackend'), \
+                self.assertRaises(ImportError):
+            get_signing_backend()
+
+    @override_tmpcadir(CA_SIGNING_BACKEND='django_ca.tests.tests_signing.FileKeyBackend',
+                       CA_SIGNING_BACKEND_KWARGS={'prefix': 'file:'})
+    def test_custom_backend(self):
+        with mock.patch.object(CertificateAuthority, 'key', side_effect=Exception('loaded locally')):
+            key = self.ca.signing_key(None)
+            self.assertIsInstance(key, FileKey)
+            self.assertEqual(repr(key), '<FileKey: file:%s>' % self.ca.private_key_path)
+
+            cert = Certificate.objects.init(self.ca, self.csr_pem, expires=self.expires(720),
+                                            subject='/CN=example.com')
+            self.assertFalse(self.ca.key_exists)
+
+        self.ca.x509.public_key().verify(cert.x509.signature, cert.x509.tbs_certificate_bytes,
+                                         padding.PKCS1v15(), cert.x509.signature_hash_algorithm)
+
+    @unittest.skipUnless(ca_settings.CRYPTOGRAPHY_OCSP, 'Skip cryptography test for cryptography<2.4')
+    def test_ocsp_response(self):
+        from cryptography.x509 import ocsp
+
+        revocation_time = datetime(2019, 2, 1, 12, 30)
+        request = ocsp.OCSPRequestBuilder().add_certificate(child_pubkey, self.ca.x509, hashes.SHA1()).build()
+        dsa_key = dsa.generate_private_key(key_size=1024, backend=default_backend())
+
+        for private_key, signature_algorithm in [(ecc_ca_key, ec.ECDSA(hashes.SHA256())), (dsa_key, None)]:
+            key = FileKey('file.key', private_key.public_key(), private_key)
+            data = get_signed_response(child_pubkey.serial_number, self.ca.x509.public_bytes(Encoding.DER),
+                                       self.ca.x509.public_bytes(Encoding.DER), 600,
+                                       lambda data: sign_response_data(key, data),
+                                       revocation_time=revocation_time)
+            response = ocsp.load_der_ocsp_response(data)
+
+            self.assertEqual(response.serial_number, child_pubkey.serial_number)
+            self.assertEqual(response.issuer_name_hash, request.issuer_name_hash)
+            self.assertEqual(response.issuer_key_hash, request.issuer_key_hash)
+            self.assertEqual(response.certificate_status, ocsp.OCSPCertStatus.REVOKED)
+            self.assertEqual(response.revocation_time, revocation_time)
+            self.assertIsNone(response.revocation_reason)
+            self.assertIsInstance(response.signature_hash_algorithm, hashes.SHA256)
+
+            args = [signature_algorithm] if signature_algorithm else [hashes.SHA256()]
+            private_key.public_key().verify(response.signature, response.tbs_response_bytes, *args)
+
+    @override_tmpcadir()
+    def test_key_exists(self):
+        backend = SocketBackend()
+        self.assertTrue(backend.key_exists(self.ca.private_key_path))
+        self.assertTrue(backend.key_exists(os.path.join(ca_settings.CA_DIR, self.ca.private_key_path)))
+        self.assertFalse(backend.key_exists(os.path.join(ca_settings.CA_DIR, 'does-not-exist.key')))
+
+    def test_unsupported_key(self):
+        with self.assertRaisesRegex(ValueError, r'^Unsupported private key type: '):
+            sign_data(object(), b'foobar', hashes.SHA256())
+        with self.assertRaisesRegex(ValueError, r'^Unsupported public key type: '):
+            get_placeholder_key(object())
+
+        dsa_key = dsa.generate_private_key(key_size=1024, backend=default_backend())
+        placeholder = get_placeholder_key(dsa_key.public_key())
+        self.assertIsInstance(placeholder, dsa.DSAPrivateKey)
+        self.assertIs(get_placeholder_key(dsa_key.public_key()), placeholder)
+
+    def test_abstract(self):
+        with self.assertRaises(NotImplementedError):
+            SigningBackend().get_key('foo.key', None)
+        with self.assertRaises(NotImplementedError):
+            SigningKey('foo.key', None).sign(b'', hashes.SHA256())
+
+
+class SessionPoolTestCase(TestCase):
+    def test_basic(self):
+        created = []
+
+        def create():
+            created.append(object())
+            return created[-1]
+
+        pool = SessionPool(create, size=2)
+        with pool.session() as session1:
+            with pool.session() as session2:
+                self.assertEqual(created, [session1, session2])
+
+        # sessions are reused
+        with pool.session() as session:
+            self.assertIn(session, created)
+        self.assertEqual(len(created), 2)
+
+    def test_blocking(self):
+        created = []
+        pool = SessionPool(lambda: created.append(object()) or created[-1], size=1)
+        used = []
+
+        def work():
+            with pool.session() as session:
+                used.append(session)
+
+        with pool.session():
+            thread = threading.Thread(target=work)
+            thread.start()
+            thread.join(0.1)
+            self.assertTrue(thread.is_alive())  # waits for the session to be returned
+
+        thread.join()
+        self.assertEqual(used, created)
+        self.assertEqual(len(created), 1)
+
+    def test_create_fails(self):
+        pool = SessionPool(mock.Mock(side_effect=[Exception('failed'), 'session']), size=1)
+        with self.assertRaisesRegex(Exception, '^failed$'):
+            with pool.session():
+                pass
+
+        with pool.session() as session:
+            self.assertEqual(session, 'session')
+
+
+class PKCS11SessionTestCase(TestCase):
+    def test_login_once(self):
+        lib = mock.MagicMock()
+        token = lib.lib.return_value.get_token.return_value
+        token.open.side_effect = lambda **kwargs: object()
+
+        with mock.patch.dict('sys.modules', {'pkcs11': lib}):
+            backend = PKCS11Backend(lib='libsofthsm2.so', token='django-ca', pin='1234', sessions=3)
+        lib.lib.assert_called_once_with('libsofthsm2.so')
+        lib.lib.return_value.get_token.assert_called_once_with(token_label='django-ca')
+
+        with backend.pool.session() as session1, backend.pool.session() as session2, \
+                backend.pool.session() as session3:
+            pass
+
+        # Only the first session logs in, it is kept for the lifetime of the backend
+        self.assertEqual(token.open.call_args_list, [mock.call(user_pin='1234'), mock.call(), mock.call()])
+        self.assertIs(backend.login_session, session1)
+        self.assertEqual(len(set([id(session1), id(session2), id(session3)])), 3)
+
+    def test_missing_library(self):
+        with mock.patch.dict('sys.modules', {'pkcs11': None}), \
+                self.assertRaisesRegex(ImproperlyConfigured, r'^PKCS11Backend requires python-pkcs11\.$'):
+            PKCS11Backend(lib='libsofthsm2.so', token='django-ca', pin='1234')
+
+
+@unittest.skipUnless(pkcs11 is not None and SOFTHSM2_LIB,
+                     'Set SOFTHSM2_LIB and install python-pkcs11 and SoftHSM to test PKCS #11.')
+@override_settings(CA_PROFILES={}, CA_DEFAULT_SUBJECT={})
+@freeze_time('2019-02-03 15:43:12')
+class PKCS11BackendTestCase(DjangoCAWithCSRTestCase):
+    """Test the PKCS #11 backend against SoftHSM.
+
+    Set the SOFTHSM2_LIB environment variable to the path of ``libsofthsm2.so`` to run these tests.
+    """
+
+    pin = '1234'
+
+    @classmethod
+    def setUpClass(cls):
+        super(PKCS11BackendTestCase, cls).setUpClass()
+
+        # SoftHSM reads its configuration only once per process, so the token is created once
+        cls.tmpdir = tempfile.mkdtemp()
+        config = os.path.join(cls.tmpdir, 'softhsm2.conf')
+        with open(config, 'w') as stream:
+            stream.write('directories.tokendir = %s\n' % cls.tmpdir)
+        os.environ['SOFTHSM2_CONF'] = config
+
+        with open(os.devnull, 'w') as devnull:
+            subprocess.check_call(['softhsm2-util', '--init-token', '--free', '--label', 'django-ca',
+                                   '--pin', cls.pin, '--so-pin', '5678'], stdout=devnull)
+
+        # Import CA keys with the private_key_path used by load_ca() as label
+        token = pkcs11.lib(SOFTHSM2_LIB).get_token(token_label='django-ca')
+        with token.open(rw=True, user_pin=cls.pin) as session:
+            for label, key in [('root.key', root_key), ('ecc_ca.key', ecc_ca_key)]:
+                der = key.private_bytes(Encoding.DER, PrivateFormat.TraditionalOpenSSL, NoEncryption())
+                if isinstance(key, ec.EllipticCurvePrivateKey):
+                    attrs = decode_ec_private_key(der)
+                else:
+                    attrs = decode_rsa_private_key(der)
+                attrs[pkcs11.Attribute.LABEL] = label
+                attrs[pkcs11.Attribute.TOKEN] = True
+                session.create_object(attrs)
+
+        cls.backend = override_settings(
+            CA_SIGNING_BACKEND='django_ca.signing.PKCS11Backend',
+            CA_SIGNING_BACKEND_KWARGS={'lib': SOFTHSM2_LIB, 'token': 'django-ca', 'pin': cls.pin,
+                                       'sessions': 2})
+        cls.backend.enable()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.backend.disable()
+        shutil.rmtree(cls.tmpdir)
+        super(PKCS11BackendTestCase, cls).tearDownClass()
+
+    def test_sign_cert(self):
+        self.assertTrue(self.ca.key_exists)
+        self.assertFalse(self.pwd_ca.key_exists)
+
+        with mock.patch.object(CertificateAuthority, 'key', side_effect=Exception('loaded locally')):
+            self.assertIsInstance(self.ca.signing_key(None), PKCS11Key)
+            cert = Certificate.objects.init(self.ca, self.csr_pem, expires=self.expires(720),
+                                            subject='/CN=example.com')
+        self.ca.x509.public_key().verify(cert.x509.signature, cert.x509.tbs_certificate_bytes,
+                                         padding.PKCS1v15(), cert.x509.signature_hash_algorithm)
+
+    def test_ecc(self):
+        with mock.patch.object(CertificateAuthority, 'key', side_effect=Exception('loaded locally')):
+            child = CertificateAuthority.objects.init(
+                name='child', subject='/CN=child.example.com', parent=self.ecc_ca, key_size=1024,
+                expires=self.expires(720))
+        self.ecc_ca.x509.public_key().verify(
+            child.x509.signature, child.x509.tbs_certificate_bytes,
+            ec.ECDSA(child.x509.signature_hash_algorithm))
+
+    def test_concurrent(self):
+        csrs = [self.create_csr('/CN=host%s.example.com' % i)[1].public_bytes(Encoding.PEM).decode('utf-8')
+                for i in range(10)]
+        certs = Certificate.objects.bulk_init(self.ca, csrs, jobs=4, expires=self.expires(720))
+        self.assertEqual(len(certs), 10)
+        self.assertLessEqual(get_signing_backend().pool.created, 2)
+
+        # sessions other than the first one use the login of the first session
+        backend = get_signing_backend()
+        with backend.pool.session() as session1, backend.pool.session() as session2:
+            self.assertIsNot(session1, session2)
+            for session in [session1, session2]:
+                backend.get_session_key(session, self.ca.private_key_path)
+
+        for cert in certs:
+            self.ca.x509.public_key().verify(cert.x509.signature, cert.x509.tbs_certificate_bytes,
+                                             padding.PKCS1v15(), cert.x509.signature_hash_algorithm)
@@ -48,6 +48,7 @@ from ..extensions import TLSFeature
 from ..profiles import get_cert_profile_kwargs
 from ..utils import NAME_RE
 from ..utils import LazyEncoder
+from ..utils import LRUCache
 from ..utils import format_general_name
 from ..utils import format_name
 from ..utils import get_cert_builder
@@ -59,11 +60,17 @@ from ..utils import parse_key_curve
 from ..utils import parse_name
 from ..utils import read_file
 from ..utils import validate_email
+from ..utils import write_file_atomic
 from .base import DjangoCATestCase
 from .base import cryptography_version
 from .base import override_settings
 from .base import override_tmpcadir
 
+try:
+    import unittest.mock as mock
+except ImportError:
+    import mock
+
 if six.PY2:  # pragma: only py2
     from ..utils import PermissionError
     from ..utils import FileNotFoundError
@@ -181,6 +188,32 @@ class LazyEncoderTestCase(TestCase):
                          json.dumps({'a': datetime(2016, 3, 26)}, cls=LazyEncoder))
 
 
+class LRUCacheTestCase(TestCase):
+    def test_basic(self):
+        cache = LRUCache(2)
+        self.assertIsNone(cache.get('a'))
+        cache.set('a', 1)
+        cache.set('b', 2)
+        self.assertEqual(cache.get('a'), 1)
+
+        # 'b' is now the least recently used item and discarded first
+        cache.set('c', 3)
+        self.assertEqual(len(cache), 2)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('a'), 1)
+        self.assertEqual(cache.get('c'), 3)
+        self.assertEqual((cache.hits, cache.misses), (3, 2))
+
+        cache.clear()
+        self.assertEqual((len(cache), cache.hits, cache.misses), (0, 0, 0))
+
+    def test_disabled(self):
+        cache = LRUCache(0)
+        cache.set('a', 1)
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual(len(cache), 0)
+
+
 class ReadFileTestCase(DjangoCATestCase):
     @override_tmpcadir()
     def test_basic(self):
@@ -225,6 +258,37 @@ class ReadFileTestCase(DjangoCATestCase):
             os.chmod(path, 0o600)  # make sure we can delete CA_DIR
 
 
+class WriteFileAtomicTestCase(DjangoCATestCase):
+    @override_tmpcadir()
+    def test_basic(self):
+        directory = os.path.join(ca_settings.CA_DIR, 'atomic')
+        os.makedirs(directory)
+        path = os.path.join(directory, 'test-data')
+        write_file_atomic(path, b'test data')
+        write_file_atomic(path, b'new data')
+
+        with open(path, 'rb') as stream:
+            self.assertEqual(stream.read(), b'new data')
+        self.assertEqual(os.stat(path).st_mode & 0o777, 0o644)
+        self.assertEqual(os.listdir(directory), ['test-data'])
+
+    @override_tmpcadir()
+    def test_error(self):
+        directory = os.path.join(ca_settings.CA_DIR, 'atomic')
+        os.makedirs(directory)
+        path = os.path.join(directory, 'test-data')
+        write_file_atomic(path, b'test data')
+
+        with mock.patch('os.rename', side_effect=OSError('rename failed')), \
+                self.assertRaisesRegex(OSError, r'^rename failed$'):
+            write_file_atomic(path, b'new data')
+
+        # The temporary file is removed and the old file is untouched
+        self.assertEqual(os.listdir(directory), ['test-data'])
+        with open(path, 'rb') as stream:
+            self.assertEqual(stream.read(), b'test data')
+
+
 class ParseNameTestCase(DjangoCATestCase):
     def assertSubject(self, actual, expected):
         self.assertEqual(parse_name(actual), expected)
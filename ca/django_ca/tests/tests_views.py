@@ -13,6 +13,10 @@
 # You should have received a copy of the GNU General Public License along with django-ca.  If not,
 # see <http://www.gnu.org/licenses/>.
 
+from datetime import timedelta
+
+from freezegun import freeze_time
+
 from cryptography import x509
 from cryptography.hazmat.backends import default_backend
 from cryptography.hazmat.primitives import hashes
@@ -23,12 +27,19 @@ from django.core.cache import cache
 from django.test import Client
 from django.urls import reverse
 
+from ..crl import get_cached_crl
+from ..crl import get_crl_cache_key
 from ..models import Certificate
 from ..views import CertificateRevocationListView
 from .base import DjangoCAWithCertTestCase
 from .base import override_settings
 from .base import override_tmpcadir
 
+try:
+    import unittest.mock as mock
+except ImportError:
+    import mock
+
 urlpatterns = [
     url(r'^crl/(?P<serial>[0-9A-F:]+)/$', CertificateRevocationListView.as_view(),
         name='default'),
@@ -43,6 +54,10 @@ urlpatterns = [
     url(r'^crl/ca/(?P<serial>[0-9A-F:]+)/$', CertificateRevocationListView.as_view(
         ca_crl=True, type=Encoding.PEM
     ), name='ca_crl'),
+    url(r'^crl/delta/(?P<serial>[0-9A-F:]+)/$', CertificateRevocationListView.as_view(delta=True),
+        name='delta'),
+    url(r'^crl/pem/(?P<serial>[0-9A-F:]+)/$', CertificateRevocationListView.as_view(type=Encoding.PEM),
+        name='pem'),
 ]
 
 
@@ -141,3 +156,91 @@ class GenericCRLViewTests(DjangoCAWithCertTestCase):
     @override_settings(USE_TZ=True)
     def test_overwrite_with_use_tz(self):
         self.test_overwrite()
+
+    @override_tmpcadir()
+    def test_delta(self):
+        self.client.get(reverse('default', kwargs={'serial': self.ca.serial}))
+        response = self.client.get(reverse('delta', kwargs={'serial': self.ca.serial}))
+        self.assertEqual(response.status_code, 200)
+
+        crl = x509.load_der_x509_crl(response.content, default_backend())
+        self.assertEqual(list(crl), [])
+        self.assertEqual(crl.extensions.get_extension_for_class(x509.CRLNumber).value, x509.CRLNumber(2))
+        self.assertEqual(crl.extensions.get_extension_for_class(x509.DeltaCRLIndicator).value,
+                         x509.DeltaCRLIndicator(1))
+
+    @override_tmpcadir()
+    def test_delta_without_full_crl(self):
+        # A full CRL is generated first, the delta CRL refers to it
+        response = self.client.get(reverse('delta', kwargs={'serial': self.ca.serial}))
+        self.assertEqual(response.status_code, 200)
+        crl = x509.load_der_x509_crl(response.content, default_backend())
+        self.assertEqual(crl.extensions.get_extension_for_class(x509.CRLNumber).value, x509.CRLNumber(2))
+        self.assertEqual(crl.extensions.get_extension_for_class(x509.DeltaCRLIndicator).value,
+                         x509.DeltaCRLIndicator(1))
+
+        # ... and is served by the view for the full CRL
+        response = self.client.get(reverse('default', kwargs={'serial': self.ca.serial}))
+        self.assertEqual(response.status_code, 200)
+        crl = x509.load_der_x509_crl(response.content, default_backend())
+        self.assertEqual(crl.extensions.get_extension_for_class(x509.CRLNumber).value, x509.CRLNumber(1))
+
+    @override_tmpcadir()
+    def test_encodings(self):
+        # Views for different encodings serve the same CRL
+        der = self.client.get(reverse('default', kwargs={'serial': self.ca.serial})).content
+        pem = self.client.get(reverse('pem', kwargs={'serial': self.ca.serial})).content
+        self.assertEqual(x509.load_pem_x509_crl(pem, default_backend()).public_bytes(Encoding.DER), der)
+
+        # The CRL is cached only as long as it is valid
+        cache_key = get_crl_cache_key(self.ca.serial, Encoding.PEM, hashes.SHA512())
+        with mock.patch('django_ca.views.cache_crl') as cache_crl, \
+                mock.patch('django_ca.crl.datetime') as dt:
+            dt.utcnow.return_value = x509.load_der_x509_crl(der, default_backend()).last_update + \
+                timedelta(seconds=100)
+            cache.clear()
+            self.client.get(reverse('pem', kwargs={'serial': self.ca.serial}))
+        cache_crl.assert_called_once_with(cache_key, pem, 500, 60)
+
+    @override_tmpcadir()
+    def test_stale(self):
+        def get_crl_number(response):
+            self.assertEqual(response.status_code, 200)
+            crl = x509.load_der_x509_crl(response.content, default_backend())
+            return crl.extensions.get_extension_for_class(x509.CRLNumber).value.crl_number
+
+        url = reverse('default', kwargs={'serial': self.ca.serial})
+        cache_key = get_crl_cache_key(self.ca.serial, Encoding.DER, hashes.SHA512())
+        lock_key = '%s_lock' % cache_key
+
+        with freeze_time('2019-02-03 15:43:12') as frozen:
+            self.assertEqual(get_crl_number(self.client.get(url)), 1)
+
+            # 30 seconds before the CRL expires, it is stale but still in the cache
+            frozen.tick(timedelta(seconds=570))
+            self.assertTrue(get_cached_crl(cache_key)[1])
+
+            # Another request already generates a new CRL, so we get the previous one
+            cache.add(lock_key, True)
+            with mock.patch('django_ca.views.get_crl', side_effect=Exception('CRL generated')):
+                self.assertEqual(get_crl_number(self.client.get(url)), 1)
+            cache.delete(lock_key)
+
+            # No other request generates a new CRL, so we do
+            self.assertEqual(get_crl_number(self.client.get(url)), 2)
+            self.assertIsNone(cache.get(lock_key))
+            self.assertFalse(get_cached_crl(cache_key)[1])
+            self.assertEqual(get_crl_number(self.client.get(url)), 2)
+
+    @override_tmpcadir()
+    def test_old_cache_value(self):
+        # Previous versions cached only the CRL itself
+        cache_key = get_crl_cache_key(self.ca.serial, Encoding.DER, hashes.SHA512())
+        cache.set(cache_key, b'old-crl')
+        self.assertIsNone(get_cached_crl(cache_key))
+
+        response = self.client.get(reverse('default', kwargs={'serial': self.ca.serial}))
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.content, b'old-crl')
+        x509.load_der_x509_crl(response.content, default_backend())
+        self.assertFalse(get_cached_crl(cache_key)[1])
@@ -15,6 +15,7 @@
 
 import base64
 import os
+import time
 import unittest
 from datetime import timedelta
 
@@ -28,19 +29,24 @@ from cryptography import x509
 from cryptography.hazmat.backends import default_backend
 from cryptography.hazmat.primitives import hashes
 from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import padding
 from cryptography.hazmat.primitives.serialization import Encoding
 from oscrypto import asymmetric
 
 from django.conf import settings
 from django.conf.urls import url
+from django.core.cache import cache
 from django.test import Client
 from django.urls import reverse
 from django.utils.encoding import force_text
 
 from .. import ca_settings
 from ..models import Certificate
+from ..ocsp import get_ocsp_cache_key
 from ..subject import Subject
+from ..utils import ca_storage
 from ..utils import int_to_hex
+from ..utils import read_file
 from ..views import OCSPView
 from .base import DjangoCAWithCertTestCase
 from .base import certs
@@ -113,6 +119,21 @@ urlpatterns = [
         responder_cert=settings.OCSP_PEM_PATH,
     ), name='get'),
 
+    url(r'^ocsp/cached/(?P<data>[a-zA-Z0-9=+/]+)$', OCSPView.as_view(
+        ca=certs['root']['serial'],
+        responder_key=settings.OCSP_KEY_PATH,
+        responder_cert=settings.OCSP_PEM_PATH,
+        expires=1200,
+        cache_expires=300,
+    ), name='get-cached'),
+    url(r'^ocsp/cached-other/(?P<data>[a-zA-Z0-9=+/]+)$', OCSPView.as_view(
+        ca=certs['root']['serial'],
+        responder_key=settings.OCSP_KEY_PATH,
+        responder_cert=settings.OCSP_PEM_PATH,
+        expires=600,
+        cache_expires=300,
+    ), name='get-cached-other'),
+
     url(r'^ocsp/ca/(?P<data>[a-zA-Z0-9=+/]+)$', OCSPView.as_view(
         ca=certs['root']['serial'],
         responder_key=settings.OCSP_KEY_PATH,
@@ -387,6 +408,47 @@ class OCSPTestView(OCSPViewTestMixin, DjangoCAWithCertTestCase):
     def test_post_with_use_tz(self):
         self.test_post()
 
+    def assertSignedResponse(self, response, nonce):
+        # assertOCSP() depends on how asn1crypto represents the status of valid certificates
+        self.assertEqual(response.status_code, 200)
+        ocsp_response = asn1crypto.ocsp.OCSPResponse.load(response.content)
+        self.assertEqual(ocsp_response['response_status'].native, 'successful')
+
+        basic_response = ocsp_response['response_bytes']['response'].parsed
+        response_data = basic_response['tbs_response_data']
+        self.assertEqual([(int_to_hex(r['cert_id']['serial_number'].native), r['cert_status'].name)
+                          for r in response_data['responses']], [(self.cert.serial, 'good')])
+        self.assertEqual(response_data['response_extensions'][0]['extn_value'].native, nonce)
+        self.ocsp.x509.public_key().verify(basic_response['signature'].native, response_data.dump(),
+                                           padding.PKCS1v15(), hashes.SHA256())
+
+    @unittest.skipUnless(ca_settings.CRYPTOGRAPHY_OCSP, 'Skip cryptography test for cryptography<2.4')
+    @override_tmpcadir()
+    def test_signing_daemon(self):
+        with self.signing_daemon() as server, \
+                mock.patch.object(OCSPView, 'load_responder_key', side_effect=Exception('loaded locally')):
+            response = self.client.post(reverse('post'), req1, content_type='application/ocsp-request')
+            self.assertSignedResponse(response, req1_nonce)
+
+            data = base64.b64encode(req1).decode('utf-8')
+            response = self.client.get(reverse('get', kwargs={'data': data}))
+            self.assertSignedResponse(response, req1_nonce)
+
+        self.assertEqual(sorted(server.keys), [(settings.OCSP_KEY_PATH, None), ('ocsp.key', None)])
+
+    @unittest.skipIf(ca_settings.CRYPTOGRAPHY_OCSP, 'Skip cryptography test for cryptography>=2.4')
+    @override_tmpcadir()
+    def test_signing_daemon_oscrypto(self):
+        with self.signing_daemon() as server, self.assertLogs() as logs:
+            response = self.client.post(reverse('post'), req1, content_type='application/ocsp-request')
+        self.assertEqual(response.status_code, 200)
+        ocsp_response = asn1crypto.ocsp.OCSPResponse.load(response.content)
+        self.assertEqual(ocsp_response['response_status'].native, 'internal_error')
+        self.assertEqual(logs.output, [
+            'ERROR:django_ca.views:CA_SIGNING_BACKEND requires cryptography>=2.4 for OCSP responses.',
+        ])
+        self.assertEqual(server.keys, {})
+
     @unittest.skipUnless(ca_settings.CRYPTOGRAPHY_OCSP, 'Skip cryptography test for cryptography<2.4')
     def test_loaded_cryptography_cert(self):
         response = self.client.post(reverse('post-loaded-cryptography'), req1,
@@ -437,6 +499,135 @@ class OCSPTestView(OCSPViewTestMixin, DjangoCAWithCertTestCase):
         self.assertEqual(response.status_code, 200)
         self.assertOCSP(response, requested=[self.cert], nonce=req1_nonce, expires=1200)
 
+    @override_tmpcadir()
+    def test_responder_cache(self):
+        def post():
+            response = self.client.post(reverse('post'), req1, content_type='application/ocsp-request')
+            self.assertEqual(response.status_code, 200)
+            ocsp_response = asn1crypto.ocsp.OCSPResponse.load(response.content)
+            self.assertEqual(ocsp_response['response_status'].native, 'successful')
+
+        post()
+
+        # responder key and certificate are not read again
+        with mock.patch('django_ca.views.read_file', side_effect=Exception('not cached')):
+            post()
+
+        # ... unless the file was modified
+        mtime = os.path.getmtime(ca_storage.path('ocsp.key')) + 10
+        os.utime(ca_storage.path('ocsp.key'), (mtime, mtime))
+        with mock.patch('django_ca.views.read_file', side_effect=read_file) as patched:
+            post()
+        patched.assert_called_once_with('ocsp.key')
+
+        # ... or the cached values have expired
+        with mock.patch('django_ca.views.time.time', return_value=mtime + 3600 * 2), \
+                mock.patch('django_ca.views.read_file', side_effect=read_file) as patched:
+            post()
+        self.assertEqual(patched.call_count, 2)
+
+    def _get_cached(self, cert, name='get-cached'):
+        builder = ocspbuilder.OCSPRequestBuilder(
+            certificate=asn1crypto.x509.Certificate.load(cert.x509.public_bytes(Encoding.DER)),
+            issuer=asn1crypto.x509.Certificate.load(cert.ca.x509.public_bytes(Encoding.DER))
+        )
+        builder.nonce = False
+        data = base64.b64encode(builder.build().dump()).decode('utf-8')
+
+        response = self.client.get(reverse(name, kwargs={'data': data}))
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def _get_cert_status(self, response):
+        ocsp_response = asn1crypto.ocsp.OCSPResponse.load(response.content)
+        self.assertEqual(ocsp_response['response_status'].native, 'successful')
+        tbs_response_data = ocsp_response['response_bytes']['response'].parsed['tbs_response_data']
+        return tbs_response_data['responses'][0]['cert_status'].name
+
+    def test_cached(self):
+        cache.clear()
+        cache_key = get_ocsp_cache_key(self.ca.serial, self.cert.serial)
+
+        response = self._get_cached(self.cert)
+        self.assertEqual(self._get_cert_status(response), 'good')
+        token = cache.get(cache_key)
+        self.assertIsNotNone(token)
+
+        # second response is served from the cache without loading the certificate
+        with mock.patch('django_ca.views.OCSPView.get_cert', side_effect=Exception('not cached')), \
+                mock.patch('django_ca.views.hashlib.sha256', side_effect=Exception('not cached')):
+            cached_response = self._get_cached(self.cert)
+        self.assertEqual(cached_response.content, response.content)
+        self.assertEqual(cache.get(cache_key), token)
+
+        # revoking the certificate invalidates the cache
+        Certificate.objects.get(pk=self.cert.pk).revoke()
+        self.assertIsNone(cache.get(cache_key))
+        response = self._get_cached(self.cert)
+        self.assertEqual(self._get_cert_status(response), 'revoked')
+
+    def test_cached_views(self):
+        cache.clear()
+        cache_key = get_ocsp_cache_key(self.ca.serial, self.cert.serial)
+        response = self._get_cached(self.cert)
+
+        # A view with a different configuration does not serve the response cached by the first view
+        other_response = self._get_cached(self.cert, name='get-cached-other')
+        self.assertNotEqual(other_response.content, response.content)
+        with mock.patch('django_ca.views.OCSPView.get_cert', side_effect=Exception('not cached')):
+            self.assertEqual(self._get_cached(self.cert).content, response.content)
+            self.assertEqual(self._get_cached(self.cert, name='get-cached-other').content,
+                             other_response.content)
+
+        # Responses are not served after they expire, even if the cache entry still exists
+        with mock.patch('django_ca.views.time.time', return_value=time.time() + 301), \
+                mock.patch('django_ca.views.OCSPView.get_cert', side_effect=Exception('not cached')) as get:
+            self._get_cached(self.cert)
+        get.assert_called_once_with(self.ca, self.cert.serial)
+
+        # Values cached by previous versions are ignored
+        cache.set(cache_key, {'foo': (b'old-response', time.time() + 300)})
+        with mock.patch('django_ca.views.OCSPView.get_cert', side_effect=Exception('not cached')) as get:
+            self._get_cached(self.cert)
+        get.assert_called_once_with(self.ca, self.cert.serial)
+        response = self._get_cached(self.cert)
+        other_response = self._get_cached(self.cert, name='get-cached-other')
+        with mock.patch('django_ca.views.OCSPView.get_cert', side_effect=Exception('not cached')):
+            self.assertEqual(self._get_cached(self.cert).content, response.content)
+            self.assertEqual(self._get_cached(self.cert, name='get-cached-other').content,
+                             other_response.content)
+
+        # revoking the certificate invalidates the responses of all views
+        Certificate.objects.get(pk=self.cert.pk).revoke()
+        self.assertIsNone(cache.get(cache_key))
+        self.assertEqual(self._get_cert_status(self._get_cached(self.cert)), 'revoked')
+        self.assertEqual(self._get_cert_status(self._get_cached(self.cert, name='get-cached-other')),
+                         'revoked')
+
+    @unittest.skipUnless(ca_settings.CRYPTOGRAPHY_OCSP, 'Skip cryptography test for cryptography<2.4')
+    def test_responder_id(self):
+        loaded_cert = x509.load_pem_x509_certificate(ocsp_pem, default_backend())
+        view = OCSPView(ca=certs['root']['serial'], responder_key='ocsp.key', responder_cert=loaded_cert)
+        other = OCSPView(ca=certs['root']['serial'], responder_key='ocsp.key', responder_cert='ocsp.pem')
+
+        responder_id = view.get_responder_id()
+        self.assertNotEqual(responder_id, other.get_responder_id())
+        self.assertNotEqual(responder_id, OCSPView(ca=certs['root']['serial'], responder_key='ocsp.key',
+                                                   responder_cert=loaded_cert, expires=1).get_responder_id())
+
+        # The id is computed only once
+        with mock.patch('django_ca.views.hashlib.sha256', side_effect=Exception('not cached')):
+            self.assertEqual(OCSPView(ca=certs['root']['serial'], responder_key='ocsp.key',
+                                      responder_cert=loaded_cert).get_responder_id(), responder_id)
+
+    def test_cached_with_nonce(self):
+        cache.clear()
+
+        data = base64.b64encode(req1).decode('utf-8')
+        response = self.client.get(reverse('get-cached', kwargs={'data': data}))
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(cache.get(get_ocsp_cache_key(self.ca.serial, self.cert.serial)))
+
     def test_ca_ocsp(self):
         data = base64.b64encode(req1).decode('utf-8')
         response = self.client.get(reverse('get-ca', kwargs={'data': data}))
@@ -487,15 +678,124 @@ class OCSPTestView(OCSPViewTestMixin, DjangoCAWithCertTestCase):
         ocsp_response = asn1crypto.ocsp.OCSPResponse.load(response.content)
         self.assertEqual(ocsp_response['response_status'].native, 'malformed_request')
 
+    def _build_combined_request(self, certs, nonce=True):
+        request_list = []
+        for cert in certs:
+            builder = ocspbuilder.OCSPRequestBuilder(
+                certificate=asn1crypto.x509.Certificate.load(cert.x509.public_bytes(Encoding.DER)),
+                issuer=asn1crypto.x509.Certificate.load(cert.ca.x509.public_bytes(Encoding.DER))
+            )
+            builder.nonce = nonce
+            request = builder.build()
+            request_list.append(request['tbs_request']['request_list'][0].copy())
+
+        request['tbs_request']['request_list'] = request_list
+        return request
+
     def test_multiple(self):
+        # multiple_req contains two serials that are not known to the CA
         data = base64.b64encode(multiple_req).decode('utf-8')
         response = self.client.get(reverse('get', kwargs={'data': data}))
         self.assertEqual(response.status_code, 200)
         ocsp_response = asn1crypto.ocsp.OCSPResponse.load(response.content)
+        self.assertEqual(ocsp_response['response_status'].native, 'successful')
+        tbs_response_data = ocsp_response['response_bytes']['response'].parsed['tbs_response_data']
+        self.assertEqual([r['cert_id']['serial_number'].native for r in tbs_response_data['responses']],
+                         [123, 345])
+        self.assertEqual([r['cert_status'].name for r in tbs_response_data['responses']],
+                         ['unknown', 'unknown'])
+
+    def test_multiple_certs(self):
+        certs = [c for c in self.certs if c.ca == self.ca][:3]
+        Certificate.objects.get(pk=certs[1].pk).revoke('key_compromise')
+        request = self._build_combined_request(certs)
+        nonce = request['tbs_request']['request_extensions'][0]['extn_value'].parsed.native
+
+        with self.assertNumQueries(2):  # one query for the CA, one for all certificates
+            response = self.client.post(reverse('post-abs-path'), request.dump(),
+                                        content_type='application/ocsp-request')
+        self.assertEqual(response.status_code, 200)
+        self.assertOCSP(response, requested=certs, nonce=nonce, expires=1500)
+
+        # Without a nonce
+        request = self._build_combined_request(certs, nonce=False)
+        data = base64.b64encode(request.dump()).decode('utf-8')
+        response = self.client.get(reverse('get', kwargs={'data': data}))
+        self.assertEqual(response.status_code, 200)
+        self.assertOCSP(response, requested=certs)
+
+    def test_multiple_bad_ca(self):
+        request = self._build_combined_request([self.cert, self.cert])
+        data = base64.b64encode(request.dump()).decode('utf-8')
+        response = self.client.get(reverse('unknown', kwargs={'data': data}))
+        self.assertEqual(response.status_code, 200)
+        ocsp_response = asn1crypto.ocsp.OCSPResponse.load(response.content)
+        self.assertEqual(ocsp_response['response_status'].native, 'internal_error')
+
+    def test_multiple_ca_ocsp(self):
+        # requests to a view for child CAs look up certificates in child CAs
+        request = self._build_combined_request([self.cert, self.cert])
+        data = base64.b64encode(request.dump()).decode('utf-8')
+        response = self.client.get(reverse('get-ca', kwargs={'data': data}))
+        self.assertEqual(response.status_code, 200)
+        ocsp_response = asn1crypto.ocsp.OCSPResponse.load(response.content)
+        tbs_response_data = ocsp_response['response_bytes']['response'].parsed['tbs_response_data']
+        self.assertEqual([r['cert_status'].name for r in tbs_response_data['responses']],
+                         ['unknown', 'unknown'])
+
+    def test_multiple_extensions(self):
+        request = self._build_combined_request([self.cert, self.cert], nonce=False)
+        request['tbs_request']['request_extensions'] = [{
+            'extn_id': 'acceptable_responses',
+            'critical': False,
+            'extn_value': ['basic_ocsp_response'],
+        }]
+
+        # unknown extensions are not included in the response
+        data = base64.b64encode(request.dump()).decode('utf-8')
+        response = self.client.get(reverse('get', kwargs={'data': data}))
+        self.assertEqual(response.status_code, 200)
+        ocsp_response = asn1crypto.ocsp.OCSPResponse.load(response.content)
+        self.assertEqual(ocsp_response['response_status'].native, 'successful')
+        tbs_response_data = ocsp_response['response_bytes']['response'].parsed['tbs_response_data']
+        self.assertEqual(len(tbs_response_data['responses']), 2)
+        self.assertEqual(tbs_response_data['response_extensions'].native, None)
+
+        # ... but requests with critical extensions that we don't understand are rejected
+        request['tbs_request']['request_extensions'][0]['critical'] = True
+        data = base64.b64encode(request.dump()).decode('utf-8')
+        response = self.client.get(reverse('get', kwargs={'data': data}))
+        self.assertEqual(response.status_code, 200)
+        ocsp_response = asn1crypto.ocsp.OCSPResponse.load(response.content)
+        self.assertEqual(ocsp_response['response_status'].native, 'malformed_request')
+
+    def test_multiple_bad_responder_pem(self):
+        request = self._build_combined_request([self.cert, self.cert])
+        data = base64.b64encode(request.dump()).decode('utf-8')
+
+        with self.assertLogs() as cm:
+            response = self.client.get(reverse('false-pem', kwargs={'data': data}))
+        self.assertEqual(cm.output[-1], 'ERROR:django_ca.views:Could not read responder key/cert.')
+        self.assertEqual(response.status_code, 200)
+        ocsp_response = asn1crypto.ocsp.OCSPResponse.load(response.content)
+        self.assertEqual(ocsp_response['response_status'].native, 'internal_error')
+
+    @unittest.skipUnless(ca_settings.CRYPTOGRAPHY_OCSP, 'Skip cryptography test for cryptography<2.4')
+    def test_single_unparsable_request(self):
+        # requests for a single certificate that cryptography can't load are not processed by asn1crypto
+        data = base64.b64encode(req1).decode('utf-8')
+        with self.assertLogs() as cm, \
+                mock.patch('django_ca.views.ocsp.load_der_ocsp_request', side_effect=ValueError('foo')):
+            response = self.client.get(reverse('get', kwargs={'data': data}))
+        self.assertEqual(len(cm.output), 1)
+        self.assertTrue(cm.output[0].startswith('ERROR:django_ca.views:foo'))
+        self.assertEqual(response.status_code, 200)
+        ocsp_response = asn1crypto.ocsp.OCSPResponse.load(response.content)
         self.assertEqual(ocsp_response['response_status'].native, 'malformed_request')
 
     def test_bad_ca_cert(self):
         self.ca.pub = 'foobar'
+        self.ca.der = None
         self.ca.save()
 
         data = base64.b64encode(req1).decode('utf-8')
@@ -20,6 +20,9 @@ import errno
 import os
 import re
 import shlex
+import tempfile
+import threading
+from collections import OrderedDict
 from contextlib import contextmanager
 from copy import deepcopy
 from datetime import datetime
@@ -31,6 +34,7 @@ import idna
 
 from asn1crypto.core import OctetString
 from cryptography import x509
+from cryptography.hazmat.backends import default_backend
 from cryptography.hazmat.primitives import hashes
 from cryptography.hazmat.primitives.asymmetric import ec
 from cryptography.x509.oid import ExtensionOID
@@ -110,6 +114,58 @@ class LazyEncoder(DjangoJSONEncoder):
         return super(LazyEncoder, self).default(obj)
 
 
+class LRUCache(object):
+    """A thread-safe cache holding at most ``maxsize`` items, discarding the least recently used item first.
+
+    ``hits`` and ``misses`` count how often :py:meth:`get` did (or did not) find an item.
+    """
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key):
+        """Get the cached item for ``key`` or ``None`` if it is not cached."""
+
+        with self._lock:
+            try:
+                value = self._data.pop(key)
+            except KeyError:
+                self.misses += 1
+                return None
+
+            # re-insert the item so it becomes the most recently used one
+            self._data[key] = value
+            self.hits += 1
+            return value
+
+    def set(self, key, value):
+        """Add an item to the cache, discarding the least recently used item if the cache is full."""
+
+        if self.maxsize <= 0:
+            return
+
+        with self._lock:
+            self._data.pop(key, None)
+            self._data[key] = value
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        """Remove all items and reset ``hits`` and ``misses``."""
+
+        with self._lock:
+            self._data.clear()
+            self.hits = 0
+            self.misses = 0
+
+
 def sort_name(subject):
     """Returns the subject in the correct order for a x509 subject."""
     return sorted(subject, key=lambda e: SUBJECT_FIELDS.index(e[0]))
@@ -215,6 +271,31 @@ def int_to_hex(i):
     return add_colons(s)
 
 
+def hex_to_int(s):
+    """Convert a hex-representation of a serial (as created by :py:func:`int_to_hex`) to an int.
+
+    >>> hex_to_int('BC:61:4E')
+    12345678
+    """
+    return int(s.replace(':', ''), 16)
+
+
+def pad_serial(serial):
+    """Get the fixed-width representation of a serial used for exact lookups in the database.
+
+    ``serial`` may be an ``int`` or a hex string as created by :py:func:`int_to_hex`. The value is zero-padded
+    to 40 hex digits (the maximum length of a serial in :rfc:`5280`), so values sort like the serial itself.
+
+    >>> pad_serial(12345678)
+    '0000000000000000000000000000000000BC614E'
+    >>> pad_serial('BC:61:4E')
+    '0000000000000000000000000000000000BC614E'
+    """
+    if isinstance(serial, six.string_types):
+        serial = hex_to_int(serial)
+    return ('%X' % serial).zfill(40)
+
+
 def bytes_to_hex(v):
     """Convert a bytes array to hex.
 
@@ -638,6 +719,32 @@ def get_cert_builder(expires):
     return builder
 
 
+def get_revoked_certificate(serial, revoked_date, revoked_reason=None):
+    """Get a :py:class:`~cg:cryptography.x509.RevokedCertificate` for a CRL.
+
+    The revoked certificate is built from the values stored in the database, so the certificate itself
+    does not have to be loaded.
+
+    Parameters
+    ----------
+
+    serial : str
+        The serial of the certificate as stored in the database (e.g. ``"BC:61:4E"``).
+    revoked_date : datetime
+        When the certificate was revoked.
+    revoked_reason : str, optional
+        The name of a :py:class:`~cg:cryptography.x509.ReasonFlags` member. If not given, the revoked
+        certificate has no ``CRLReason`` extension.
+    """
+    builder = x509.RevokedCertificateBuilder().serial_number(hex_to_int(serial)).revocation_date(revoked_date)
+
+    if revoked_reason:
+        reason_flag = getattr(x509.ReasonFlags, revoked_reason)
+        builder = builder.add_extension(x509.CRLReason(reason_flag), critical=False)
+
+    return builder.build(default_backend())
+
+
 def get_default_subject(name):
     """Get the default subject for the given profile."""
 
@@ -693,6 +800,23 @@ def read_file(path):
         stream.close()
 
 
+def write_file_atomic(path, data):
+    """Write binary data to a file on the local filesystem so that readers never see a partial file.
+
+    The data is first written to a temporary file in the same directory, which is then renamed to ``path``.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.%s.' % os.path.basename(path))
+    try:
+        with os.fdopen(fd, 'wb') as stream:
+            stream.write(data)
+        os.chmod(tmp_path, 0o644)
+        os.rename(tmp_path, path)
+    except Exception:
+        os.remove(tmp_path)
+        raise
+
+
 def get_extension_name(ext):
     """Function to get the name of an extension."""
 
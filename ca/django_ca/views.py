@@ -15,8 +15,11 @@
 
 import base64
 import binascii
+import hashlib
 import logging
 import os
+import time
+import uuid
 from datetime import datetime
 from datetime import timedelta
 
@@ -34,8 +37,10 @@ from oscrypto.asymmetric import load_certificate
 from oscrypto.asymmetric import load_private_key
 
 from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
 from django.http import HttpResponse
 from django.http import HttpResponseServerError
+from django.utils import six
 from django.utils.decorators import method_decorator
 from django.utils.encoding import force_bytes
 from django.utils.encoding import force_text
@@ -44,15 +49,31 @@ from django.views.generic.base import View
 from django.views.generic.detail import SingleObjectMixin
 
 from . import ca_settings
+from .crl import cache_crl
+from .crl import get_cached_crl
 from .crl import get_crl
+from .crl import get_crl_cache_key
+from .crl import get_crl_timeout
 from .models import Certificate
 from .models import CertificateAuthority
+from .ocsp import get_combined_response
+from .ocsp import get_ocsp_cache_key
+from .ocsp import get_ocsp_response_cache_key
+from .ocsp import get_response_builder
+from .ocsp import sign_response_data
+from .signing import SigningKey
+from .signing import get_signing_backend
 from .utils import SERIAL_RE
+from .utils import ca_storage
 from .utils import int_to_hex
+from .utils import pad_serial
 from .utils import read_file
 
 log = logging.getLogger(__name__)
 
+# Responder keys and certificates loaded by OCSP views in this process
+_responder_cache = {}
+
 
 class CertificateRevocationListView(View, SingleObjectMixin):
     """Generic view that provides Certificate Revocation Lists (CRLs)."""
@@ -72,9 +93,21 @@ class CertificateRevocationListView(View, SingleObjectMixin):
     ca_crl = False
     """If set to ``True``, return a CRL for child CAs instead."""
 
+    delta = False
+    """If set to ``True``, return a delta CRL that only contains certificates revoked since the last full CRL.
+
+    If no full CRL was generated before (e.g. by another view or ``manage.py publish_crls``), a full CRL is
+    generated first."""
+
     expires = 600
     """CRL expires in this many seconds."""
 
+    lock_timeout = 60
+    """Time in seconds before the CRL expires from the cache that a new CRL is generated.
+
+    Only one request generates the new CRL, all other requests still receive the previous CRL in the
+    meantime. If generating the CRL takes longer than this, another request may try again."""
+
     digest = hashes.SHA512()
     """Digest used for generating the CRL."""
 
@@ -82,17 +115,31 @@ class CertificateRevocationListView(View, SingleObjectMixin):
     content_type = None
     """Value of the Content-Type header used in the response. For CRLs in PEM format, use ``text/plain``."""
 
+    def generate_crl(self, cache_key):
+        ca = self.get_object()
+        crl = get_crl(ca, encoding=self.type, expires=self.expires, algorithm=self.digest,
+                      password=self.password, ca_crl=self.ca_crl, delta=self.delta)
+        # The CRL may have been generated earlier, so cache it only as long as it's still valid
+        cache_crl(cache_key, crl, get_crl_timeout(crl, self.type), self.lock_timeout)
+        return crl
+
     def get(self, request, serial):
-        cache_key = 'crl_%s_%s_%s' % (serial, self.type, self.digest.name)
-        if self.ca_crl is True:
-            cache_key += '_ca'
+        cache_key = get_crl_cache_key(serial, self.type, self.digest, ca_crl=self.ca_crl, delta=self.delta)
+        lock_key = '%s_lock' % cache_key
+
+        cached = get_cached_crl(cache_key)
+        if cached is None:
+            # There is no CRL we could serve, so we have to generate it even if another request already does
+            crl = self.generate_crl(cache_key)
+        else:
+            crl, stale = cached
 
-        crl = cache.get(cache_key)
-        if crl is None:
-            ca = self.get_object()
-            crl = get_crl(ca, encoding=self.type, expires=self.expires, algorithm=self.digest,
-                          password=self.password, ca_crl=self.ca_crl)
-            cache.set(cache_key, crl, self.expires)
+            # Only one request generates the new CRL, all others serve the previous (still valid) CRL
+            if stale is True and cache.add(lock_key, True, self.lock_timeout):
+                try:
+                    crl = self.generate_crl(cache_key)
+                finally:
+                    cache.delete(lock_key)
 
         content_type = self.content_type
         if content_type is None:
@@ -145,6 +192,21 @@ class OCSPBaseView(View):
     ca_ocsp = False
     """If set to ``True``, validate child CAs instead."""
 
+    responder_cache_expires = 3600
+    """Time in seconds that a loaded responder key and certificate are kept in memory.
+
+    Files are also read again as soon as their modification time changes. Set to ``0`` to keep them until the
+    file changes."""
+
+    cache_expires = None
+    """Time in seconds that signed responses for requests without a nonce are cached.
+
+    Cached responses are served without querying the certificate or signing a new response. The value is
+    capped at ``expires``, so clients never receive a response that is already outdated. Responses are
+    cached separately for every responder configuration, so views with a different responder never serve
+    each others responses. Revoking a certificate removes any cached response for it. The default
+    (``None``) disables caching."""
+
     def get(self, request, data):
         try:
             data = base64.b64decode(data)
@@ -166,34 +228,186 @@ class OCSPBaseView(View):
             log.exception(e)
             return self.fail()
 
+    def get_modified_time(self, path):
+        """Get the modification time of the given file or ``None`` if it cannot be determined."""
+
+        try:
+            if os.path.isabs(path):
+                return os.path.getmtime(path)
+            return ca_storage.get_modified_time(path)
+        except (NotImplementedError, OSError):
+            return None
+
+    def get_cached_responder_value(self, name, value, load, path=None):
+        """Get a responder key or certificate from the per-process cache.
+
+        ``load`` is called if the value was not yet loaded, if it was loaded more than
+        ``responder_cache_expires`` seconds ago or if ``path`` was modified since.
+        """
+
+        key = (self.__class__, name, value)
+        mtime = self.get_modified_time(path) if path is not None else None
+        now = time.time()
+
+        cached = _responder_cache.get(key)
+        if cached is not None:
+            loaded, loaded_mtime, loaded_at = cached
+            expired = self.responder_cache_expires and now - loaded_at > self.responder_cache_expires
+            if loaded_mtime == mtime and not expired:
+                return loaded
+
+        loaded = load()
+        _responder_cache[key] = (loaded, mtime, now)
+        return loaded
+
     def get_responder_key(self):
         if os.path.isabs(self.responder_key):
             log.warning('%s: OCSP responder uses absolute path to private key. Please see %s.',
                         self.responder_key, ca_settings.CA_FILE_STORAGE_URL)
 
-        return read_file(self.responder_key)
+        return self.get_cached_responder_value(
+            'key', self.responder_key, lambda: self.load_responder_key(read_file(self.responder_key)),
+            path=self.responder_key)
 
     def get_responder_cert(self):
         if self.responder_cert.startswith('-----BEGIN CERTIFICATE-----\n'):
-            return self.responder_cert.encode('utf-8')
+            return self.get_cached_responder_value(
+                'cert', self.responder_cert,
+                lambda: self.load_responder_cert(self.responder_cert.encode('utf-8')))
 
         if SERIAL_RE.match(self.responder_cert):
-            return Certificate.objects.get(serial=self.responder_cert).pub.encode('utf-8')
+            return self.get_cached_responder_value(
+                'cert', self.responder_cert, lambda: self.load_responder_cert(
+                    Certificate.objects.get(serial=self.responder_cert).pub.encode('utf-8')))
 
         if os.path.isabs(self.responder_cert):
             log.warning('%s: OCSP responder uses absolute path to certificate. Please see %s.',
                         self.responder_cert, ca_settings.CA_FILE_STORAGE_URL)
 
-        return read_file(self.responder_cert)
+        return self.get_cached_responder_value(
+            'cert', self.responder_cert, lambda: self.load_responder_cert(read_file(self.responder_cert)),
+            path=self.responder_cert)
 
     def get_ca(self):
         return CertificateAuthority.objects.get_by_serial_or_cn(self.ca)
 
     def get_cert(self, ca, serial):
         if self.ca_ocsp is True:
-            return CertificateAuthority.objects.filter(parent=ca).get(serial=serial)
+            return CertificateAuthority.objects.filter(parent=ca).get(serial_hex=pad_serial(serial))
+        else:
+            return Certificate.objects.filter(ca=ca).get(serial_hex=pad_serial(serial))
+
+    def get_certs(self, ca, serials):
+        """Get a dictionary mapping serials to certificates, fetched with a single query."""
+
+        if self.ca_ocsp is True:
+            qs = CertificateAuthority.objects.filter(parent=ca)
         else:
-            return Certificate.objects.filter(ca=ca).get(serial=serial)
+            qs = Certificate.objects.filter(ca=ca)
+        return {cert.serial: cert for cert in qs.filter(serial_hex__in=[pad_serial(s) for s in serials])}
+
+    def load_combined_request(self, data):
+        """Load an OCSP request for more than one certificate.
+
+        Returns the parsed ``asn1crypto.ocsp.OCSPRequest`` or ``None`` if ``data`` is not a valid request or
+        only contains a single request.
+        """
+
+        try:
+            ocsp_request = asn1crypto.ocsp.OCSPRequest.load(data)
+            if len(ocsp_request['tbs_request']['request_list']) > 1:
+                return ocsp_request
+        except Exception:
+            pass
+        return None
+
+    def process_combined_request(self, ocsp_request):
+        """Process an OCSP request for multiple certificates, answering them with a single response."""
+
+        tbs_request = ocsp_request['tbs_request']
+        for extension in tbs_request['request_extensions']:
+            if extension['critical'].native is True and extension['extn_id'].native != 'nonce':
+                return self.malformed_request()
+
+        try:
+            ca = self.get_ca()
+        except CertificateAuthority.DoesNotExist:
+            log.error('%s: Certificate Authority could not be found.', self.ca)
+            return self.fail()
+
+        serials = [int_to_hex(r['req_cert']['serial_number'].native) for r in tbs_request['request_list']]
+        certs = self.get_certs(ca, serials)
+
+        try:
+            responder_key = self.get_responder_key()
+            responder_cert = self.get_responder_cert()
+        except Exception:
+            log.error('Could not read responder key/cert.')
+            return self.fail()
+
+        response = get_combined_response(
+            tbs_request, certs, self.dump_responder_cert(responder_cert), self.expires,
+            lambda data: self.sign_response_data(responder_key, data))
+        return self.http_response(response)
+
+    def get_responder_id(self):
+        """Get a string identifying the responder and configuration of this view.
+
+        The string is used to store cached responses of this view separately from the responses of other
+        views for the same certificate. It is computed only once per process.
+        """
+
+        def get_id():
+            responder_cert = self.responder_cert
+            if not isinstance(responder_cert, six.string_types):  # a loaded certificate
+                responder_cert = self.dump_responder_cert(responder_cert)
+
+            data = force_bytes('%s\n%s\n%s\n' % (self.responder_key, self.expires, self.ca_ocsp))
+            return hashlib.sha256(data + force_bytes(responder_cert)).hexdigest()
+
+        config = (self.responder_key, self.expires, self.ca_ocsp, self.responder_cert)
+        return self.get_cached_responder_value('id', config, get_id)
+
+    def get_cached_response(self, ca, serial):
+        """Get a cached response for the given certificate or ``None`` if no response is cached."""
+
+        if not self.cache_expires:
+            return None
+
+        # Every view caches responses under its own key, together with a token for the certificate. Revoking
+        # a certificate removes the token, which invalidates the responses of all views at once.
+        token_key = get_ocsp_cache_key(ca.serial, serial)
+        response_key = get_ocsp_response_cache_key(ca.serial, serial, self.get_responder_id())
+        cached = cache.get_many([token_key, response_key])
+        token = cached.get(token_key)
+        response = cached.get(response_key)
+
+        if token is None or not isinstance(response, tuple) or len(response) != 3:
+            return None
+        response_token, data, valid_until = response
+        if response_token != token or time.time() >= valid_until:
+            return None
+        return data
+
+    def cache_response(self, ca, serial, data):
+        """Cache a signed response for requests for the given certificate."""
+
+        if not self.cache_expires:
+            return
+
+        token_key = get_ocsp_cache_key(ca.serial, serial)
+        token = cache.get(token_key)
+        if not isinstance(token, six.string_types):  # no token yet or a value cached by a previous version
+            if token is not None:
+                cache.delete(token_key)
+
+            # Another view might add a token at the same time, so the token is read again
+            cache.add(token_key, uuid.uuid4().hex, None)
+            token = cache.get(token_key)
+
+        timeout = min(self.cache_expires, self.expires)
+        response_key = get_ocsp_response_cache_key(ca.serial, serial, self.get_responder_id())
+        cache.set(response_key, (token, data, time.time() + timeout), timeout)
 
     def http_response(self, data, status=200):
         return HttpResponse(data, status=status, content_type='application/ocsp-response')
@@ -216,22 +430,40 @@ if ca_settings.CRYPTOGRAPHY_OCSP is True:  # pragma: only cryptography>=2.4
         def malformed_request(self):
             return self.fail(ocsp.OCSPResponseStatus.MALFORMED_REQUEST)
 
-        def get_responder_key(self):
-            key = super(OCSPView, self).get_responder_key()
-            return serialization.load_pem_private_key(key, None, default_backend())
+        def load_responder_key(self, data):
+            return serialization.load_pem_private_key(data, None, default_backend())
+
+        def load_responder_cert(self, data):
+            return load_pem_x509_certificate(data, default_backend())
 
         def get_responder_cert(self):
             # User configured a loaded certificate
             if isinstance(self.responder_cert, x509.Certificate):
                 return self.responder_cert
 
-            responder_cert = super(OCSPView, self).get_responder_cert()
-            return load_pem_x509_certificate(responder_cert, default_backend())
+            return super(OCSPView, self).get_responder_cert()
+
+        def get_responder_key(self):
+            backend = get_signing_backend()
+            if backend is not None:
+                return backend.get_key(self.responder_key, self.get_responder_cert().public_key())
+            return super(OCSPView, self).get_responder_key()
+
+        def dump_responder_cert(self, responder_cert):
+            return responder_cert.public_bytes(Encoding.DER)
+
+        def sign_response_data(self, responder_key, data):
+            return sign_response_data(responder_key, data)
 
         def process_ocsp_request(self, data):
             try:
                 ocsp_req = ocsp.load_der_ocsp_request(data)  # NOQA
             except Exception as e:
+                # cryptography cannot load requests for more than one certificate
+                ocsp_request = self.load_combined_request(data)
+                if ocsp_request is not None:
+                    return self.process_combined_request(ocsp_request)
+
                 log.exception(e)
                 return self.malformed_request()
 
@@ -241,6 +473,11 @@ if ca_settings.CRYPTOGRAPHY_OCSP is True:  # pragma: only cryptography>=2.4
                     # It seems impossible to get cryptography to create such a request, so it's not tested
                     return self.malformed_request()
 
+            try:
+                nonce = ocsp_req.extensions.get_extension_for_class(OCSPNonce)
+            except ExtensionNotFound:
+                nonce = None
+
             # Get CA and certificate
             try:
                 ca = self.get_ca()
@@ -248,8 +485,16 @@ if ca_settings.CRYPTOGRAPHY_OCSP is True:  # pragma: only cryptography>=2.4
                 log.error('%s: Certificate Authority could not be found.', self.ca)
                 return self.fail()
 
+            serial = int_to_hex(ocsp_req.serial_number)
+
+            # Responses to requests with a nonce are unique, so only requests without one can be cached
+            if nonce is None:
+                cached = self.get_cached_response(ca, serial)
+                if cached is not None:
+                    return self.http_response(cached)
+
             try:
-                cert = self.get_cert(ca, int_to_hex(ocsp_req.serial_number))
+                cert = self.get_cert(ca, serial)
             except Certificate.DoesNotExist:
                 log.warning('OCSP request for unknown cert received.')
                 return self.fail()
@@ -265,37 +510,27 @@ if ca_settings.CRYPTOGRAPHY_OCSP is True:  # pragma: only cryptography>=2.4
                 log.error('Could not read responder key/cert.')
                 return self.fail()
 
-            # get the certificate status
-            if cert.revoked:
-                status = ocsp.OCSPCertStatus.REVOKED
+            if isinstance(responder_key, SigningKey):
+                # cryptography can only sign responses with a loaded key, so assemble it with asn1crypto
+                tbs_request = asn1crypto.ocsp.OCSPRequest.load(data)['tbs_request']
+                response = get_combined_response(
+                    tbs_request, {serial: cert}, self.dump_responder_cert(responder_cert), self.expires,
+                    lambda response_data: self.sign_response_data(responder_key, response_data))
             else:
-                status = ocsp.OCSPCertStatus.GOOD
-
-            builder = ocsp.OCSPResponseBuilder()
-            builder = builder.add_response(
-                cert=cert.x509, issuer=ca.x509, algorithm=hashes.SHA1(),
-                cert_status=status,
-                this_update=datetime.utcnow(),
-                next_update=datetime.utcnow() + timedelta(seconds=self.expires),
-                revocation_time=cert.get_revocation_time(),
-                revocation_reason=cert.get_revocation_reason()
-            ).responder_id(
-                ocsp.OCSPResponderEncoding.HASH, responder_cert
-            )
-
-            # Add the responder cert to the response, necessary because we (so far) always use delegate
-            # certificates
-            builder = builder.certificates([responder_cert])
+                builder = get_response_builder(
+                    cert.x509, ca.x509, responder_cert, self.expires,
+                    revocation_time=cert.get_revocation_time(),
+                    revocation_reason=cert.get_revocation_reason()
+                )
 
-            # Add OCSP nonce if present
-            try:
-                nonce = ocsp_req.extensions.get_extension_for_class(OCSPNonce)
-                builder = builder.add_extension(nonce.value, critical=nonce.critical)
-            except ExtensionNotFound:
-                pass
+                # Add OCSP nonce if present
+                if nonce is not None:
+                    builder = builder.add_extension(nonce.value, critical=nonce.critical)
 
-            response = builder.sign(responder_key, hashes.SHA256())
-            return self.http_response(response.public_bytes(Encoding.DER))
+                response = builder.sign(responder_key, hashes.SHA256()).public_bytes(Encoding.DER)
+            if nonce is None:
+                self.cache_response(ca, serial, response)
+            return self.http_response(response)
 
 else:  # pragma: only cryptography<2.4
     class OCSPView(OCSPBaseView):
@@ -312,17 +547,37 @@ else:  # pragma: only cryptography<2.4
         def malformed_request(self):
             return self.fail(u'malformed_request')
 
-        def get_responder_key(self):
-            key = super(OCSPView, self).get_responder_key()
-            return load_private_key(key)
+        def load_responder_key(self, data):
+            return load_private_key(data)
+
+        def load_responder_cert(self, data):
+            return load_certificate(data)
 
         def get_responder_cert(self):
             # User configured a loaded certificate
             if isinstance(self.responder_cert, asymmetric.Certificate):
                 return self.responder_cert
 
-            responder_cert = super(OCSPView, self).get_responder_cert()
-            return load_certificate(responder_cert)
+            return super(OCSPView, self).get_responder_cert()
+
+        def get_responder_key(self):
+            # ocspbuilder signs responses itself and cannot use keys provided by a signing backend
+            if get_signing_backend() is not None:
+                raise ImproperlyConfigured(
+                    'CA_SIGNING_BACKEND requires cryptography>=2.4 for OCSP responses.')
+            return super(OCSPView, self).get_responder_key()
+
+        def dump_responder_cert(self, responder_cert):
+            return responder_cert.asn1.dump()
+
+        def sign_response_data(self, responder_key, data):
+            if responder_key.algorithm == 'rsa':
+                return 'sha256_rsa', asymmetric.rsa_pkcs1v15_sign(responder_key, data, 'sha256')
+            elif responder_key.algorithm == 'ec':
+                return 'sha256_ecdsa', asymmetric.ecdsa_sign(responder_key, data, 'sha256')
+            elif responder_key.algorithm == 'dsa':
+                return 'sha256_dsa', asymmetric.dsa_sign(responder_key, data, 'sha256')
+            raise ValueError('Unsupported responder key type: %r' % responder_key)  # pragma: no cover
 
         def process_ocsp_request(self, data):
             try:
@@ -330,10 +585,10 @@ else:  # pragma: only cryptography<2.4
 
                 tbs_request = ocsp_request['tbs_request']
                 request_list = tbs_request['request_list']
-                if len(request_list) != 1:
-                    log.error('Received OCSP request with multiple sub requests')
-                    raise NotImplementedError('Combined requests not yet supported')
-                single_request = request_list[0]  # TODO: Support more than one request
+                if len(request_list) > 1:
+                    return self.process_combined_request(ocsp_request)
+
+                single_request = request_list[0]
                 req_cert = single_request['req_cert']
                 serial = int_to_hex(req_cert['serial_number'].native)
             except Exception as e:
@@ -346,6 +601,13 @@ else:  # pragma: only cryptography<2.4
                 log.error('%s: Certificate Authority could not be found.', self.ca)
                 return self.fail()
 
+            # Responses to requests with a nonce are unique, so only requests without one can be cached
+            has_nonce = any(e['extn_id'].native == 'nonce' for e in tbs_request['request_extensions'])
+            if has_nonce is False:
+                cached = self.get_cached_response(ca, serial)
+                if cached is not None:
+                    return self.http_response(cached)
+
             try:
                 cert = self.get_cert(ca, serial)
             except Certificate.DoesNotExist:
@@ -365,6 +627,9 @@ else:  # pragma: only cryptography<2.4
             try:
                 responder_key = self.get_responder_key()
                 responder_cert = self.get_responder_cert()
+            except ImproperlyConfigured as e:
+                log.error(e)
+                return self.fail(u'internal_error')
             except Exception:
                 log.error('Could not read responder key/cert.')
                 return self.fail(u'internal_error')
@@ -407,6 +672,8 @@ else:  # pragma: only cryptography<2.4
 
             builder.certificate_issuer = ca_cert
             builder.next_update = datetime.utcnow() + timedelta(seconds=self.expires)
-            response = builder.build(responder_key, responder_cert)
+            response = builder.build(responder_key, responder_cert).dump()
+            if has_nonce is False:
+                self.cache_response(ca, serial, response)
 
-            return self.http_response(response.dump())
+            return self.http_response(response)
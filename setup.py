@@ -169,6 +169,15 @@ class CoverageCommand(BaseCommand):
         if not default_backend()._lib.CRYPTOGRAPHY_OPENSSL_110F_OR_GREATER:
             cov.exclude(r'pragma:\s*only SCT')
 
+        # exclude code that requires python-pkcs11 and SoftHSM (see tests_signing.PKCS11BackendTestCase)
+        try:
+            import pkcs11  # NOQA
+            has_pkcs11 = bool(os.environ.get('SOFTHSM2_LIB'))
+        except ImportError:
+            has_pkcs11 = False
+        if not has_pkcs11:
+            cov.exclude(r'pragma:\s*only PKCS11')
+
         # exclude django-version specific code
         from django import VERSION
         django_versions = [(1, 11), (2, 0), (2, 1), (2, 2), (2, 3)]
@@ -353,6 +362,9 @@ setup(
     package_data={'': package_data},
     zip_safe=False,  # because of the static files
     install_requires=install_requires,
+    extras_require={
+        'pkcs11': ['python-pkcs11>=0.5.0'],
+    },
     cmdclass={
         'coverage': CoverageCommand,
         'test': TestCommand,